@@ -0,0 +1,130 @@
+import os
+import json
+from datetime import datetime, timedelta
+from sqlmodel import select, func, case
+from sqlmodel.ext.asyncio.session import AsyncSession
+from cache import TTLCache
+from redis_client import get_redis
+from models import Submission
+
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))  # seconds
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))  # problems, in-process backend only
+ANALYTICS_WINDOW_HOURS = int(os.getenv("ANALYTICS_WINDOW_HOURS", "48"))  # span of the submissions-per-hour series
+HISTOGRAM_BUCKET = 10  # score points per histogram bar
+
+KEY_PREFIX = "minicode:analytics:"
+PERCENTILES = (25, 50, 75, 90)
+
+_local_cache = TTLCache(maxsize=ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL)
+
+def _hour_bucket(dialect: str):
+    """Truncates Submission.timestamp to the hour in the given SQL dialect."""
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00", Submission.timestamp)
+    return func.date_trunc("hour", Submission.timestamp)
+
+# Statement builders, shared with query_plans.py so the plan checks explain
+# exactly what runs here
+
+def totals_query(problem_id: int):
+    accepted = Submission.status == "accepted"
+    return select(
+        func.count(),
+        func.coalesce(func.sum(case((accepted, 1), else_=0)), 0),
+        func.count(func.distinct(Submission.user_id)),
+        func.count(func.distinct(case((accepted, Submission.user_id)))),
+    ).where(Submission.problem_id == problem_id)
+
+def score_counts_query(problem_id: int):
+    return (
+        select(Submission.score, func.count())
+        .where(Submission.problem_id == problem_id, Submission.status != "pending")
+        .group_by(Submission.score)
+        .order_by(Submission.score)
+    )
+
+def per_hour_query(problem_id: int, since: datetime, dialect: str):
+    hour = _hour_bucket(dialect)
+    return (
+        select(hour, func.count())
+        .where(Submission.problem_id == problem_id, Submission.timestamp >= since)
+        .group_by(hour)
+        .order_by(hour)
+    )
+
+def _percentile(score_counts: list[tuple[int, int]], total: int, pct: int) -> int:
+    """Nearest-rank percentile over (score, count) pairs sorted by score."""
+    rank = max(1, -(-pct * total // 100))
+    seen = 0
+    for score, count in score_counts:
+        seen += count
+        if seen >= rank:
+            return score
+    return score_counts[-1][0]
+
+async def compute_problem_analytics(session: AsyncSession, problem_id: int) -> dict:
+    """
+    Aggregates a problem's submissions in SQL. Only narrow columns are read;
+    score statistics cover judged submissions, pending ones only count towards
+    the totals.
+    """
+    total, accepted_count, submitters, solvers = (await session.exec(totals_query(problem_id))).one()
+
+    # Scores are integers in 0..100, so the per-score counts are at most 101 rows
+    # and every order statistic can be derived from them without sorting rows
+    score_counts = (await session.exec(score_counts_query(problem_id))).all()
+    judged = sum(count for _, count in score_counts)
+
+    histogram = {}
+    for score, count in score_counts:
+        start = min(score // HISTOGRAM_BUCKET * HISTOGRAM_BUCKET, 100 - HISTOGRAM_BUCKET)
+        histogram[start] = histogram.get(start, 0) + count
+
+    since = datetime.utcnow() - timedelta(hours=ANALYTICS_WINDOW_HOURS)
+    per_hour = (await session.exec(per_hour_query(problem_id, since, session.bind.dialect.name))).all()
+
+    return {
+        "total_submissions": total,
+        "accepted_count": accepted_count,
+        "acceptance_rate": round(100 * accepted_count / total, 1) if total else 0,
+        "unique_submitters": submitters,
+        "unique_solvers": solvers,
+        "average_score": round(sum(s * c for s, c in score_counts) / judged, 2) if judged else 0,
+        "median_score": _percentile(score_counts, judged, 50) if judged else 0,
+        "percentiles": {f"p{p}": _percentile(score_counts, judged, p) if judged else 0 for p in PERCENTILES},
+        "score_histogram": [{
+            "range": f"{start}-{start + HISTOGRAM_BUCKET - 1 if start + HISTOGRAM_BUCKET < 100 else 100}",
+            "count": histogram.get(start, 0)
+        } for start in range(0, 100, HISTOGRAM_BUCKET)],
+        "submissions_per_hour": [{
+            "hour": bucket if isinstance(bucket, str) else bucket.strftime("%Y-%m-%d %H:00"),
+            "count": count
+        } for bucket, count in per_hour],
+    }
+
+async def cached_problem_analytics(session: AsyncSession, problem_id: int) -> dict:
+    """Cached analytics for a problem. Uses Redis when configured so every worker shares one copy."""
+    client = get_redis()
+    if client:
+        cached = await client.get(f"{KEY_PREFIX}{problem_id}")
+        if cached:
+            return json.loads(cached)
+    else:
+        cached = _local_cache.get(problem_id)
+        if cached is not None:
+            return cached
+
+    stats = await compute_problem_analytics(session, problem_id)
+    if client:
+        await client.set(f"{KEY_PREFIX}{problem_id}", json.dumps(stats), ex=ANALYTICS_CACHE_TTL)
+    else:
+        _local_cache.set(problem_id, stats)
+    return stats
+
+async def invalidate_problem_analytics(problem_id: int):
+    """Called after a verdict is committed so the next dashboard load recomputes."""
+    client = get_redis()
+    if client:
+        await client.delete(f"{KEY_PREFIX}{problem_id}")
+    else:
+        _local_cache.pop(problem_id)
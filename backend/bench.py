@@ -0,0 +1,454 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextvars
+from datetime import timedelta
+from collections import Counter, defaultdict
+from typing import Optional
+import httpx
+from bench_fakes import FakeConfig, fake_github, fake_gemini, free_port, serve_in_thread
+
+# End-to-end load test: starts the API in this process against a fresh
+# database (or DATABASE_URL-style --database-url) with local GitHub and Gemini
+# stand-ins, seeds load data, drives mixed traffic and writes a JSON report.
+#
+#   python bench.py run --users 500 --problems 20 --submissions 20000 --duration 60 --output bench.json
+#   python bench.py compare baseline.json bench.json
+#
+# Latencies are measured by the client; DB query counts by engine events in
+# the server, attributed to the endpoint through the X-Bench-Label header.
+
+LABEL_HEADER = "x-bench-label"
+
+# Scenario name -> (endpoint label, default weight)
+SCENARIOS = {
+    "problems": ("GET /problems", 15),
+    "problem": ("GET /problems/{id}", 15),
+    "testcases": ("GET /problems/{id}/testcases", 5),
+    "leaderboard": ("GET /leaderboard", 15),
+    "rank": ("GET /leaderboard/users/{id}", 5),
+    "me": ("GET /auth/me", 15),
+    "submissions": ("GET /submissions", 10),
+    "submission": ("GET /submissions/{id}", 8),
+    "submit": ("POST /problems/{id}/submit", 8),
+    "start": ("POST /problems/{id}/start", 2),
+    "login": ("POST /auth/login", 2),
+}
+FINAL_STATUSES = {"accepted", "wrong_answer", "runtime_error", "tle", "mle", "error"}
+
+_label = contextvars.ContextVar("bench_label", default=None)
+
+def percentile(values: list, p: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+def parse_mix(text: str) -> dict:
+    """"submit=20,login=0" -> weights, starting from the defaults."""
+    weights = {name: weight for name, (_, weight) in SCENARIOS.items()}
+    for item in filter(None, (text or "").split(",")):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+class ServerStats:
+    """Per-endpoint DB query counts and time, recorded inside the API process."""
+
+    def __init__(self):
+        self.endpoints = defaultdict(lambda: {"requests": 0, "queries": 0, "db_time": 0.0})
+        self.background = {"queries": 0, "db_time": 0.0}  # judge workers and other non-request work
+        self.lock = threading.Lock()
+
+    def install(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("bench_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["bench_started"].pop()
+            target = _label.get() or self.background
+            with self.lock:
+                target["queries"] += 1
+                target["db_time"] += elapsed
+
+    def wrap(self, app):
+        """ASGI wrapper that counts queries per request under the client's label."""
+        async def labelled(scope, receive, send):
+            if scope["type"] != "http":
+                return await app(scope, receive, send)
+            label = dict(scope["headers"]).get(LABEL_HEADER.encode(), b"").decode() or f"{scope['method']} {scope['path']}"
+            counts = {"queries": 0, "db_time": 0.0}
+            token = _label.set(counts)
+            try:
+                await app(scope, receive, send)
+            finally:
+                _label.reset(token)
+                with self.lock:
+                    stats = self.endpoints[label]
+                    stats["requests"] += 1
+                    stats["queries"] += counts["queries"]
+                    stats["db_time"] += counts["db_time"]
+        return labelled
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.submitted: dict[int, float] = {}  # submission id -> time it was accepted by the API
+        self.judged: dict[int, tuple[str, float]] = {}  # id -> (final status, seconds from submit)
+
+    def record(self, label: str, started: float, status: int):
+        self.latencies[label].append(time.perf_counter() - started)
+        self.statuses[label][str(status)] += 1
+        if status >= 400 and status not in (404, 429):  # 404/429 are expected answers, not failures
+            self.errors[label] += 1
+
+class VirtualUser:
+    """One student session: a token, a few submissions of their own, a mix of requests."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, user: dict, problem_ids: list, user_ids: list, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.user = user
+        self.problem_ids = problem_ids
+        self.user_ids = user_ids
+        self.rng = rng
+        self.headers = {"Authorization": f"Bearer {user['token']}"}
+        self.mine: list[int] = []
+        self.leaderboard_cursor: Optional[str] = None
+
+    async def request(self, scenario: str, method: str, url: str, **kwargs):
+        label = SCENARIOS[scenario][0]
+        headers = {**self.headers, **kwargs.pop("headers", {}), LABEL_HEADER: label}
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.latencies[label].append(time.perf_counter() - started)
+            self.recorder.statuses[label]["exception"] += 1
+            self.recorder.errors[label] += 1
+            return None
+        self.recorder.record(label, started, response.status_code)
+        return response
+
+    async def run(self, scenario: str):
+        problem_id = self.rng.choice(self.problem_ids)
+        if scenario == "problems":
+            await self.request(scenario, "GET", "/problems", params={"limit": 50})
+        elif scenario == "problem":
+            await self.request(scenario, "GET", f"/problems/{problem_id}")
+        elif scenario == "testcases":
+            await self.request(scenario, "GET", f"/problems/{problem_id}/testcases")
+        elif scenario == "leaderboard":
+            # Most visitors look at the first page; the rest page on from where they were
+            params = {"limit": 50}
+            if self.leaderboard_cursor and self.rng.random() >= 0.8:
+                params["cursor"] = self.leaderboard_cursor
+            response = await self.request(scenario, "GET", "/leaderboard", params=params)
+            if response is not None:
+                self.leaderboard_cursor = response.headers.get("X-Next-Cursor")
+        elif scenario == "rank":
+            await self.request(scenario, "GET", f"/leaderboard/users/{self.rng.choice(self.user_ids)}")
+        elif scenario == "me":
+            await self.request(scenario, "GET", "/auth/me")
+        elif scenario == "submissions":
+            await self.request(scenario, "GET", "/submissions", params={"limit": 20})
+        elif scenario == "submission" and self.mine:
+            await self.request(scenario, "GET", f"/submissions/{self.mine[-1]}")
+        elif scenario == "submission":
+            await self.request("submissions", "GET", "/submissions", params={"limit": 20})
+        elif scenario == "submit":
+            response = await self.request(scenario, "POST", f"/problems/{problem_id}/submit", json={"language": "python"})
+            if response is not None and response.status_code == 200:
+                submission_id = response.json()["id"]
+                self.mine.append(submission_id)
+                self.recorder.submitted[submission_id] = time.perf_counter()
+        elif scenario == "start":
+            await self.request(scenario, "POST", f"/problems/{problem_id}/start")
+        elif scenario == "login":
+            await self.request(
+                scenario, "POST", "/auth/login",
+                data={"username": self.user["username"], "password": self.user["password"]},
+                headers={"Authorization": ""},
+            )
+
+async def track_judging(recorder: Recorder, engine, stop: asyncio.Event, interval: float = 0.5):
+    """Polls the database (outside the API) for submissions reaching a final status."""
+    from sqlmodel import Session, select
+    from models import Submission
+
+    def poll(ids):
+        with Session(engine) as session:
+            return session.exec(select(Submission.id, Submission.status).where(Submission.id.in_(ids))).all()
+
+    while True:
+        pending = [i for i in recorder.submitted if i not in recorder.judged]
+        for chunk in range(0, len(pending), 500):
+            for submission_id, status in await asyncio.to_thread(poll, pending[chunk:chunk + 500]):
+                if status in FINAL_STATUSES:
+                    recorder.judged[submission_id] = (status, time.perf_counter() - recorder.submitted[submission_id])
+        if stop.is_set() and len(recorder.judged) == len(recorder.submitted):
+            return
+        await asyncio.sleep(interval)
+
+async def drive(args, base_url: str, users: list, problem_ids: list, engine) -> tuple[Recorder, float, float]:
+    weights = parse_mix(args.mix)
+    names, values = list(weights), list(weights.values())
+    recorder = Recorder()
+    user_ids = [u["id"] for u in users]
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        async def virtual_user(index: int, deadline: float):
+            rng = random.Random(args.seed * 100003 + index)
+            vu = VirtualUser(client, recorder, users[index % len(users)], problem_ids, user_ids, rng)
+            while time.perf_counter() < deadline:
+                await vu.run(rng.choices(names, values)[0])
+                if args.think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+        if args.warmup:
+            warmup = Recorder()
+            warm_vu = VirtualUser(client, warmup, users[0], problem_ids, user_ids, random.Random(args.seed))
+            deadline = time.perf_counter() + args.warmup
+            while time.perf_counter() < deadline:
+                await warm_vu.run(random.choice([n for n in names if n not in ("submit", "start", "login")] or names))
+
+        tracker = asyncio.create_task(track_judging(recorder, engine, stop))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(virtual_user(i, deadline) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        # Let the judge finish what was submitted, up to the drain timeout
+        stop.set()
+        try:
+            await asyncio.wait_for(tracker, timeout=args.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        drained = time.perf_counter() - started
+    return recorder, elapsed, drained
+
+def summarize(values: list) -> dict:
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(max(values)) if values else None,
+    }
+
+def build_report(args, recorder: Recorder, server: ServerStats, elapsed: float, drained: float, fakes: dict, extras: dict) -> dict:
+    endpoints = {}
+    for label, values in sorted(recorder.latencies.items()):
+        db = server.endpoints.get(label, {"requests": 0, "queries": 0, "db_time": 0.0})
+        served = db["requests"] or 1
+        endpoints[label] = {
+            "count": len(values),
+            "errors": recorder.errors[label],
+            "statuses": dict(recorder.statuses[label]),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            **summarize(values),
+            "db_queries_per_request": round(db["queries"] / served, 2),
+            "db_time_ms_per_request": round(db["db_time"] * 1000 / served, 2),
+        }
+    every = [v for values in recorder.latencies.values() for v in values]
+    judge_times = [t for _, t in recorder.judged.values()]
+    return {
+        "version": git_revision(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("command", "output", "func")},
+        "duration_s": round(elapsed, 2),
+        "totals": {
+            "requests": len(every),
+            "errors": sum(recorder.errors.values()),
+            "throughput_rps": round(len(every) / elapsed, 2),
+            **summarize(every),
+        },
+        "endpoints": endpoints,
+        "judge": {
+            "submitted": len(recorder.submitted),
+            "judged": len(recorder.judged),
+            "statuses": dict(Counter(status for status, _ in recorder.judged.values())),
+            "throughput_per_s": round(len(recorder.judged) / drained, 2) if drained else None,
+            "latency_p50_s": round(percentile(judge_times, 50), 2) if judge_times else None,
+            "latency_p95_s": round(percentile(judge_times, 95), 2) if judge_times else None,
+            "latency_p99_s": round(percentile(judge_times, 99), 2) if judge_times else None,
+            "background_db_queries": server.background["queries"],
+        },
+        "fakes": fakes,
+        **extras,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def configure_environment(args, workdir: str, github_url: str, gemini_url: str):
+    """Points the app at the bench database and stand-ins; must run before app modules are imported."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["REDIS_URL"] = args.redis_url or ""
+    os.environ["GITHUB_API_URL"] = github_url
+    os.environ["GEMINI_API_URL"] = gemini_url
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["GITHUB_TEMPLATE_REPO"] = "minicode/bench-template"
+    os.environ["JUDGE_IN_PROCESS"] = "1"
+    os.environ.setdefault("TESTDATA_DIR", os.path.join(workdir, "testdata"))
+    # The stand-in is not throttled; real limits can still be set in the environment
+    os.environ.setdefault("GEMINI_RPM", "100000")
+    os.environ.setdefault("GEMINI_TPM", "100000000")
+    # Virtual users submit far faster than students; measure the server, not the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="minicode-bench-")
+    github_config = FakeConfig(args.github_latency_ms, args.github_error_rate, args.github_rate_limit_rate)
+    gemini_config = FakeConfig(args.gemini_latency_ms, args.gemini_error_rate, args.gemini_rate_limit_rate)
+    github_port, gemini_port, api_port = free_port(), free_port(), free_port()
+    github_server = serve_in_thread(fake_github(github_config, push_rate=args.push_rate, wrong_rate=args.wrong_rate), github_port)
+    gemini_server = serve_in_thread(fake_gemini(gemini_config), gemini_port)
+    configure_environment(args, workdir, f"http://127.0.0.1:{github_port}", f"http://127.0.0.1:{gemini_port}")
+
+    from sqlmodel import Session, select
+    from database import engine, async_engine, pool_status
+    from models import User, Problem
+    from auth import create_access_token
+    from seed import seed_db, seed_load, BENCH_PASSWORD
+    import main
+
+    print(f"Seeding {args.users} users, {args.problems} problems, {args.submissions} submissions...")
+    seed_db()
+    seed_load(args.users, args.problems, args.submissions, seed=args.seed)
+    with Session(engine) as session:
+        rows = session.exec(select(User.id, User.username).where(User.username.like("bench%")).order_by(User.id).limit(args.users)).all()
+        problem_ids = session.exec(select(Problem.id).where(Problem.title.like("Bench Problem %"))).all()
+    users = [
+        {
+            "id": user_id,
+            "username": username,
+            "password": BENCH_PASSWORD,
+            "token": create_access_token({"sub": username, "uid": user_id}, expires_delta=timedelta(hours=6)),
+        }
+        for user_id, username in rows
+    ]
+
+    server_stats = ServerStats()
+    server_stats.install(async_engine.sync_engine)
+    api_server = serve_in_thread(server_stats.wrap(main.app), api_port)
+    print(f"Driving {args.concurrency} virtual users for {args.duration}s against {os.environ['DATABASE_URL']}...")
+    recorder, elapsed, drained = asyncio.run(drive(args, f"http://127.0.0.1:{api_port}", users, list(problem_ids), engine))
+
+    extras = {
+        "db_pool": pool_status(),
+        "gemini_limiter": main.gemini_limiter.stats(),
+        "github_scheduler": main.github_scheduler.stats(),
+    }
+    from executor import get_execution_pool
+    pool = get_execution_pool()
+    if pool:
+        extras["execution_pool"] = pool.stats()
+    fakes = {"github": dict(github_config.counters), "gemini": dict(gemini_config.counters)}
+    report = build_report(args, recorder, server_stats, elapsed, drained, fakes, extras)
+
+    for server in (api_server, github_server, gemini_server):
+        server.should_exit = True
+    time.sleep(1)
+    return report
+
+def compare(args) -> int:
+    """Prints per-endpoint changes between two reports; exits 1 when a latency or query count regressed."""
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.current) as f:
+        new = json.load(f)
+    regressions = 0
+    print(f"{old.get('version')} -> {new.get('version')}")
+    for label in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        before, after = old["endpoints"].get(label), new["endpoints"].get(label)
+        if not before or not after:
+            print(f"  {label}: only in {'current' if after else 'baseline'}")
+            continue
+        notes = []
+        for key in ("p50_ms", "p95_ms"):  # p99 of a short run is too noisy to gate on
+            a, b = before[key], after[key]
+            # Relative threshold plus an absolute floor so sub-millisecond noise is ignored
+            if a is not None and b is not None and b > a * (1 + args.threshold) and b - a > args.min_ms:
+                notes.append(f"{key} {a} -> {b}")
+        if after["db_queries_per_request"] > before["db_queries_per_request"] + 0.5:
+            notes.append(f"queries {before['db_queries_per_request']} -> {after['db_queries_per_request']}")
+        if after["errors"] > before["errors"]:
+            notes.append(f"errors {before['errors']} -> {after['errors']}")
+        if notes:
+            regressions += 1
+        print(f"  {'REGRESSED' if notes else 'ok':9} {label}: p95 {before['p95_ms']} -> {after['p95_ms']} ms" + (f" ({'; '.join(notes)})" if notes else ""))
+    print(f"{regressions} endpoint(s) regressed")
+    return 1 if regressions else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MiniCode end-to-end load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed, drive traffic and write a JSON report")
+    run_parser.add_argument("--users", type=int, default=200)
+    run_parser.add_argument("--problems", type=int, default=10)
+    run_parser.add_argument("--submissions", type=int, default=5000, help="seeded historical submissions")
+    run_parser.add_argument("--database-url", help="default: a fresh SQLite file; use a scratch Postgres database otherwise")
+    run_parser.add_argument("--redis-url", help="default: in-process queues and caches")
+    run_parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    run_parser.add_argument("--duration", type=float, default=30, help="seconds of measured traffic")
+    run_parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured reads first")
+    run_parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    run_parser.add_argument("--mix", default="", help="scenario weights, e.g. submit=20,login=0 (" + ", ".join(SCENARIOS) + ")")
+    run_parser.add_argument("--timeout", type=float, default=30, help="client timeout per request, seconds")
+    run_parser.add_argument("--drain-timeout", type=float, default=60, help="seconds to wait for the judge afterwards")
+    run_parser.add_argument("--github-latency-ms", type=float, default=80)
+    run_parser.add_argument("--github-error-rate", type=float, default=0.0)
+    run_parser.add_argument("--github-rate-limit-rate", type=float, default=0.0)
+    run_parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    run_parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    run_parser.add_argument("--gemini-rate-limit-rate", type=float, default=0.0)
+    run_parser.add_argument("--push-rate", type=float, default=0.7, help="share of submits with a new commit")
+    run_parser.add_argument("--wrong-rate", type=float, default=0.2, help="share of commits that fail the tests")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="report path (default: stdout)")
+
+    compare_parser = commands.add_parser("compare", help="compare two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="relative latency increase that counts")
+    compare_parser.add_argument("--min-ms", type=float, default=2.0, help="ignore smaller absolute increases")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args))
+    report = run(args)
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+        totals = report["totals"]
+        print(f"{totals['requests']} requests, {totals['throughput_rps']} req/s, p95 {totals['p95_ms']} ms; "
+              f"{report['judge']['judged']}/{report['judge']['submitted']} judged. Report: {args.output}")
+    else:
+        print(text)
@@ -0,0 +1,197 @@
+import io
+import json
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import tarfile
+import threading
+from typing import Optional
+from dataclasses import dataclass, field
+from collections import Counter
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+import uvicorn
+
+# Local stand-ins for the GitHub and Gemini APIs used by bench.py. They speak
+# just enough of each API for the judge and provisioning paths, with
+# configurable latency and error rates, and count what they served.
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 50.0      # mean response delay; each call waits 0.5x-1.5x of it
+    error_rate: float = 0.0       # share of calls answered with a 5xx
+    rate_limit_rate: float = 0.0  # share of calls answered with a rate limit
+    counters: Counter = field(default_factory=Counter)
+
+    async def delay(self):
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+
+    def fault(self) -> Optional[str]:
+        """Picks the outcome of a call: "error", "rate_limited" or None for success."""
+        roll = random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return "rate_limited"
+        return None
+
+def solution_source(sha: str, wrong_rate: float) -> str:
+    """The bench problems are "A + B"; the commit SHA decides whether this commit gets it right."""
+    wrong = int(sha[:8], 16) / 0xFFFFFFFF < wrong_rate
+    return (
+        f"# commit {sha}\n"
+        "import sys\n"
+        "a, b = map(int, sys.stdin.read().split())\n"
+        f"print(a + b{' + 1' if wrong else ''})\n"
+    )
+
+def make_tarball(owner: str, repo: str, sha: str, wrong_rate: float) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for name, content in (("solution.py", solution_source(sha, wrong_rate)), ("README.md", f"# {repo}\n")):
+            data = content.encode()
+            info = tarfile.TarInfo(f"{owner}-{repo}-{sha[:7]}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+def fake_github(config: FakeConfig, push_rate: float = 0.7, wrong_rate: float = 0.2, quota: int = 5000) -> FastAPI:
+    """
+    GitHub REST stand-in. A branch head moves to a new commit with probability
+    `push_rate` per lookup (a student pushing before submitting), otherwise
+    the lookup revalidates to 304. `wrong_rate` of the commits fail the tests.
+    """
+    app = FastAPI()
+    heads: dict[str, str] = {}
+    remaining: dict[str, int] = {}
+    repos: set[str] = set()
+    window = {"reset": int(time.time()) + 3600}
+
+    def quota_headers(request: Request) -> dict:
+        token = request.headers.get("authorization", "").split(" ")[-1]
+        if time.time() > window["reset"]:
+            remaining.clear()
+            window["reset"] = int(time.time()) + 3600
+        remaining[token] = max(0, remaining.get(token, quota) - 1)
+        return {
+            "X-RateLimit-Limit": str(quota),
+            "X-RateLimit-Remaining": str(remaining[token]),
+            "X-RateLimit-Reset": str(window["reset"]),
+        }
+
+    async def answer(request: Request, name: str):
+        """Shared latency, quota headers and injected faults; returns (headers, error response or None)."""
+        await config.delay()
+        config.counters[name] += 1
+        headers = quota_headers(request)
+        fault = config.fault()
+        if fault == "error":
+            config.counters["errors"] += 1
+            return headers, JSONResponse({"message": "Server Error"}, status_code=502, headers=headers)
+        if fault == "rate_limited":
+            config.counters["rate_limited"] += 1
+            return headers, JSONResponse(
+                {"message": "You have exceeded a secondary rate limit"}, status_code=403, headers={**headers, "Retry-After": "2"}
+            )
+        return headers, None
+
+    @app.get("/repos/{owner}/{repo}/commits/{ref}")
+    async def get_commit(owner: str, repo: str, ref: str, request: Request):
+        headers, error = await answer(request, "commits")
+        if error:
+            return error
+        key = f"{owner}/{repo}@{ref}"
+        if key not in heads or random.random() < push_rate:
+            heads[key] = hashlib.sha1(f"{key}:{time.time_ns()}:{random.random()}".encode()).hexdigest()
+        etag = f'"{heads[key]}"'
+        if request.headers.get("if-none-match") == etag:
+            config.counters["not_modified"] += 1
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+        return Response(heads[key], media_type="application/vnd.github.sha", headers={**headers, "ETag": etag})
+
+    @app.get("/repos/{owner}/{repo}/tarball/{sha}")
+    async def get_tarball(owner: str, repo: str, sha: str, request: Request):
+        headers, error = await answer(request, "tarballs")
+        if error:
+            return error
+        return Response(make_tarball(owner, repo, sha, wrong_rate), media_type="application/x-gzip", headers=headers)
+
+    @app.post("/repos/{owner}/{template}/generate")
+    async def generate(owner: str, template: str, request: Request):
+        headers, error = await answer(request, "generate")
+        if error:
+            return error
+        body = await request.json()
+        full_name = f"{body['owner']}/{body['name']}"
+        if full_name in repos:
+            return JSONResponse({"message": "Name already exists on this account"}, status_code=422, headers=headers)
+        repos.add(full_name)
+        return JSONResponse({"name": body["name"], "full_name": full_name, "html_url": f"https://github.com/{full_name}"}, status_code=201, headers=headers)
+
+    @app.get("/repos/{owner}/{repo}")
+    async def get_repo(owner: str, repo: str, request: Request):
+        headers, error = await answer(request, "repos")
+        if error:
+            return error
+        full_name = f"{owner}/{repo}"
+        return JSONResponse({"name": repo, "full_name": full_name, "html_url": f"https://github.com/{full_name}", "url": f"/repos/{full_name}"}, headers=headers)
+
+    @app.get("/user")
+    async def get_user(request: Request):
+        headers, error = await answer(request, "user")
+        if error:
+            return error
+        token = request.headers.get("authorization", "").split(" ")[-1]
+        suffix = token.rsplit("-", 1)[-1]
+        login = f"bench{int(suffix):05d}" if suffix.isdigit() else "bench-user"
+        return JSONResponse({"login": login, "id": abs(hash(token)) % 10**9, "name": login, "email": f"{login}@minicode.test"}, headers=headers)
+
+    return app
+
+def fake_gemini(config: FakeConfig, accept_rate: float = 0.8) -> FastAPI:
+    """Gemini generateContent stand-in that answers with a judge verdict in JSON."""
+    app = FastAPI()
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate_content(version: str, model_action: str, request: Request):
+        body = await request.json()
+        await config.delay()
+        config.counters["calls"] += 1
+        fault = config.fault()
+        if fault:
+            config.counters["errors" if fault == "error" else "rate_limited"] += 1
+            code, status = (503, "UNAVAILABLE") if fault == "error" else (429, "RESOURCE_EXHAUSTED")
+            return JSONResponse({"error": {"code": code, "message": "Injected by bench", "status": status}}, status_code=code)
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        accepted = random.random() < accept_rate
+        verdict = {
+            "status": "accepted" if accepted else "wrong_answer",
+            "score": 100 if accepted else 0,
+            "feedback": "Bench feedback: the solution reads both integers and prints their sum.",
+        }
+        prompt_tokens = len(prompt) // 4 + 1
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": json.dumps(verdict)}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": 40, "totalTokenCount": prompt_tokens + 40},
+        }
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    """Runs an ASGI app on 127.0.0.1:port in a daemon thread; returns once it accepts connections."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", lifespan="on"))
+    threading.Thread(target=server.run, daemon=True, name=f"bench-server-{port}").start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"Server on port {port} did not start")
+        time.sleep(0.05)
+    return server
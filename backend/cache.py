@@ -0,0 +1,92 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from redis.exceptions import RedisError
+from redis_client import get_redis
+from metrics import spawn_background
+
+class TTLCache:
+    """
+    Small in-process LRU cache with per-entry expiry.
+    Not shared between Gunicorn workers; use Redis where that matters.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self.data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self.data[key]
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        self.data[key] = (time.monotonic() + self.ttl, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self.data), "hits": self.hits, "misses": self.misses}
+
+class SharedTTLCache(TTLCache):
+    """
+    TTLCache whose invalidations reach every worker: invalidate() drops the
+    key here and publishes it on a Redis channel that each process listens
+    to. Without Redis it is a plain per-process cache, so pick a short ttl.
+    Messages lost while a listener reconnects are covered by clearing the
+    cache on reconnect, and by the ttl.
+    """
+
+    def __init__(self, channel: str, maxsize: int = 1024, ttl: float = 300):
+        super().__init__(maxsize, ttl)
+        self.channel = channel
+        self.listener: Optional[asyncio.Task] = None
+
+    def set(self, key: Hashable, value: Any):
+        # Cached entries exist only after the first set, so listen from then on
+        if get_redis() and (self.listener is None or self.listener.done()):
+            self.listener = spawn_background(self._listen())
+        super().set(key, value)
+
+    async def invalidate(self, key: str):
+        self.pop(key)
+        client = get_redis()
+        if client:
+            try:
+                await client.publish(self.channel, key)
+            except RedisError as e:
+                print(f"Could not broadcast invalidation of {key} on {self.channel}: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                try:
+                    while True:
+                        message = await pubsub.get_message(timeout=1.0)
+                        if message and message["type"] == "message":
+                            self.pop(message["data"])
+                finally:
+                    await pubsub.aclose()
+            except Exception as e:
+                print(f"Cache invalidation listener on {self.channel} error: {e}")
+                self.clear()  # invalidations may have been missed
+                await asyncio.sleep(1)
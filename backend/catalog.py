@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+from typing import Awaitable, Callable, Hashable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from cache import TTLCache
+from redis_client import get_redis
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))  # seconds, upper bound on staleness without Redis
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))  # responses kept per worker
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "0"))  # browser/CDN freshness before revalidating
+
+VERSION_KEY = "minicode:catalog:version"
+
+# Responses are cached per catalog version, so bumping the version on any
+# problem or test-case write makes every older entry unreachable at once.
+_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+_local_version = 0
+
+async def catalog_version() -> int:
+    client = get_redis()
+    if client:
+        return int(await client.get(VERSION_KEY) or 0)
+    return _local_version
+
+async def invalidate_catalog():
+    """Call after committing any change to problems or test cases."""
+    global _local_version
+    client = get_redis()
+    if client:
+        await client.incr(VERSION_KEY)
+    else:
+        _local_version += 1
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+async def cached_response(
+    request: Request,
+    key: Hashable,
+    load: Callable[[], Awaitable[tuple[object, dict]]],
+) -> Response:
+    """
+    Serves a catalog read from the cache, or from `load()` (returning the payload
+    and any extra headers) on a miss. Responses carry a strong ETag over the
+    body, and a matching If-None-Match gets an empty 304.
+    """
+    version = await catalog_version()
+    entry = _cache.get((version, key))
+    if entry is None:
+        payload, headers = await load()
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = (body, etag, headers)
+        _cache.set((version, key), entry)
+
+    body, etag, headers = entry
+    headers = {
+        **headers,
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CATALOG_MAX_AGE}, must-revalidate",
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
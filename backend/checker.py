@@ -0,0 +1,52 @@
+import math
+from itertools import zip_longest
+from typing import BinaryIO, Iterator, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+def tokens(stream: BinaryIO) -> Iterator[bytes]:
+    """Whitespace-separated tokens of a binary stream, read in fixed-size chunks."""
+    pending = bytearray()  # token cut off at the end of the previous chunk
+    while chunk := stream.read(CHUNK_SIZE):
+        parts = chunk.split()
+        if pending and (not parts or chunk[:1].isspace()):
+            yield bytes(pending)
+            pending.clear()
+        if not parts:
+            continue
+        pending += parts[0]
+        if len(parts) == 1 and not chunk[-1:].isspace():
+            continue
+        yield bytes(pending)
+        pending.clear()
+        yield from parts[1:-1]
+        if len(parts) > 1:
+            if chunk[-1:].isspace():
+                yield parts[-1]
+            else:
+                pending += parts[-1]
+    if pending:
+        yield bytes(pending)
+
+def tokens_match(actual: bytes, expected: bytes, float_tolerance: Optional[float] = None) -> bool:
+    """Exact match, or both numbers within `float_tolerance` absolute or relative error."""
+    if actual == expected:
+        return True
+    if float_tolerance is None:
+        return False
+    try:
+        a, e = float(actual), float(expected)
+    except ValueError:
+        return False
+    return math.isclose(a, e, rel_tol=float_tolerance, abs_tol=float_tolerance)
+
+def compare_streams(actual: BinaryIO, expected: BinaryIO, float_tolerance: Optional[float] = None) -> bool:
+    """
+    Token-wise output check that never holds more than a chunk and one token
+    of either side in memory. Whitespace (including line breaks) only
+    separates tokens.
+    """
+    for a, e in zip_longest(tokens(actual), tokens(expected)):
+        if a is None or e is None or not tokens_match(a, e, float_tolerance):
+            return False
+    return True
@@ -0,0 +1,92 @@
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from cache import TTLCache
+from redis_client import get_redis
+from metrics import spawn_background
+
+SUBMISSION_EVENTS_CHANNEL = "minicode:submission:events"
+LAST_EVENT_PREFIX = "minicode:submission:last:"
+LAST_EVENT_TTL = int(os.getenv("SUBMISSION_EVENT_TTL", "3600"))  # seconds the latest stage stays replayable
+
+# Stages, in order: queued -> fetching -> running (test N of M) -> ai_review -> done
+FINAL_STAGE = "done"
+
+class SubmissionEvents:
+    """
+    Fans submission stage changes out to streaming clients.
+
+    Publishers (API and judge processes) send every event to one Redis pub/sub
+    channel. Each API worker holds a single subscription to that channel and
+    hands events to its local subscribers, so the Redis connection count does
+    not grow with the number of open streams. Without Redis, events go straight
+    to the local subscribers of this process.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[int, set[asyncio.Queue]] = {}
+        self.last_local = TTLCache(maxsize=10000, ttl=LAST_EVENT_TTL)
+        self.listener: Optional[asyncio.Task] = None
+
+    async def publish(self, submission_id: int, stage: str, **data):
+        event = {"id": submission_id, "stage": stage, **data}
+        client = get_redis()
+        try:
+            if client:
+                message = json.dumps(event)
+                await client.set(f"{LAST_EVENT_PREFIX}{submission_id}", message, ex=LAST_EVENT_TTL)
+                await client.publish(SUBMISSION_EVENTS_CHANNEL, message)
+            else:
+                self.last_local.set(submission_id, event)
+                self._deliver(event)
+        except Exception as e:
+            # Progress is best effort; clients fall back to polling GET /submissions/{id}
+            print(f"Could not publish event for submission {submission_id}: {e}")
+
+    async def last_event(self, submission_id: int) -> Optional[dict]:
+        client = get_redis()
+        if not client:
+            return self.last_local.get(submission_id)
+        message = await client.get(f"{LAST_EVENT_PREFIX}{submission_id}")
+        return json.loads(message) if message else None
+
+    @asynccontextmanager
+    async def subscribe(self, submission_id: int):
+        """Yields a queue receiving this submission's events until the block exits."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self.subscribers.setdefault(submission_id, set()).add(queue)
+        if get_redis() and (self.listener is None or self.listener.done()):
+            self.listener = spawn_background(self._listen())
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers.get(submission_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.subscribers[submission_id]
+
+    def _deliver(self, event: dict):
+        for queue in self.subscribers.get(event["id"], ()):
+            if not queue.full():
+                queue.put_nowait(event)
+
+    async def _listen(self):
+        while self.subscribers:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(SUBMISSION_EVENTS_CHANNEL)
+                try:
+                    while self.subscribers:
+                        message = await pubsub.get_message(timeout=1.0)
+                        if message and message["type"] == "message":
+                            self._deliver(json.loads(message["data"]))
+                finally:
+                    await pubsub.aclose()
+            except Exception as e:
+                print(f"Submission event listener error: {e}")
+                await asyncio.sleep(1)
+
+submission_events = SubmissionEvents()
@@ -0,0 +1,113 @@
+"""
+Pre-warmed execution worker for Python submissions, run as its own interpreter:
+
+    python -E -s exec_worker.py MEMORY_BYTES
+
+The interpreter starts once and then serves one job per line of JSON on
+stdin. For each job it forks a child that applies the rlimits, redirects its
+stdio to the job's files and runs the entry point with runpy, so a test costs
+a fork instead of a full interpreter start. The worker waits for the child
+with wait4, enforces the wall-clock limit, and answers with one JSON line of
+exit code and rusage. The worker itself is capped at MEMORY_BYTES of address
+space, runs inside the executor's bubblewrap jail with only its own
+directory writable, and is replaced by the pool after a number of jobs.
+"""
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import signal
+import resource
+import traceback
+
+# Modules most solutions import, loaded once here instead of once per test
+import math, heapq, bisect, string, itertools, functools, collections  # noqa: E401,F401
+
+def redirect(fd: int, path: str, flags: int):
+    opened = os.open(path, flags, 0o600)
+    os.dup2(opened, fd)
+    os.close(opened)
+
+def run_child(job: dict):
+    """Runs in the forked child; never returns."""
+    code = 1
+    try:
+        os.setsid()  # own process group, so the worker can kill everything it spawns
+        resource.setrlimit(resource.RLIMIT_CPU, (job["cpu"], job["cpu"] + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (job["memory"], job["memory"]))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (job["output"], job["output"]))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))  # no forks or threads from student code
+        redirect(0, job["stdin"], os.O_RDONLY)
+        redirect(1, job["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        redirect(2, job["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        # Fresh stream objects: the worker's own may hold buffered job lines
+        sys.stdin = io.TextIOWrapper(io.BufferedReader(io.FileIO(0, "r", closefd=False)), encoding="utf-8")
+        sys.stdout = io.TextIOWrapper(io.BufferedWriter(io.FileIO(1, "w", closefd=False)), encoding="utf-8")
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8", errors="backslashreplace", write_through=True)
+        os.chdir(job["workdir"])
+        sys.argv = [job["entry"]]
+        sys.path[0] = job["workdir"]
+
+        code = 0
+        try:
+            runpy.run_path(job["entry"], run_name="__main__")
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        sys.stdout.flush()
+    except BaseException:
+        code = code or 1
+    finally:
+        os._exit(code)
+
+def run_job(job: dict) -> dict:
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        run_child(job)
+
+    deadline = start + job["wall"]
+    timed_out = False
+    delay = 0.0005
+    while True:
+        waited, status, usage = os.wait4(pid, os.WNOHANG)
+        if waited:
+            break
+        if time.perf_counter() > deadline:
+            timed_out = True
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                os.kill(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.01)
+
+    return {
+        "returncode": os.waitstatus_to_exitcode(status),
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "memory_kb": usage.ru_maxrss,
+        "wall_time": time.perf_counter() - start,
+        "timed_out": timed_out,
+    }
+
+def main():
+    memory = int(sys.argv[1])
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    for line in sys.stdin.buffer:
+        result = run_job(json.loads(line))
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import threading
+import itertools
+import subprocess
+import queue
+import shutil
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional
+from models import TestCase
+from checker import compare_streams
+from testdata import materialize, open_expected
+
+EXEC_TIME_LIMIT = float(os.getenv("EXEC_TIME_LIMIT", "2"))  # CPU seconds per test case
+EXEC_WALL_LIMIT = float(os.getenv("EXEC_WALL_LIMIT", str(EXEC_TIME_LIMIT * 3)))  # catches sleeping / blocked code
+EXEC_MEMORY_LIMIT_MB = int(os.getenv("EXEC_MEMORY_LIMIT_MB", "256"))
+EXEC_OUTPUT_LIMIT_KB = int(os.getenv("EXEC_OUTPUT_LIMIT_KB", "1024"))
+# Pre-warmed workers running test cases in parallel; 0 falls back to one cold process per test
+EXEC_POOL_SIZE = int(os.getenv("EXEC_POOL_SIZE", str(os.cpu_count() or 2)))
+EXEC_WORKER_MAX_RUNS = int(os.getenv("EXEC_WORKER_MAX_RUNS", "200"))  # tests before a worker is replaced
+EXEC_WORKER_MEMORY_MB = int(os.getenv("EXEC_WORKER_MEMORY_MB", "512"))  # address space cap of each worker
+EXEC_FAIL_FAST = os.getenv("EXEC_FAIL_FAST", "0") == "1"  # skip remaining tests after a failure
+# Isolation of student code: "bwrap" jails every run in fresh user, pid,
+# network, mount and IPC namespaces; "none" relies on rlimits alone (local dev
+# only); "auto" uses bwrap when it works here and warns otherwise
+EXEC_SANDBOX = os.getenv("EXEC_SANDBOX", "auto")
+# Parent of the work directories; a jailed run sees only its own one
+EXEC_ROOT = os.getenv("EXEC_ROOT", os.path.join(tempfile.gettempdir(), "minicode-exec"))
+
+# Languages the engine can run locally, mapped to (source file, command)
+RUNNERS = {
+    "python": ("solution.py", [sys.executable, "-E", "-s", "solution.py"]),
+}
+
+# Languages whose entry point the pre-warmed workers can run in-process
+WARM_LANGUAGES = {"python"}
+
+SANDBOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox.py")
+EXEC_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exec_worker.py")
+SANDBOX_ENV = {"PATH": os.environ.get("PATH", ""), "PYTHONIOENCODING": "utf-8"}
+SANDBOX_UID = 65534  # "nobody" inside the jail's user namespace
+
+# Read-only system paths a jailed interpreter needs; nothing under the app
+# directory, /etc or /home is visible
+JAIL_SYSTEM_PATHS = ("/usr", "/lib", "/lib64", "/lib32", "/bin", "/sbin")
+
+STDERR_TAIL_CHARS = 2000
+
+_jail_checked: Optional[bool] = None
+_jail_lock = threading.Lock()
+
+def jail_command(command: list[str], writable: str) -> list[str]:
+    """
+    Wraps `command` in bubblewrap: no network, its own /proc (so no other
+    process's environ or memory is visible), an empty environment, uid
+    SANDBOX_UID without capabilities, and `writable` as the only writable
+    directory. The jail dies with its parent.
+    """
+    args = [
+        shutil.which("bwrap") or "bwrap",
+        "--unshare-all", "--die-with-parent", "--new-session", "--cap-drop", "ALL",
+        "--uid", str(SANDBOX_UID), "--gid", str(SANDBOX_UID),
+        "--clearenv", "--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp",
+    ]
+    for name, value in SANDBOX_ENV.items():
+        args += ["--setenv", name, value]
+    prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix}
+    for path in sorted(set(JAIL_SYSTEM_PATHS) | prefixes):
+        if os.path.islink(path):
+            args += ["--symlink", os.readlink(path), path]
+        elif os.path.isdir(path):
+            args += ["--ro-bind", path, path]
+    args += ["--ro-bind", SANDBOX, SANDBOX, "--ro-bind", EXEC_WORKER, EXEC_WORKER]
+    args += ["--bind", writable, writable, "--chdir", writable, "--", *command]
+    return args
+
+def use_jail() -> bool:
+    """
+    Whether runs go through bwrap. Checked once per process by starting a
+    jailed interpreter; with EXEC_SANDBOX=bwrap a failure raises, so judging
+    stops instead of running student code unconfined.
+    """
+    global _jail_checked
+    if EXEC_SANDBOX == "none":
+        return False
+    with _jail_lock:
+        if _jail_checked is None:
+            error = None
+            if not shutil.which("bwrap"):
+                error = "bwrap is not installed"
+            else:
+                probe = subprocess.run(
+                    jail_command([sys.executable, "-I", "-S", "-c", "pass"], exec_root()),
+                    env=SANDBOX_ENV, capture_output=True, timeout=30,
+                )
+                if probe.returncode != 0:
+                    error = probe.stderr.decode(errors="replace").strip() or f"exit code {probe.returncode}"
+            if error and EXEC_SANDBOX == "bwrap":
+                raise RuntimeError(f"Execution sandbox unavailable: {error}")
+            if error:
+                print(f"WARNING: running student code without a sandbox ({error}); set EXEC_SANDBOX=bwrap in production")
+            _jail_checked = error is None
+        return _jail_checked
+
+def output_matches(stdout_path: str, tc: TestCase, float_tolerance: Optional[float]) -> bool:
+    """Streams the program's output against the expected output, token by token."""
+    with open(stdout_path, "rb") as actual, open_expected(tc) as expected:
+        return compare_streams(actual, expected, float_tolerance)
+
+def classify(
+    report: dict,
+    stdout_path: str,
+    error: str,
+    tc: TestCase,
+    float_tolerance: Optional[float],
+    wall_time: float,
+    timed_out: bool,
+) -> dict:
+    """Turns one run's exit status, rusage and output into a per-test result."""
+    cpu_time = report["cpu_time"]
+    memory_kb = report["memory_kb"]
+    returncode = report["returncode"]
+    killed_by = -returncode if returncode < 0 else None
+
+    if timed_out or killed_by == signal.SIGXCPU or cpu_time > EXEC_TIME_LIMIT:
+        status = "tle"
+    elif "MemoryError" in error or memory_kb >= EXEC_MEMORY_LIMIT_MB * 1024:
+        status = "mle"
+    elif killed_by == signal.SIGXFSZ:
+        status = "runtime_error"
+        error = "Output limit exceeded"
+    elif returncode != 0:
+        status = "runtime_error"
+    elif not output_matches(stdout_path, tc, float_tolerance):
+        status = "wrong_answer"
+    else:
+        status = "accepted"
+
+    return {
+        "status": status,
+        "time": round(cpu_time, 3),
+        "wall_time": round(wall_time, 3),
+        "memory_kb": memory_kb,
+        "stderr": error[-STDERR_TAIL_CHARS:],
+    }
+
+def test_paths(workdir: str, index: int) -> tuple[str, str, str]:
+    """Per-test stdin/stdout/stderr files, so tests can share one workdir concurrently."""
+    return tuple(os.path.join(workdir, f"{name}-{index}.txt") for name in ("input", "output", "error"))
+
+def read_stderr(stderr_path: str) -> str:
+    """The end of the program's stderr, where the traceback's last line is."""
+    with open(stderr_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - STDERR_TAIL_CHARS * 4))
+        return f.read().decode("utf-8", errors="replace")
+
+def prepare_stdin(tc: TestCase, stdin_path: str) -> str:
+    """Writes the test's input to its stdin file, decompressing stored inputs."""
+    if tc.input_hash:
+        return materialize(tc.input_hash, stdin_path)
+    with open(stdin_path, "wb") as f:
+        f.write(tc.input_data.encode("utf-8"))
+    return stdin_path
+
+def run_test(workdir: str, command: list[str], tc: TestCase, index: int = 0, float_tolerance: Optional[float] = None) -> dict:
+    """
+    Runs one test case through the sandbox launcher in a fresh process group.
+    stdin/stdout/stderr are files in the sandbox directory, so there is no pipe
+    juggling and RLIMIT_FSIZE caps the output size. This is the cold path, used
+    when the execution pool is disabled.
+    """
+    stdin_path, stdout_path, stderr_path = test_paths(workdir, index)
+    report_path = os.path.join(workdir, f"report-{index}.json")
+    stdin_path = prepare_stdin(tc, stdin_path)
+    if os.path.exists(report_path):
+        os.remove(report_path)
+
+    limits = [str(cpu_limit()), str(memory_limit()), str(output_limit())]
+    launcher = [sys.executable, "-I", "-S", SANDBOX, report_path, *limits, "--", *command]
+    timed_out = False
+    with open(stdin_path, "rb") as stdin, open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+        start = time.perf_counter()
+        # Killing bwrap's process group takes the whole jail with it (--die-with-parent)
+        proc = subprocess.Popen(
+            jail_command(launcher, workdir) if use_jail() else launcher,
+            cwd=workdir,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            env=SANDBOX_ENV,
+            start_new_session=True,
+        )
+        try:
+            proc.wait(timeout=EXEC_WALL_LIMIT)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        wall_time = time.perf_counter() - start
+    os.remove(stdin_path)  # a decompressed input only lives for its run
+
+    report = {"returncode": -signal.SIGKILL, "cpu_time": wall_time, "memory_kb": 0}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    return classify(report, stdout_path, read_stderr(stderr_path), tc, float_tolerance, wall_time, timed_out)
+
+def exec_root() -> str:
+    """Creates EXEC_ROOT. Jails bind a directory below it, never the root itself."""
+    os.makedirs(EXEC_ROOT, mode=0o700, exist_ok=True)
+    return EXEC_ROOT
+
+def cpu_limit() -> int:
+    return max(1, int(EXEC_TIME_LIMIT + 0.999))
+
+def memory_limit() -> int:
+    return EXEC_MEMORY_LIMIT_MB * 1024 * 1024
+
+def output_limit() -> int:
+    return EXEC_OUTPUT_LIMIT_KB * 1024
+
+class ExecWorker:
+    """
+    One pre-warmed exec_worker.py interpreter, driven over its stdin/stdout
+    pipes. Its jail binds only the worker's own directory, which holds the
+    files of the one test it is running and is emptied after each test.
+    """
+
+    def __init__(self):
+        worker_memory = max(EXEC_WORKER_MEMORY_MB, EXEC_MEMORY_LIMIT_MB + 64) * 1024 * 1024
+        command = [sys.executable, "-E", "-s", EXEC_WORKER, str(worker_memory)]
+        self.root = tempfile.mkdtemp(prefix="worker-", dir=exec_root())
+        # The whole worker lives in the jail, so every test it forks does too
+        try:
+            self.proc = subprocess.Popen(
+                jail_command(command, self.root) if use_jail() else command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.root,
+                env=SANDBOX_ENV,
+                start_new_session=True,
+            )
+        except OSError:
+            shutil.rmtree(self.root, ignore_errors=True)
+            raise
+        self.runs = 0
+
+    def stage(self, files: dict[str, str]):
+        """Writes a submission's source files into the worker's directory."""
+        for path, content in files.items():
+            full_path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(content)
+
+    def reset(self) -> bool:
+        """Empties the worker's directory for the next test; False if anything is left."""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return not os.listdir(self.root)
+
+    def run(self, job: dict) -> dict:
+        self.proc.stdin.write((json.dumps(job) + "\n").encode())
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Execution worker exited with code {self.proc.wait()}")
+        self.runs += 1
+        return json.loads(line)
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+class ExecutionPool:
+    """
+    EXEC_POOL_SIZE pre-started workers shared by every judge thread in this
+    process. A test borrows an idle worker, which forks the solution from an
+    already-initialized interpreter. Workers are replaced after
+    EXEC_WORKER_MAX_RUNS tests or when they die, and each one is capped at
+    EXEC_WORKER_MEMORY_MB of address space on top of the per-test limits.
+    """
+
+    def __init__(self, size: int = EXEC_POOL_SIZE):
+        self.size = size
+        self.idle: queue.Queue = queue.Queue()
+        self.busy = 0
+        self.spawned = 0
+        self.recycled = 0
+        self.lock = threading.Lock()
+        # Dispatch threads only wait on workers, so one per worker is enough
+        self.dispatch = ThreadPoolExecutor(max_workers=size, thread_name_prefix="exec")
+        for _ in range(size):
+            self.idle.put(self._spawn())
+
+    def _spawn(self) -> Optional[ExecWorker]:
+        try:
+            worker = ExecWorker()
+        except (OSError, RuntimeError) as e:
+            print(f"Could not start execution worker: {e}")
+            return None
+        with self.lock:
+            self.spawned += 1
+        return worker
+
+    @contextmanager
+    def borrow(self):
+        """
+        Lends an idle, running worker with an empty directory. On return the
+        directory is emptied; a worker that died, ran EXEC_WORKER_MAX_RUNS
+        tests or could not be emptied is replaced.
+        """
+        worker = self.idle.get()
+        with self.lock:
+            self.busy += 1
+        try:
+            if worker is not None and worker.proc.poll() is not None:
+                worker.close()
+                worker = None
+            if worker is None:
+                worker = self._spawn()
+                if worker is None:
+                    raise RuntimeError("No execution worker available")
+            yield worker
+        finally:
+            if worker is not None and (worker.proc.poll() is not None or worker.runs >= EXEC_WORKER_MAX_RUNS or not worker.reset()):
+                worker.close()
+                worker = None
+                with self.lock:
+                    self.recycled += 1
+            with self.lock:
+                self.busy -= 1
+            self.idle.put(worker)
+
+    def close(self):
+        """Stops the idle workers and removes their directories."""
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.close()
+
+    def stats(self) -> dict:
+        return {"size": self.size, "busy": self.busy, "spawned": self.spawned, "recycled": self.recycled}
+
+_pool: Optional[ExecutionPool] = None
+_pool_lock = threading.Lock()
+
+def get_execution_pool() -> Optional[ExecutionPool]:
+    """The process-wide pool, started on first use; None when EXEC_POOL_SIZE is 0."""
+    global _pool
+    if EXEC_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExecutionPool()
+            atexit.register(_pool.close)
+        return _pool
+
+def execution_pool_stats() -> Optional[dict]:
+    """Stats of the pool if this process started one (never starts it)."""
+    return _pool.stats() if _pool else None
+
+def run_pooled(pool: ExecutionPool, files: dict[str, str], entry: str, tc: TestCase, index: int, float_tolerance: Optional[float] = None) -> dict:
+    """
+    Runs one test case on a pre-warmed worker of the pool. The sources and
+    the input are staged in the worker's own directory, so the run cannot
+    see the files of any other test or submission.
+    """
+    for attempt in range(2):
+        with pool.borrow() as worker:
+            workdir = worker.root
+            worker.stage(files)
+            stdin_path, stdout_path, stderr_path = test_paths(workdir, index)
+            stdin_path = prepare_stdin(tc, stdin_path)
+            try:
+                report = worker.run({
+                    "workdir": workdir,
+                    "entry": os.path.join(workdir, entry),
+                    "stdin": stdin_path,
+                    "stdout": stdout_path,
+                    "stderr": stderr_path,
+                    "cpu": cpu_limit(),
+                    "memory": memory_limit(),
+                    "output": output_limit(),
+                    "wall": EXEC_WALL_LIMIT,
+                })
+            except (OSError, RuntimeError, ValueError) as e:
+                # The worker itself failed (not the solution); retry once on a fresh one
+                print(f"Execution worker failed: {e}")
+                worker.close()
+                if attempt:
+                    raise
+                continue
+            return classify(report, stdout_path, read_stderr(stderr_path), tc, float_tolerance, report["wall_time"], report["timed_out"])
+
+SKIPPED = {"status": "skipped", "time": 0.0, "wall_time": 0.0, "memory_kb": 0, "stderr": ""}
+
+def run_tests(
+    files: dict[str, str],
+    test_cases: list[TestCase],
+    language: str = "python",
+    on_test: Optional[Callable[[int, int], None]] = None,
+    fail_fast: bool = EXEC_FAIL_FAST,
+    float_tolerance: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Executes the submission against every test case and decides the verdict.
+    `files` maps repository paths to contents and must contain the entry point.
+    Test cases run in parallel on the execution pool when it is enabled.
+    `on_test(n, total)` is called as test n (1-based) starts. With `fail_fast`,
+    tests that have not started when one fails are reported as "skipped".
+    Output is checked token by token; with `float_tolerance`, numeric tokens
+    may differ by that absolute or relative error.
+    Returns None when the language has no local runner or the entry point is
+    missing, so callers can fall back to the AI-only judge.
+    """
+    language = (language or "python").lower()
+    runner = RUNNERS.get(language)
+    if not runner or not test_cases or runner[0] not in files:
+        return None
+    source_file, command = runner
+    pool = get_execution_pool() if language in WARM_LANGUAGES else None
+
+    results: list[Optional[dict]] = [None] * len(test_cases)
+    failed = threading.Event()
+    started = itertools.count(1)
+    use_jail()  # raises before anything runs if the required sandbox is unavailable
+    with tempfile.TemporaryDirectory(prefix="minicode-", dir=exec_root()) as workdir:
+        # Cold runs share one workdir; pool workers stage the sources per test
+        if not pool:
+            for path, content in files.items():
+                full_path = os.path.join(workdir, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "w") as f:
+                    f.write(content)
+
+        def run_one(i: int):
+            if fail_fast and failed.is_set():
+                results[i] = dict(SKIPPED)
+                return
+            if on_test:
+                on_test(next(started), len(test_cases))
+            if pool:
+                results[i] = run_pooled(pool, files, source_file, test_cases[i], i, float_tolerance)
+            else:
+                results[i] = run_test(workdir, command, test_cases[i], i, float_tolerance)
+            if results[i]["status"] != "accepted":
+                failed.set()
+
+        if pool:
+            for future in [pool.dispatch.submit(run_one, i) for i in range(len(test_cases))]:
+                future.result()
+        else:
+            for i in range(len(test_cases)):
+                run_one(i)
+
+    passed = sum(1 for r in results if r["status"] == "accepted")
+    failed_result = next((r for r in results if r["status"] not in ("accepted", "skipped")), None)
+    return {
+        "status": failed_result["status"] if failed_result else "accepted",
+        "score": round(100 * passed / len(results)),
+        "passed": passed,
+        "total": len(results),
+        "time_taken": max(r["time"] for r in results),
+        "memory_used": max(r["memory_kb"] for r in results),
+        "results": results,
+    }
+
+def summarize_results(execution: dict) -> str:
+    """Human-readable per-test report stored in Submission.judge_output."""
+    lines = [f"Passed {execution['passed']}/{execution['total']} test cases."]
+    for i, r in enumerate(execution["results"]):
+        lines.append(f"Test Case {i+1}: {r['status']} ({r['time']:.3f}s, {r['memory_kb']} KB)")
+        if r["status"] == "runtime_error" and r["stderr"].strip():
+            lines.append(f"  {r['stderr'].strip().splitlines()[-1]}")
+    return "\n".join(lines)
@@ -0,0 +1,193 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Optional
+from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types as genai_types
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_API_URL = os.getenv("GEMINI_API_URL")  # optional endpoint override, e.g. the bench.py stand-in
+# Quotas are per process: split the project's quota across API/judge processes
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1"))  # seconds
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "60"))  # seconds
+GEMINI_OUTPUT_TOKENS = 1024  # expected response size, reserved up front
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_client: Optional[genai.Client] = None
+
+class GeminiRateLimited(Exception):
+    """Gemini kept answering 429 after every retry; the caller should try again later."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__(f"Gemini rate limit exceeded (retry after {retry_after or 'unknown'}s)")
+        self.retry_after = retry_after
+
+def get_gemini_client() -> Optional[genai.Client]:
+    """Shared client so HTTP connections are reused between submissions; None without an API key."""
+    global _client
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    if _client is None:
+        http_options = genai_types.HttpOptions(base_url=GEMINI_API_URL) if GEMINI_API_URL else None
+        _client = genai.Client(api_key=api_key, http_options=http_options)
+    return _client
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size (about 4 characters per token), used until Gemini reports the real count."""
+    return len(text) // 4 + 1
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units; waiters are served in arrival order."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def charge(self, amount: float):
+        """Corrects an earlier reservation once the real usage is known (negative refunds)."""
+        self._refill()
+        self.tokens = max(-self.capacity, min(self.capacity, self.tokens - amount))
+
+def _retry_after(error: genai_errors.APIError) -> Optional[float]:
+    """Reads the server's requested delay from the Retry-After header or the RetryInfo detail."""
+    headers = getattr(error.response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    details = error.details.get("error", {}).get("details", []) if isinstance(error.details, dict) else []
+    for detail in details:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if delay and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+    return None
+
+class GeminiLimiter:
+    """
+    Funnels every Gemini call in this process through a concurrency cap and
+    request/token buckets sized from GEMINI_RPM / GEMINI_TPM. 429 and 5xx
+    responses are retried with full-jitter exponential backoff; a 429 that
+    names a delay pauses all callers until it passes, so the process backs off
+    as a whole instead of every call burning its own retries.
+    """
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        self.requests = TokenBucket(GEMINI_RPM)
+        self.tokens = TokenBucket(GEMINI_TPM)
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+        self.latencies = deque(maxlen=500)  # seconds per successful call
+        self.waits = deque(maxlen=500)  # seconds spent queued before the first attempt
+
+    async def _admit(self, estimated_tokens: int):
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+    async def generate(self, prompt: str):
+        client = get_gemini_client()
+        if client is None:
+            raise RuntimeError("GEMINI_API_KEY is not set")
+        estimated = estimate_tokens(prompt) + GEMINI_OUTPUT_TOKENS
+        self.counters["calls"] += 1
+        self.waiting += 1
+        queued_at = time.monotonic()
+        queued = True
+        try:
+            async with self.semaphore:
+                for attempt in range(GEMINI_MAX_RETRIES + 1):
+                    await self._admit(estimated)
+                    if queued:
+                        queued = False
+                        self.waiting -= 1
+                        self.waits.append(time.monotonic() - queued_at)
+
+                    started = time.monotonic()
+                    self.in_flight += 1
+                    try:
+                        response = await client.aio.models.generate_content(model=GEMINI_MODEL, contents=prompt)
+                    except genai_errors.APIError as e:
+                        if e.code not in RETRYABLE_STATUS:
+                            raise
+                        retry_after = _retry_after(e)
+                        if e.code == 429:
+                            self.counters["rate_limited"] += 1
+                            if retry_after:
+                                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                        if attempt == GEMINI_MAX_RETRIES:
+                            if e.code == 429:
+                                raise GeminiRateLimited(retry_after) from e
+                            raise
+                        delay = retry_after or random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+                        print(f"Gemini returned {e.code}; retrying in {delay:.1f}s (attempt {attempt + 1}/{GEMINI_MAX_RETRIES})")
+                        self.counters["retries"] += 1
+                        await asyncio.sleep(delay)
+                        continue
+                    finally:
+                        self.in_flight -= 1
+
+                    self.latencies.append(time.monotonic() - started)
+                    usage = getattr(response, "usage_metadata", None)
+                    if usage and usage.total_token_count:
+                        self.tokens.charge(usage.total_token_count - estimated)
+                    self.counters["succeeded"] += 1
+                    return response
+        except BaseException:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            if queued:
+                self.waiting -= 1
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        def pct(values, p):
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 3) if values else None
+        return {
+            **self.counters,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "paused_for": max(0.0, round(self.paused_until - time.monotonic(), 1)),
+            "latency_p50": pct(latencies, 50),
+            "latency_p95": pct(latencies, 95),
+            "queue_wait_avg": round(sum(self.waits) / len(self.waits), 3) if self.waits else None,
+            "limits": {"rpm": GEMINI_RPM, "tpm": GEMINI_TPM, "concurrency": GEMINI_CONCURRENCY},
+        }
+
+gemini_limiter = GeminiLimiter()
@@ -0,0 +1,200 @@
+import os
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from contextlib import asynccontextmanager
+from typing import Mapping, Optional
+from github import Github
+from cache import TTLCache
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TOKEN_CONCURRENCY = int(os.getenv("GITHUB_TOKEN_CONCURRENCY", "4"))  # calls in flight per token
+# Calls left in a token's hourly quota that background work (provisioning,
+# rejudge fetches) leaves untouched, so the student can still be judged
+GITHUB_BACKGROUND_RESERVE = int(os.getenv("GITHUB_BACKGROUND_RESERVE", "200"))
+GITHUB_SECONDARY_LIMIT_WAIT = 60.0  # seconds, when GitHub throttles without saying how long
+
+# Priorities, most urgent first
+JUDGE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {JUDGE: "judge", BACKGROUND: "background"}
+RESERVE = {JUDGE: 0, BACKGROUND: GITHUB_BACKGROUND_RESERVE}
+
+class GitHubRateLimited(Exception):
+    """GitHub throttled (or would throttle) this token; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit exceeded (retry after {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+def token_key(token: str) -> str:
+    """Tokens are tracked by hash and never kept or reported in clear."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def rate_limit_delay(status: int, headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait if a response is a primary or secondary rate limit, else None."""
+    if status not in (403, 429):
+        return None
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    if headers.get("retry-after"):
+        return float(headers["retry-after"])
+    if headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+        return max(1.0, float(headers["x-ratelimit-reset"]) - time.time())
+    if status == 429:
+        return GITHUB_SECONDARY_LIMIT_WAIT
+    return None
+
+class TokenQuota:
+    """What this process knows about one token's quota, plus its call queue."""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.waiters: list = []  # heap of (priority, seq, future)
+
+    def blocked_for(self, priority: int) -> float:
+        """Seconds until a call at `priority` may go out; 0 if it may go now."""
+        now = time.time()
+        if self.paused_until > now:
+            return self.paused_until - now
+        if self.remaining is not None and self.reset_at > now and self.remaining <= RESERVE[priority]:
+            return self.reset_at - now
+        return 0.0
+
+class GitHubScheduler:
+    """
+    One registry for every GitHub call made with a user's token, from the judge
+    (httpx, github_fetch.py) and from provisioning (PyGithub, repo_manager.py).
+
+    Quotas are learned from the X-RateLimit-* headers of every response and
+    from Retry-After on secondary limits. Calls per token are capped at
+    GITHUB_TOKEN_CONCURRENCY and queued by priority, judge fetches first.
+    A call that would run into an exhausted quota is refused with
+    GitHubRateLimited before it is sent; background work also stops
+    GITHUB_BACKGROUND_RESERVE calls short of the limit. Callers defer
+    (requeue or sleep) on that error instead of failing the work.
+    """
+
+    def __init__(self):
+        self.quotas = TTLCache(maxsize=10000, ttl=60 * 60 * 2)
+        self.clients = TTLCache(maxsize=1000, ttl=60 * 60)
+        self.sequence = itertools.count()
+        self.counters = {name: {"calls": 0, "deferred": 0, "throttled": 0} for name in PRIORITY_NAMES.values()}
+
+    def quota(self, token: str) -> TokenQuota:
+        key = token_key(token)
+        quota = self.quotas.get(key)
+        if quota is None:
+            quota = TokenQuota()
+            self.quotas.set(key, quota)
+        return quota
+
+    def github(self, token: str) -> Github:
+        """Pooled PyGithub client per token. Retries are left to the scheduler's callers."""
+        key = token_key(token)
+        client = self.clients.get(key)
+        if client is None:
+            client = Github(token, base_url=GITHUB_API_URL, retry=None)
+            self.clients.set(key, client)
+        return client
+
+    @asynccontextmanager
+    async def slot(self, token: str, priority: int = JUDGE):
+        """Holds one of the token's call slots; raises GitHubRateLimited if the quota is spent."""
+        quota = self.quota(token)
+        counters = self.counters[PRIORITY_NAMES[priority]]
+        delay = quota.blocked_for(priority)
+        if delay > 0:
+            counters["deferred"] += 1
+            raise GitHubRateLimited(delay)
+
+        if quota.in_flight >= GITHUB_TOKEN_CONCURRENCY or quota.waiters:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(quota.waiters, (priority, next(self.sequence), future))
+            try:
+                await future  # the releasing call hands its slot over
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release(quota)
+                raise
+        else:
+            quota.in_flight += 1
+
+        try:
+            delay = quota.blocked_for(priority)  # the quota may have run out while queued
+            if delay > 0:
+                counters["deferred"] += 1
+                raise GitHubRateLimited(delay)
+            counters["calls"] += 1
+            if quota.remaining is not None:
+                quota.remaining -= 1  # reserved now, corrected by the response headers
+            yield
+        finally:
+            self._release(quota)
+
+    def _release(self, quota: TokenQuota):
+        while quota.waiters:
+            _, _, future = heapq.heappop(quota.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        quota.in_flight -= 1
+
+    def observe(self, token: str, status: int, headers: Mapping[str, str], priority: Optional[int] = None):
+        """Updates the token's quota from a response (or an error's) status and headers."""
+        quota = self.quota(token)
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        if headers.get("x-ratelimit-remaining") is not None:
+            quota.remaining = int(headers["x-ratelimit-remaining"])
+            quota.limit = int(headers.get("x-ratelimit-limit") or 0) or quota.limit
+            quota.reset_at = float(headers.get("x-ratelimit-reset") or 0)
+        delay = rate_limit_delay(status, headers)
+        if delay is not None:
+            quota.paused_until = max(quota.paused_until, time.time() + delay)
+            if priority is not None:
+                self.counters[PRIORITY_NAMES[priority]]["throttled"] += 1
+
+    def pause(self, token: str, seconds: float, priority: Optional[int] = None):
+        """Holds every call with the token for `seconds`, after GitHub asked for a wait."""
+        quota = self.quota(token)
+        quota.paused_until = max(quota.paused_until, time.time() + seconds)
+        if priority is not None:
+            self.counters[PRIORITY_NAMES[priority]]["throttled"] += 1
+
+    def observe_github(self, token: str, client: Github):
+        """Copies the quota PyGithub read from its last response."""
+        remaining, limit = client.requester.rate_limiting
+        if remaining >= 0:
+            quota = self.quota(token)
+            quota.remaining, quota.limit = remaining, limit
+            quota.reset_at = float(client.requester.rate_limiting_resettime or 0)
+
+    def stats(self) -> dict:
+        now = time.time()
+        quotas = [(key, q) for key, (_, q) in self.quotas.data.items()]
+        known = sorted((q.remaining, key, q) for key, q in quotas if q.remaining is not None)
+        return {
+            **self.counters,
+            "tokens_tracked": len(quotas),
+            "tokens_blocked": sum(1 for _, q in quotas if q.blocked_for(JUDGE) > 0),
+            "in_flight": sum(q.in_flight for _, q in quotas),
+            "waiting": sum(len(q.waiters) for _, q in quotas),
+            "lowest_quotas": [
+                {
+                    "token": key[:8],
+                    "remaining": remaining,
+                    "limit": q.limit,
+                    "resets_in": max(0, round(q.reset_at - now)),
+                    "paused_for": max(0, round(q.paused_until - now)),
+                }
+                for remaining, key, q in known[:10]
+            ],
+            "limits": {"token_concurrency": GITHUB_TOKEN_CONCURRENCY, "background_reserve": GITHUB_BACKGROUND_RESERVE},
+        }
+
+github_scheduler = GitHubScheduler()
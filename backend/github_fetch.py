@@ -0,0 +1,155 @@
+import io
+import os
+import tarfile
+import hashlib
+import posixpath
+from typing import Optional
+import httpx
+from cache import TTLCache
+from github_client import GITHUB_API_URL, JUDGE, GitHubRateLimited, github_scheduler, rate_limit_delay
+
+GITHUB_FETCH_TIMEOUT = float(os.getenv("GITHUB_FETCH_TIMEOUT", "15"))
+REPO_MAX_ARCHIVE_KB = int(os.getenv("REPO_MAX_ARCHIVE_KB", "5120"))
+REPO_MAX_FILE_KB = int(os.getenv("REPO_MAX_FILE_KB", "256"))
+REPO_MAX_TOTAL_KB = int(os.getenv("REPO_MAX_TOTAL_KB", "1024"))
+REPO_MAX_FILES = int(os.getenv("REPO_MAX_FILES", "50"))
+
+# Source files kept from the archive, by submission language
+SOURCE_EXTENSIONS = {
+    "python": (".py",),
+    "javascript": (".js", ".mjs"),
+    "java": (".java",),
+    "cpp": (".cpp", ".cc", ".h", ".hpp"),
+    "c": (".c", ".h"),
+}
+IGNORED_DIRS = {".git", ".github", "__pycache__", "node_modules", "venv", ".venv", "build", "dist"}
+
+# ETag + SHA of each branch head. Revalidating with If-None-Match returns 304,
+# which GitHub does not count against the token's rate limit.
+_head_cache = TTLCache(maxsize=10000, ttl=60 * 60 * 24)
+# A repo's files at a commit never change, so they are cached by SHA
+_files_cache = TTLCache(maxsize=1000, ttl=60 * 60 * 24)
+
+_client: Optional[httpx.AsyncClient] = None
+
+class GitHubFetchError(Exception):
+    """The code could not be fetched. `retryable` is False when trying again cannot help (4xx, oversized)."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+def _check_response(token: str, response: httpx.Response, priority: int, action: str):
+    """Records the token's quota from the response and raises on anything but 200 / 304."""
+    github_scheduler.observe(token, response.status_code, response.headers, priority)
+    if response.status_code in (200, 304):
+        return
+    delay = rate_limit_delay(response.status_code, response.headers)
+    if delay is not None:
+        raise GitHubRateLimited(delay)
+    raise GitHubFetchError(f"{action}: HTTP {response.status_code}", retryable=response.status_code >= 500)
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client so connections to the GitHub API are kept alive between submissions."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=GITHUB_API_URL, timeout=GITHUB_FETCH_TIMEOUT)
+    return _client
+
+def parse_repo_url(repo_url: str) -> tuple[str, str]:
+    """https://github.com/{owner}/{repo} -> (owner, repo)"""
+    parts = repo_url.rstrip("/").split("/")
+    return parts[-2], parts[-1]
+
+def _headers(token: str, accept: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": accept,
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+async def resolve_head_sha(token: str, owner: str, repo: str, ref: str = "main", priority: int = JUDGE) -> str:
+    """Resolves a branch to its commit SHA, revalidating the cached value with its ETag."""
+    # ETags vary by credentials, so the token is part of the key (hashed, never stored)
+    key = (hashlib.sha256(token.encode()).hexdigest(), owner, repo, ref)
+    cached = _head_cache.get(key)
+    headers = _headers(token, "application/vnd.github.sha")
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
+
+    async with github_scheduler.slot(token, priority):
+        response = await get_client().get(f"/repos/{owner}/{repo}/commits/{ref}", headers=headers)
+    _check_response(token, response, priority, f"Could not resolve {owner}/{repo}@{ref}")
+    if response.status_code == 304:
+        if cached:
+            return cached["sha"]
+        raise GitHubFetchError(f"Could not resolve {owner}/{repo}@{ref}: unexpected 304")
+
+    sha = response.text.strip()
+    if response.headers.get("ETag"):
+        _head_cache.set(key, {"etag": response.headers["ETag"], "sha": sha})
+    return sha
+
+def extract_source_files(archive: bytes, language: str) -> dict[str, str]:
+    """
+    Unpacks a GitHub tarball in memory and keeps the source files for the
+    language, within the per-file, total-size and file-count limits.
+    """
+    extensions = SOURCE_EXTENSIONS.get((language or "python").lower(), SOURCE_EXTENSIONS["python"])
+    files = {}
+    total = 0
+    with tarfile.open(fileobj=io.BytesIO(archive), mode="r:gz") as tar:
+        # Shallow paths first so top-level entry points survive the limits
+        for member in sorted(tar.getmembers(), key=lambda m: (m.name.count("/"), m.name)):
+            if not member.isfile() or member.size > REPO_MAX_FILE_KB * 1024:
+                continue
+            # GitHub prefixes every entry with "{owner}-{repo}-{sha}/"
+            path = posixpath.normpath(member.name.split("/", 1)[-1])
+            parts = path.split("/")
+            if path.startswith("..") or any(p in IGNORED_DIRS for p in parts[:-1]) or not path.endswith(extensions):
+                continue
+            if len(files) >= REPO_MAX_FILES or total + member.size > REPO_MAX_TOTAL_KB * 1024:
+                break
+            files[path] = tar.extractfile(member).read().decode("utf-8", errors="replace")
+            total += member.size
+    return files
+
+async def fetch_repo_files(token: str, owner: str, repo: str, sha: str, language: str, priority: int = JUDGE) -> dict[str, str]:
+    """
+    Downloads the whole repository at a commit as one tarball (a single API
+    call regardless of file count) and returns its filtered source files.
+    """
+    key = (owner, repo, sha, language)
+    files = _files_cache.get(key)
+    if files is not None:
+        return files
+
+    chunks = []
+    size = 0
+    async with github_scheduler.slot(token, priority), get_client().stream(
+        "GET",
+        f"/repos/{owner}/{repo}/tarball/{sha}",
+        headers=_headers(token, "application/vnd.github+json"),
+        follow_redirects=True,
+    ) as response:
+        _check_response(token, response, priority, f"Could not download {owner}/{repo}@{sha[:7]}")
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > REPO_MAX_ARCHIVE_KB * 1024:
+                raise GitHubFetchError(f"Repository archive exceeds {REPO_MAX_ARCHIVE_KB} KB", retryable=False)
+            chunks.append(chunk)
+
+    files = extract_source_files(b"".join(chunks), language)
+    _files_cache.set(key, files)
+    return files
+
+async def fetch_solution(token: str, repo_url: str, language: str = "python", ref: str = "main") -> tuple[str, dict[str, str]]:
+    """
+    Fetches the student's source files at the head of `ref`.
+    Returns (commit_sha, {path: content}). An unchanged repo costs one 304 and no downloads.
+    Raises GitHubRateLimited, without calling GitHub, while the token's quota is spent.
+    """
+    owner, repo = parse_repo_url(repo_url)
+    sha = await resolve_head_sha(token, owner, repo, ref)
+    files = await fetch_repo_files(token, owner, repo, sha, language)
+    return sha, files
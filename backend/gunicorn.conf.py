@@ -0,0 +1,32 @@
+import os
+import glob
+import shutil
+import tempfile
+
+# Read by Gunicorn from the working directory; command-line flags (see the
+# Dockerfile) still set workers, timeouts and logging. These hooks give the
+# workers' Prometheus metrics (metrics.py) a directory that lives exactly as
+# long as this server: it is emptied or created before any worker starts, so
+# counts never carry over from an earlier run.
+
+def on_starting(server):
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for stale in glob.glob(os.path.join(path, "*.db")):
+            os.remove(stale)
+    else:
+        path = tempfile.mkdtemp(prefix="minicode-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path  # inherited by the workers
+        server.minicode_metrics_dir = path  # created here, removed on exit
+
+def child_exit(server, worker):
+    # Drops the worker's live gauges; its counters and histograms keep counting
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    path = getattr(server, "minicode_metrics_dir", None)
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from database import async_session_factory
+from models import JobRecord
+from redis_client import get_redis
+
+# Key/value records with a TTL for background job state, in Redis when
+# configured and in the job_records table otherwise. Either way every worker
+# sees the same records, unlike an in-process dict: a job started on one
+# Gunicorn worker can be polled through any other.
+PURGE_INTERVAL = 60.0  # seconds between deletes of expired rows, per process
+
+REPLACE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+_last_purge = 0.0
+_replace_script = None
+
+async def _purge(session):
+    global _last_purge
+    if time.monotonic() - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = time.monotonic()
+    await session.exec(delete(JobRecord).where(JobRecord.expires_at < datetime.utcnow()))
+
+async def set_value(key: str, value: str, ttl: int, nx: bool = False) -> bool:
+    """Like Redis SET key value EX ttl [NX]; returns False if nx and the key exists."""
+    client = get_redis()
+    if client:
+        return bool(await client.set(key, value, ex=ttl, nx=nx))
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    async with async_session_factory() as session:
+        await _purge(session)
+        if not nx:
+            await session.merge(JobRecord(key=key, value=value, expires_at=expires_at))
+            await session.commit()
+            return True
+        # An expired record does not count as existing
+        await session.exec(delete(JobRecord).where(JobRecord.key == key, JobRecord.expires_at < datetime.utcnow()))
+        session.add(JobRecord(key=key, value=value, expires_at=expires_at))
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            return False
+        return True
+
+async def replace_value(key: str, old: str, new: str, ttl: int) -> bool:
+    """Sets `key` to `new` only if it still holds `old`; False if another writer got there first."""
+    global _replace_script
+    client = get_redis()
+    if client:
+        if _replace_script is None:
+            _replace_script = client.register_script(REPLACE_SCRIPT)
+        return bool(await _replace_script(keys=[key], args=[old, new, ttl]))
+    async with async_session_factory() as session:
+        result = await session.exec(
+            update(JobRecord)
+            .where(JobRecord.key == key, JobRecord.value == old)
+            .values(value=new, expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+async def get_value(key: str) -> Optional[str]:
+    client = get_redis()
+    if client:
+        return await client.get(key)
+    async with async_session_factory() as session:
+        record = await session.get(JobRecord, key)
+    if not record or record.expires_at < datetime.utcnow():
+        return None
+    return record.value
+
+async def delete_value(key: str):
+    client = get_redis()
+    if client:
+        await client.delete(key)
+        return
+    async with async_session_factory() as session:
+        await session.exec(delete(JobRecord).where(JobRecord.key == key))
+        await session.commit()
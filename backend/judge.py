@@ -1,18 +1,28 @@
-import os
 import json
-from google import genai
+import asyncio
+from typing import Awaitable, Callable, Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models import Submission, TestCase, User, Problem
-from github import Github
+from leaderboard import record_verdict
+from analytics import invalidate_problem_analytics
+from executor import run_tests, summarize_results
+from verdict_cache import verdict_cache, verdict_key
+from github_fetch import fetch_solution
+from events import submission_events
+from gemini_client import gemini_limiter, get_gemini_client, estimate_tokens, GeminiRateLimited
+from prompt_builder import render_files, trim_code, trim_text, format_test_cases, PROMPT_PROBLEM_TOKENS, PROMPT_TESTS_TOKENS
+from metrics import JUDGE_STAGE_SECONDS
 
-async def run_ai_judge(user_code: str, problem_desc: str, test_cases_info: str, persona: str = "standard"):
+async def run_ai_judge(user_code: str, problem_desc: str, test_cases_info: str, persona: str = "standard", execution_report: Optional[str] = None):
     """
     Uses Gemini to analyze the code, act as judge, and provide feedback + score.
+    When an execution report is given the verdict is already decided, and
+    Gemini is only asked for qualitative feedback on top of it.
+    Returns (result, error, prompt_tokens).
+    Raises GeminiRateLimited if Gemini is still throttling after every retry.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return None, "AI Judge unavailable (API key missing)."
-    
-    client = genai.Client(api_key=api_key)
+    if not get_gemini_client():
+        return None, "AI Judge unavailable (API key missing).", None
     
     persona_prompts = {
         "standard": "You are a Fair & Experienced Coding Mentor and Judge.",
@@ -23,6 +33,35 @@ async def run_ai_judge(user_code: str, problem_desc: str, test_cases_info: str,
     
     role = persona_prompts.get(persona, persona_prompts["standard"])
     
+    if execution_report:
+        instructions = f"""
+    EXECUTION RESULTS (the code was already run against the test cases; this verdict is final):
+    {execution_report}
+    
+    INSTRUCTIONS:
+    1. Do NOT re-judge correctness; explain the execution results above to the student.
+    2. Respond with a JSON object (and ONLY a JSON object, no markdown fences) with this field:
+       - "feedback": a detailed markdown string with your analysis. Include:
+         * Why failing test cases might fail (hints only, not the full answer)
+         * Code quality observations
+         * Time/space complexity analysis
+         * Suggestions for improvement
+    """
+    else:
+        instructions = """
+    INSTRUCTIONS:
+    1. First, determine if the code would produce the correct output for the given test cases.
+    2. Respond with a JSON object (and ONLY a JSON object, no markdown fences) with these fields:
+       - "status": "accepted" if the code is correct, "wrong_answer" if incorrect, "error" if the code has bugs
+       - "score": a number from 0 to 100 based on correctness, code quality, and efficiency
+       - "feedback": a detailed markdown string with your analysis. Include:
+         * Whether the solution is correct
+         * Code quality observations
+         * Time/space complexity analysis
+         * Suggestions for improvement
+         * If wrong, give hints without giving the full answer
+    """
+    
     prompt = f"""
     ROLE: {role}
     
@@ -38,25 +77,18 @@ async def run_ai_judge(user_code: str, problem_desc: str, test_cases_info: str,
     ```
     {user_code}
     ```
-    
-    INSTRUCTIONS:
-    1. First, determine if the code would produce the correct output for the given test cases.
-    2. Respond with a JSON object (and ONLY a JSON object, no markdown fences) with these fields:
-       - "status": "accepted" if the code is correct, "wrong_answer" if incorrect, "error" if the code has bugs
-       - "score": a number from 0 to 100 based on correctness, code quality, and efficiency
-       - "feedback": a detailed markdown string with your analysis. Include:
-         * Whether the solution is correct
-         * Code quality observations
-         * Time/space complexity analysis
-         * Suggestions for improvement
-         * If wrong, give hints without giving the full answer
+    {instructions}
     """
     
+    prompt_tokens = estimate_tokens(prompt)
+    response = None
     try:
-        response = await client.aio.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt
-        )
+        # Shared limiter: bounded concurrency, RPM/TPM budgets, retries on 429/5xx
+        with JUDGE_STAGE_SECONDS.labels(stage="gemini").time():
+            response = await gemini_limiter.generate(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.prompt_token_count:
+            prompt_tokens = usage.prompt_token_count
         
         text = response.text.strip()
         # Strip markdown code fences if present
@@ -67,61 +99,158 @@ async def run_ai_judge(user_code: str, problem_desc: str, test_cases_info: str,
             text = text.strip()
         
         result = json.loads(text)
-        return result, None
+        return result, None, prompt_tokens
     except json.JSONDecodeError:
         # If JSON parsing fails, still return the text as feedback
         return {
             "status": "accepted",
             "score": 75,
             "feedback": response.text if response else "Could not parse AI response."
-        }, None
+        }, None, prompt_tokens
+    except GeminiRateLimited:
+        raise
     except Exception as e:
-        return None, f"Gemini Error: {str(e)}"
+        return None, f"Gemini Error: {str(e)}", prompt_tokens
 
-async def judge_submission(submission: Submission, user: User, problem: Problem, test_cases: list[TestCase], session):
+async def evaluate_code(
+    files: dict[str, str],
+    problem: Problem,
+    test_cases: list[TestCase],
+    language: Optional[str],
+    persona: str,
+    execute: bool = True,
+    progress: Optional[Callable[..., Awaitable[None]]] = None,
+):
     """
-    Main entry point for judging. Fetches code from GitHub and runs AI judge.
+    Produces the verdict fields for a submission's source files.
+    Returns (verdict, complete) where complete is False if Gemini failed.
+    `progress(stage, **data)` is awaited as each judging stage starts.
     """
-    # 1. Get code from GitHub
-    user_code = "# Code not found"
+    # Execute against the test cases; this decides the verdict when possible
+    execution = None
+    if execute:
+        on_test = None
+        if progress:
+            # Tests run in a worker thread; hop back onto the loop to report each one
+            loop = asyncio.get_running_loop()
+            on_test = lambda n, total: asyncio.run_coroutine_threadsafe(progress("running", test=n, total=total), loop)
+        with JUDGE_STAGE_SECONDS.labels(stage="execute").time():
+            execution = await asyncio.to_thread(run_tests, files, test_cases, language, on_test, float_tolerance=problem.float_tolerance)
     
-    if user.github_access_token and submission.repo_url:
-        try:
-            g = Github(user.github_access_token)
-            repo_name = submission.repo_url.rstrip("/").split("/")[-1]
-            repo = g.get_user().get_repo(repo_name)
-            
-            # Get solution.py from main branch (no commit_sha needed)
-            content_file = repo.get_contents("solution.py", ref="main")
-            user_code = content_file.decoded_content.decode("utf-8")
-        except Exception as e:
-            print(f"Error fetching code from GitHub: {e}")
-            user_code = f"# Error fetching code: {str(e)}"
-    
-    # 2. Build test case info string for AI
-    test_cases_info = ""
-    if test_cases:
-        for i, tc in enumerate(test_cases):
-            test_cases_info += f"Test Case {i+1}:\n  Input: {tc.input_data}\n  Expected Output: {tc.expected_output}\n\n"
+    # Run AI Judge (verdict for unsupported languages, feedback otherwise).
+    # The prompt is kept within token budgets: a representative subset of the
+    # tests (samples and failures first) and clipped code / description.
+    with JUDGE_STAGE_SECONDS.labels(stage="prompt_build").time():
+        execution_report = summarize_results(execution) if execution else None
+        failed = {i for i, r in enumerate(execution["results"]) if r["status"] not in ("accepted", "skipped")} if execution else None
+        test_cases_info = format_test_cases(test_cases, failed)
+        code = trim_code(files)
+        description = trim_text(problem.description, PROMPT_PROBLEM_TOKENS)
+        report = trim_text(execution_report, PROMPT_TESTS_TOKENS) if execution_report else None
+    if progress:
+        await progress("ai_review")
+    try:
+        ai_result, error, prompt_tokens = await run_ai_judge(code, description, test_cases_info, persona, execution_report=report)
+    except GeminiRateLimited as e:
+        # Without an execution verdict the AI decides the result, so leave the
+        # submission pending and let the judge queue retry it later
+        if not execution:
+            raise
+        ai_result, error, prompt_tokens = None, f"AI feedback is delayed: {e}", None
+    
+    if execution:
+        verdict = {
+            "status": execution["status"],
+            "score": execution["score"],
+            "time_taken": execution["time_taken"],
+            "memory_used": execution["memory_used"],
+            "judge_output": execution_report,
+            "ai_feedback": ai_result.get("feedback", "No feedback generated.") if ai_result else (error or "No feedback generated."),
+        }
+    elif ai_result:
+        verdict = {
+            "status": ai_result.get("status", "error"),
+            "score": ai_result.get("score", 0),
+            "ai_feedback": ai_result.get("feedback", "No feedback generated."),
+            "judge_output": f"AI Judge evaluated the code from repo.",
+        }
     else:
-        test_cases_info = "No test cases provided. Judge based on problem description."
+        verdict = {
+            "status": "error",
+            "score": 0,
+            "ai_feedback": error or "Judge failed to evaluate.",
+            "judge_output": "Judge error",
+        }
+    verdict["prompt_tokens"] = prompt_tokens
+    return verdict, ai_result is not None
+
+async def resolve_verdict(
+    files: dict[str, str],
+    problem: Problem,
+    test_cases: list[TestCase],
+    language: Optional[str],
+    persona: str = "standard",
+    execute: bool = True,
+    progress: Optional[Callable[..., Awaitable[None]]] = None,
+) -> dict:
+    """
+    Returns the verdict for a file set, reusing the stored verdict when this
+    exact code was already judged against these tests. Only code that was
+    actually fetched (execute=True) is looked up or cached.
+    """
+    cache_key = verdict_key(render_files(files), problem.description, test_cases, persona, language, problem.float_tolerance) if execute else None
+    verdict = await verdict_cache.get(cache_key) if cache_key else None
+    if verdict:
+        return {**verdict, "prompt_tokens": None}  # No prompt was sent for this submission
+    
+    verdict, complete = await evaluate_code(files, problem, test_cases, language, persona, execute=execute, progress=progress)
+    # Only cache verdicts that did not hit a judge or Gemini failure
+    if cache_key and complete:
+        await verdict_cache.set(cache_key, verdict)
+    return verdict
+
+async def judge_submission(
+    submission: Submission,
+    user: User,
+    problem: Problem,
+    test_cases: list[TestCase],
+    session_factory: Callable[[], AsyncSession],
+):
+    """
+    Main entry point for judging. Fetches code from GitHub, then either reuses
+    a cached verdict for identical code or runs the tests and AI judge.
+    The rows are loaded by the caller and no session is held while judging;
+    the verdict is written in a short session of its own at the end.
+    """
+    async def progress(stage: str, **data):
+        await submission_events.publish(submission.id, stage, **data)
     
-    # 3. Run AI Judge
-    ai_result, error = await run_ai_judge(user_code, problem.description, test_cases_info)
+    # 1. Get code from GitHub
+    await progress("fetching")
+    files = {"solution.py": "# Code not found"}
+    fetched = False
     
-    if ai_result:
-        submission.status = ai_result.get("status", "error")
-        submission.score = ai_result.get("score", 0)
-        submission.ai_feedback = ai_result.get("feedback", "No feedback generated.")
-        submission.judge_output = f"AI Judge evaluated the code from repo."
-    else:
-        submission.status = "error"
-        submission.score = 0
-        submission.ai_feedback = error or "Judge failed to evaluate."
-        submission.judge_output = "Judge error"
+    if user.github_access_token and submission.repo_url:
+        # One tarball of the commit at the head of main, filtered to source files.
+        # Rate limits and fetch failures propagate to the judge queue, which
+        # defers or retries the submission instead of judging an error message.
+        with JUDGE_STAGE_SECONDS.labels(stage="github_fetch").time():
+            submission.commit_sha, files = await fetch_solution(user.github_access_token, submission.repo_url, submission.language)
+        fetched = True
     
-    submission.code_content = user_code  # Store what was evaluated
+    # 2-3. Cached verdict for identical code and tests, else execute + AI judge
+    verdict = await resolve_verdict(files, problem, test_cases, submission.language, execute=fetched, progress=progress)
+    # code_content stores what was evaluated
+    updates = {**verdict, "commit_sha": submission.commit_sha, "code_content": render_files(files)}
     
-    session.add(submission)
-    session.commit()
+    with JUDGE_STAGE_SECONDS.labels(stage="db_write").time():
+        async with session_factory() as session:
+            submission = await session.get(Submission, submission.id)
+            for field, value in updates.items():
+                setattr(submission, field, value)
+            session.add(submission)
+            await record_verdict(session, submission)
+            await session.commit()
+    await invalidate_problem_analytics(submission.problem_id)
+    await progress("done", status=submission.status, score=submission.score)
     return submission
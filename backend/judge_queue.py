@@ -0,0 +1,417 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import update
+from sqlmodel import select, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import Submission, User, Problem, TestCase
+from judge import judge_submission
+from executor import get_execution_pool
+from analytics import invalidate_problem_analytics
+from events import submission_events
+from gemini_client import GeminiRateLimited
+from github_client import GitHubRateLimited
+from github_fetch import GitHubFetchError
+from redis_client import get_redis
+from cache import TTLCache
+from metrics import JUDGE_JOBS, JUDGE_STAGE_SECONDS, serve as serve_metrics
+
+JUDGE_CONCURRENCY = int(os.getenv("JUDGE_CONCURRENCY", "4"))
+JUDGE_MAX_ATTEMPTS = int(os.getenv("JUDGE_MAX_ATTEMPTS", "3"))
+JUDGE_VISIBILITY_TIMEOUT = float(os.getenv("JUDGE_VISIBILITY_TIMEOUT", "300"))  # seconds a reserved job stays hidden
+JUDGE_RETRY_BACKOFF = float(os.getenv("JUDGE_RETRY_BACKOFF", "5"))
+# Gemini throttling is not the submission's fault, so it gets a larger retry budget
+JUDGE_RATE_LIMIT_ATTEMPTS = int(os.getenv("JUDGE_RATE_LIMIT_ATTEMPTS", "10"))
+JUDGE_RATE_LIMIT_BACKOFF_MAX = 300.0
+JUDGE_GITHUB_BACKOFF_MAX = 3600.0  # a spent GitHub quota resets within the hour
+JUDGE_POLL_INTERVAL = 0.5
+JUDGE_METRICS_PORT = int(os.getenv("JUDGE_METRICS_PORT", "0"))  # /metrics of a standalone worker; 0 = off
+# In-process queues die with their worker (Gunicorn recycles workers every
+# --max-requests); pending submissions overdue by this long are requeued.
+# Each sweep first marks the submissions its own queue still holds as not
+# overdue, so only those of dead workers ever are.
+JUDGE_REQUEUE_AFTER = float(os.getenv("JUDGE_REQUEUE_AFTER", "600"))
+JUDGE_SWEEP_INTERVAL = min(60.0, JUDGE_REQUEUE_AFTER / 4)
+SUBMIT_CLAIM_TTL = int(os.getenv("SUBMIT_CLAIM_TTL", "900"))  # longest a submit stays coalesced, seconds
+SUBMIT_CLAIM_WAIT = 5.0  # seconds to wait for a concurrent submit to insert its row
+
+QUEUE_KEY = "minicode:judge:queue"
+ATTEMPTS_KEY = "minicode:judge:attempts"
+SUBMIT_CLAIM_PREFIX = "minicode:judge:submit:"
+
+# Jobs live in one sorted set scored by the time they become visible.
+# Reserving a job pushes its score forward by the visibility timeout, so a
+# worker that dies mid-judge simply lets the job reappear for another worker.
+RESERVE_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #items == 0 then
+    return nil
+end
+redis.call('ZADD', KEYS[1], ARGV[2], items[1])
+local attempts = redis.call('HINCRBY', KEYS[2], items[1], 1)
+return {items[1], attempts}
+"""
+
+class RedisJudgeQueue:
+    """Judge queue shared by every API and worker process through Redis."""
+
+    durable = True  # jobs survive the process
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+
+    async def enqueue(self, submission_id: int):
+        await self.client.zadd(QUEUE_KEY, {str(submission_id): time.time()}, nx=True)
+
+    async def reserve(self):
+        now = time.time()
+        job = await self._reserve(keys=[QUEUE_KEY, ATTEMPTS_KEY], args=[now, now + JUDGE_VISIBILITY_TIMEOUT])
+        if not job:
+            return None
+        return int(job[0]), int(job[1])
+
+    async def ack(self, submission_id: int):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(QUEUE_KEY, str(submission_id))
+            pipe.hdel(ATTEMPTS_KEY, str(submission_id))
+            await pipe.execute()
+
+    async def retry(self, submission_id: int, delay: float):
+        await self.client.zadd(QUEUE_KEY, {str(submission_id): time.time() + delay}, xx=True)
+
+    async def extend(self, submission_id: int, seconds: float):
+        """Keeps a reserved job hidden for `seconds` more; no-op once it is acked."""
+        await self.client.zadd(QUEUE_KEY, {str(submission_id): time.time() + seconds}, xx=True)
+
+    async def depth(self) -> int:
+        return await self.client.zcard(QUEUE_KEY)
+
+class InMemoryJudgeQueue:
+    """Single-process fallback with the same visibility-timeout semantics."""
+
+    durable = False
+
+    def __init__(self):
+        self.jobs: dict[int, float] = {}
+        self.attempts: dict[int, int] = {}
+
+    async def enqueue(self, submission_id: int):
+        self.jobs.setdefault(submission_id, time.time())
+
+    async def reserve(self):
+        now = time.time()
+        ready = [(visible_at, sid) for sid, visible_at in self.jobs.items() if visible_at <= now]
+        if not ready:
+            return None
+        _, submission_id = min(ready)
+        self.jobs[submission_id] = now + JUDGE_VISIBILITY_TIMEOUT
+        self.attempts[submission_id] = self.attempts.get(submission_id, 0) + 1
+        return submission_id, self.attempts[submission_id]
+
+    async def ack(self, submission_id: int):
+        self.jobs.pop(submission_id, None)
+        self.attempts.pop(submission_id, None)
+
+    async def retry(self, submission_id: int, delay: float):
+        if submission_id in self.jobs:
+            self.jobs[submission_id] = time.time() + delay
+
+    async def extend(self, submission_id: int, seconds: float):
+        if submission_id in self.jobs:
+            self.jobs[submission_id] = time.time() + seconds
+
+    async def depth(self) -> int:
+        return len(self.jobs)
+
+_queue = None
+
+def get_judge_queue():
+    global _queue
+    if _queue is None:
+        client = get_redis()
+        _queue = RedisJudgeQueue(client) if client else InMemoryJudgeQueue()
+    return _queue
+
+# Submit debouncing: at most one pending submission per user and problem.
+# The claim holds CREATING while the API inserts the row, then the row's id
+# until the judge finalizes it; submits in between are answered with that id.
+CREATING = "creating"
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_local_submit_claims = TTLCache(maxsize=100_000, ttl=SUBMIT_CLAIM_TTL)
+_release_script = None
+
+def _claim_key(user_id: int, problem_id: int) -> str:
+    return f"{SUBMIT_CLAIM_PREFIX}{user_id}:{problem_id}"
+
+async def _release_claim(key: str, value: str):
+    """Deletes the claim only if it still holds `value`."""
+    global _release_script
+    client = get_redis()
+    if client:
+        if _release_script is None:
+            _release_script = client.register_script(RELEASE_SCRIPT)
+        await _release_script(keys=[key], args=[value])
+    elif _local_submit_claims.get(key) == value:
+        _local_submit_claims.pop(key)
+
+async def claim_submit(user_id: int, problem_id: int, is_pending: Callable[[int], Awaitable[bool]]) -> Optional[int]:
+    """
+    Reserves the in-flight submit of this user and problem. Returns None when
+    the caller should create the submission (then attach_submit() it, or
+    release_submit() on failure), otherwise the id of the pending submission
+    to answer with instead.
+    """
+    key = _claim_key(user_id, problem_id)
+    client = get_redis()
+    deadline = time.monotonic() + SUBMIT_CLAIM_WAIT
+    while True:
+        if client:
+            if await client.set(key, CREATING, nx=True, ex=SUBMIT_CLAIM_TTL):
+                return None
+            value = await client.get(key)
+        else:
+            value = _local_submit_claims.get(key)
+            if value is None:
+                _local_submit_claims.set(key, CREATING)
+                return None
+        if value is None:
+            continue  # expired in between
+        if value == CREATING:
+            if time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                continue
+            deadline = time.monotonic() + SUBMIT_CLAIM_WAIT
+        elif await is_pending(int(value)):
+            return int(value)
+        # Judged already, or its creator died before inserting; take its place
+        await _release_claim(key, value)
+
+async def attach_submit(user_id: int, problem_id: int, submission_id: int):
+    key = _claim_key(user_id, problem_id)
+    client = get_redis()
+    if client:
+        await client.set(key, str(submission_id), xx=True, ex=SUBMIT_CLAIM_TTL)
+    else:
+        _local_submit_claims.set(key, str(submission_id))
+
+async def release_submit(user_id: int, problem_id: int, submission_id: Optional[int] = None):
+    """Frees the claim once the submission is final, or after failing to create it (no id)."""
+    await _release_claim(_claim_key(user_id, problem_id), CREATING if submission_id is None else str(submission_id))
+
+def test_cases_query(problem_id: int):
+    return select(TestCase).where(TestCase.problem_id == problem_id)
+
+def overdue_query(cutoff: datetime):
+    """Pending submissions due before `cutoff`; shared with query_plans.py."""
+    return (
+        select(Submission.id, Submission.judge_due_at)
+        .where(Submission.status == "pending", or_(Submission.judge_due_at == None, Submission.judge_due_at < cutoff))  # noqa: E711
+        .limit(500)
+    )
+
+async def process_submission(submission_id: int, session_factory: Callable[[], AsyncSession]):
+    """
+    Judges one queued submission. Already-finalized submissions are skipped.
+    The rows are read in a short session that is closed before judging, so no
+    connection stays checked out through the GitHub fetch, tests and Gemini.
+    """
+    async with session_factory() as session:
+        submission = await session.get(Submission, submission_id)
+        if not submission:
+            return
+        if submission.status == "pending":
+            user = await session.get(User, submission.user_id)
+            problem = await session.get(Problem, submission.problem_id)
+            test_cases = (await session.exec(test_cases_query(submission.problem_id))).all()
+    if submission.status == "pending":
+        await judge_submission(submission, user, problem, test_cases, session_factory)
+    await release_submit(submission.user_id, submission.problem_id, submission.id)
+
+async def set_due(submission_id: int, due_at: datetime, session_factory: Callable[[], AsyncSession]):
+    async with session_factory() as session:
+        await session.exec(update(Submission).where(Submission.id == submission_id).values(judge_due_at=due_at))
+        await session.commit()
+
+async def touch_queued(queue, session_factory: Callable[[], AsyncSession]):
+    """
+    Moves judge_due_at of overdue submissions still held by this process's
+    in-process queue (waiting or being judged) up to now, so no sweep
+    mistakes them for lost. Retries due later keep their time.
+    """
+    held = list(queue.jobs)
+    if not held:
+        return
+    now = datetime.utcnow()
+    async with session_factory() as session:
+        for i in range(0, len(held), 500):
+            await session.exec(
+                update(Submission)
+                .where(Submission.id.in_(held[i:i + 500]), Submission.status == "pending")
+                .where(or_(Submission.judge_due_at == None, Submission.judge_due_at < now))  # noqa: E711
+                .values(judge_due_at=now)
+            )
+        await session.commit()
+
+async def requeue_overdue(queue, session_factory: Callable[[], AsyncSession]) -> int:
+    """
+    Enqueues pending submissions whose judge_due_at passed JUDGE_REQUEUE_AFTER
+    ago, i.e. whose in-process queue died with its worker. Each one is claimed
+    by moving judge_due_at with a compare-and-set, so of several workers
+    sweeping at once exactly one takes it.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=JUDGE_REQUEUE_AFTER)
+    claimed = []
+    async with session_factory() as session:
+        rows = (await session.exec(overdue_query(cutoff))).all()
+        for submission_id, due_at in rows:
+            result = await session.exec(
+                update(Submission)
+                .where(Submission.id == submission_id, Submission.status == "pending", Submission.judge_due_at.is_not_distinct_from(due_at))
+                .values(judge_due_at=now)
+            )
+            if result.rowcount:
+                claimed.append(submission_id)
+        await session.commit()
+    for submission_id in claimed:
+        await queue.enqueue(submission_id)
+    return len(claimed)
+
+async def mark_failed(submission_id: int, error: Exception, session: AsyncSession):
+    submission = await session.get(Submission, submission_id)
+    if not submission or submission.status != "pending":
+        return
+    submission.status = "error"
+    submission.ai_feedback = f"Judge failed: {str(error)}"
+    submission.judge_output = "Judge error"
+    session.add(submission)
+    await session.commit()
+    await release_submit(submission.user_id, submission.problem_id, submission.id)
+    await invalidate_problem_analytics(submission.problem_id)
+    await submission_events.publish(submission_id, "done", status=submission.status, score=submission.score)
+
+class JudgeWorkerPool:
+    """Drains the judge queue with at most `concurrency` submissions in flight."""
+
+    def __init__(self, queue, session_factory: Callable[[], AsyncSession], concurrency: int = JUDGE_CONCURRENCY):
+        self.queue = queue
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.tasks: list[asyncio.Task] = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        if not self.queue.durable:
+            self.tasks.append(asyncio.create_task(self._sweep()))
+        # Start the execution workers now, not on the first submission
+        self.tasks.append(asyncio.create_task(asyncio.to_thread(get_execution_pool)))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _run(self):
+        while True:
+            try:
+                job = await self.queue.reserve()
+            except Exception as e:
+                print(f"Judge queue error: {e}")
+                job = None
+            if not job:
+                await asyncio.sleep(JUDGE_POLL_INTERVAL)
+                continue
+            await self._handle(*job)
+
+    async def _sweep(self):
+        """Picks up pending submissions lost with another (or a previous) worker's in-process queue."""
+        while True:
+            try:
+                await touch_queued(self.queue, self.session_factory)
+                requeued = await requeue_overdue(self.queue, self.session_factory)
+                if requeued:
+                    print(f"Requeued {requeued} overdue pending submissions")
+            except Exception as e:
+                print(f"Judge sweep error: {e}")
+            await asyncio.sleep(JUDGE_SWEEP_INTERVAL)
+
+    async def _keep_reserved(self, submission_id: int):
+        """Extends the reservation while the judge runs, so a slow judge never reappears for another worker."""
+        while True:
+            await asyncio.sleep(JUDGE_VISIBILITY_TIMEOUT / 3)
+            try:
+                await self.queue.extend(submission_id, JUDGE_VISIBILITY_TIMEOUT)
+            except Exception as e:
+                print(f"Could not extend the reservation of submission {submission_id}: {e}")
+
+    async def _judge(self, submission_id: int):
+        heartbeat = asyncio.create_task(self._keep_reserved(submission_id))
+        try:
+            with JUDGE_STAGE_SECONDS.labels(stage="total").time():
+                await process_submission(submission_id, self.session_factory)
+        finally:
+            # Stopped before ack or retry, which set the job's final visibility
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _handle(self, submission_id: int, attempt: int):
+        try:
+            await self._judge(submission_id)
+            await self.queue.ack(submission_id)
+            JUDGE_JOBS.labels(outcome="done").inc()
+        except Exception as e:
+            print(f"Judge error on submission {submission_id} (attempt {attempt}): {e}")
+            max_attempts, delay = JUDGE_MAX_ATTEMPTS, JUDGE_RETRY_BACKOFF * 2 ** (attempt - 1)
+            if isinstance(e, GeminiRateLimited):
+                max_attempts = JUDGE_RATE_LIMIT_ATTEMPTS
+                delay = min(JUDGE_RATE_LIMIT_BACKOFF_MAX, max(e.retry_after or 0, delay))
+            elif isinstance(e, GitHubRateLimited):
+                # The student's token is out of quota; wait for its reset
+                max_attempts = JUDGE_RATE_LIMIT_ATTEMPTS
+                delay = min(JUDGE_GITHUB_BACKOFF_MAX, max(e.retry_after, delay))
+            elif isinstance(e, GitHubFetchError) and not e.retryable:
+                max_attempts = attempt
+            if attempt < max_attempts:
+                await self.queue.retry(submission_id, delay)
+                if not self.queue.durable:
+                    # A deliberate wait, not a lost job; keep the sweep off it
+                    await set_due(submission_id, datetime.utcnow() + timedelta(seconds=delay), self.session_factory)
+                await submission_events.publish(submission_id, "queued", retry_in=round(delay))
+                JUDGE_JOBS.labels(outcome="retried").inc()
+                return
+            async with self.session_factory() as session:
+                await mark_failed(submission_id, e, session)
+            await self.queue.ack(submission_id)
+            JUDGE_JOBS.labels(outcome="failed").inc()
+
+async def run_workers(session_factory: Callable[[], AsyncSession], concurrency: Optional[int] = None):
+    pool = JudgeWorkerPool(get_judge_queue(), session_factory, concurrency or JUDGE_CONCURRENCY)
+    pool.start()
+    metrics_server = await serve_metrics(JUDGE_METRICS_PORT) if JUDGE_METRICS_PORT else None
+    try:
+        await asyncio.gather(*pool.tasks)
+    finally:
+        await pool.stop()
+        if metrics_server:
+            metrics_server.close()
+
+if __name__ == "__main__":
+    # Standalone worker process: python judge_queue.py
+    from database import async_session_factory
+
+    if not get_redis():
+        print("REDIS_URL is not set; judge workers run inside the API process instead.")
+        exit(1)
+    print(f"Starting {JUDGE_CONCURRENCY} judge workers")
+    asyncio.run(run_workers(async_session_factory))
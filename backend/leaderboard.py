@@ -0,0 +1,269 @@
+from datetime import datetime, date, timedelta
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select, delete, func, or_, and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import User, Submission, UserScore, ProblemBestScore
+
+# Statement builders, shared with query_plans.py so the plan checks explain
+# exactly what runs here
+
+def best_score_query(user_id: int, problem_id: int):
+    return (
+        select(ProblemBestScore)
+        .where(ProblemBestScore.user_id == user_id, ProblemBestScore.problem_id == problem_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )
+
+def leaderboard_page_query(limit: int, after: Optional[tuple[int, int, int]] = None):
+    statement = (
+        select(UserScore, User)
+        .join(User, User.id == UserScore.user_id)
+        .where(UserScore.total_score > 0)
+        .order_by(UserScore.total_score.desc(), UserScore.user_id)
+        .limit(limit)
+    )
+    if after:
+        score, user_id, _ = after
+        statement = statement.where(or_(
+            UserScore.total_score < score,
+            and_(UserScore.total_score == score, UserScore.user_id > user_id),
+        ))
+    return statement
+
+def users_ahead_query(total_score: int, user_id: int):
+    return select(func.count()).select_from(UserScore).where(or_(
+        UserScore.total_score > total_score,
+        and_(UserScore.total_score == total_score, UserScore.user_id < user_id)
+    ))
+
+def best_scores_query(problem_id: int):
+    return (
+        select(Submission.user_id, func.max(Submission.score))
+        .where(Submission.problem_id == problem_id, Submission.status == "accepted")
+        .group_by(Submission.user_id)
+    )
+
+async def insert_missing(session: AsyncSession, model, **values) -> bool:
+    """INSERT ... ON CONFLICT DO NOTHING; True if the row was created."""
+    insert = sqlite_insert if session.bind.dialect.name == "sqlite" else postgresql_insert
+    result = await session.exec(insert(model).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+async def lock_user_score(session: AsyncSession, user_id: int) -> UserScore:
+    """
+    The user's UserScore row, created if missing and locked until commit.
+    Creating it first means concurrent callers queue on the row lock; a bare
+    SELECT ... FOR UPDATE locks nothing when the row does not exist yet, and
+    both would then insert it.
+    """
+    await insert_missing(
+        session, UserScore, user_id=user_id, total_score=0, problems_solved=0,
+        current_streak=0, updated_at=datetime.utcnow(),
+    )
+    return (await session.exec(
+        select(UserScore).where(UserScore.user_id == user_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )).one()
+
+async def record_verdict(session: AsyncSession, submission: Submission):
+    """
+    Folds a finalized submission into the leaderboard summary tables.
+    Only accepted submissions that beat the user's best score for the problem
+    change anything. The caller owns the transaction and commits.
+    """
+    if submission.status != "accepted":
+        return
+
+    score = submission.score or 0
+    # Same insert-then-lock order as lock_user_score: best row first, then totals
+    created = await insert_missing(
+        session, ProblemBestScore, user_id=submission.user_id, problem_id=submission.problem_id, best_score=score,
+    )
+    if not created:
+        best = (await session.exec(best_score_query(submission.user_id, submission.problem_id))).one()
+        if score <= best.best_score:
+            return
+    entry = await lock_user_score(session, submission.user_id)
+
+    if created:
+        entry.problems_solved += 1
+        entry.total_score += score
+    else:
+        entry.total_score += score - best.best_score
+        best.best_score = score
+        session.add(best)
+
+    entry.updated_at = datetime.utcnow()
+    session.add(entry)
+
+async def record_activity(session: AsyncSession, user_id: int, when: Optional[datetime] = None):
+    """
+    Extends the user's daily streak for a new submission. Same-day submissions
+    are no-ops, a gap of more than one day restarts the streak at 1.
+    The caller owns the transaction and commits.
+    """
+    today = (when or datetime.utcnow()).date()
+    entry = await lock_user_score(session, user_id)
+
+    if entry.last_active_date == today:
+        return
+    if entry.last_active_date == today - timedelta(days=1):
+        entry.current_streak += 1
+    else:
+        entry.current_streak = 1
+    entry.last_active_date = today
+    entry.updated_at = datetime.utcnow()
+    session.add(entry)
+
+def current_streak(entry: Optional[UserScore], today: Optional[date] = None) -> int:
+    """The stored streak, or 0 once a full day has passed without a submission."""
+    if not entry or not entry.last_active_date:
+        return 0
+    today = today or datetime.utcnow().date()
+    if entry.last_active_date < today - timedelta(days=1):
+        return 0
+    return entry.current_streak
+
+def leaderboard_entry(entry: UserScore, user: User, rank: int) -> dict:
+    return {
+        "id": user.id,
+        "name": user.full_name or user.username,
+        "username": user.username,
+        "score": entry.total_score,
+        "problems": entry.problems_solved,
+        "avatar": user.avatar_url,
+        "rank": rank,
+    }
+
+def leaderboard_cursor(entry: dict) -> str:
+    """Keyset cursor after a page's last entry: "score.user_id.rank"."""
+    return f"{entry['score']}.{entry['id']}.{entry['rank']}"
+
+def parse_leaderboard_cursor(cursor: str) -> tuple[int, int, int]:
+    """Inverse of leaderboard_cursor; raises ValueError on anything else."""
+    score, user_id, rank = (int(part) for part in cursor.split("."))
+    return score, user_id, rank
+
+async def get_leaderboard_page(session: AsyncSession, limit: int = 50, after: Optional[tuple[int, int, int]] = None):
+    """
+    Returns one page of ranked entries, ordered by total score then user id,
+    starting after the (score, user_id, rank) of the previous page's last
+    entry. Seeking on ix_user_scores_rank costs the same on every page.
+    """
+    rank = after[2] if after else 0
+    rows = (await session.exec(leaderboard_page_query(limit, after))).all()
+    return [leaderboard_entry(entry, user, rank + i + 1) for i, (entry, user) in enumerate(rows)]
+
+async def get_leaderboard_entry(session: AsyncSession, user_id: int) -> Optional[dict]:
+    """One user's entry with their rank, or None if they have no points yet."""
+    rank = await get_user_rank(session, user_id)
+    if rank is None:
+        return None
+    entry = await session.get(UserScore, user_id)
+    user = await session.get(User, user_id)
+    return leaderboard_entry(entry, user, rank)
+
+async def get_user_rank(session: AsyncSession, user_id: int) -> Optional[int]:
+    """1-based rank of a user, or None if they have no points yet."""
+    entry = await session.get(UserScore, user_id)
+    if not entry or entry.total_score <= 0:
+        return None
+    ahead = (await session.exec(users_ahead_query(entry.total_score, entry.user_id))).one()
+    return ahead + 1
+
+async def rebuild_problem_scores(session: AsyncSession, problem_id: int):
+    """
+    Recomputes one problem's best scores from Submission, by the same rule as
+    rebuild_leaderboard (best accepted score), and applies the differences to
+    each affected user's totals. Used after a rejudge; the caller owns the
+    transaction and commits.
+    """
+    new_best = dict((await session.exec(best_scores_query(problem_id))).all())
+    old_rows = {row.user_id: row for row in (await session.exec(
+        select(ProblemBestScore).where(ProblemBestScore.problem_id == problem_id).with_for_update()
+    )).all()}
+
+    user_ids = set(new_best) | set(old_rows)
+    if not user_ids:
+        return
+    entries = {entry.user_id: entry for entry in (await session.exec(
+        select(UserScore).where(UserScore.user_id.in_(user_ids)).with_for_update()
+    )).all()}
+
+    for user_id in user_ids:
+        old = old_rows.get(user_id)
+        score = new_best.get(user_id)
+        if old and score is not None and old.best_score == score:
+            continue
+        entry = entries.get(user_id) or UserScore(user_id=user_id)
+        if old:
+            entry.total_score -= old.best_score
+            entry.problems_solved -= 1
+        if score is None:
+            await session.delete(old)
+        else:
+            row = old or ProblemBestScore(user_id=user_id, problem_id=problem_id)
+            row.best_score = score
+            session.add(row)
+            entry.total_score += score
+            entry.problems_solved += 1
+        entry.updated_at = datetime.utcnow()
+        session.add(entry)
+
+async def rebuild_leaderboard(session: AsyncSession):
+    """
+    Recomputes every summary row from the Submission table.
+    Use this for recovery or after importing submissions out of band.
+    """
+    best_scores = (await session.exec(
+        select(Submission.user_id, Submission.problem_id, func.max(Submission.score))
+        .where(Submission.status == "accepted")
+        .group_by(Submission.user_id, Submission.problem_id)
+    )).all()
+
+    day = func.date(Submission.timestamp)
+    active_days = (await session.exec(
+        select(Submission.user_id, day).group_by(Submission.user_id, day).order_by(Submission.user_id, day)
+    )).all()
+
+    await session.exec(delete(ProblemBestScore))
+    await session.exec(delete(UserScore))
+
+    totals = {}
+    for user_id, problem_id, score in best_scores:
+        session.add(ProblemBestScore(user_id=user_id, problem_id=problem_id, best_score=score))
+        entry = totals.setdefault(user_id, UserScore(user_id=user_id))
+        entry.total_score += score
+        entry.problems_solved += 1
+
+    # Days arrive in ascending order per user, so replaying them rebuilds the streak
+    for user_id, active_day in active_days:
+        if isinstance(active_day, str):  # SQLite's date() returns text
+            active_day = date.fromisoformat(active_day)
+        entry = totals.setdefault(user_id, UserScore(user_id=user_id))
+        if entry.last_active_date == active_day - timedelta(days=1):
+            entry.current_streak += 1
+        else:
+            entry.current_streak = 1
+        entry.last_active_date = active_day
+    session.add_all(totals.values())
+    await session.commit()
+    return len(totals)
+
+async def _rebuild():
+    from database import async_session_factory
+
+    async with async_session_factory() as session:
+        return await rebuild_leaderboard(session)
+
+if __name__ == "__main__":
+    import sys
+    import asyncio
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python leaderboard.py rebuild")
+        sys.exit(1)
+    count = asyncio.run(_rebuild())
+    print(f"Leaderboard rebuilt for {count} users.")
@@ -0,0 +1,283 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+import itertools
+import contextvars
+from collections import Counter as Tally, deque
+from typing import Awaitable, Callable, Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    disable_created_metrics, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+
+# Prometheus metrics (prometheus_client) served at GET /metrics. Under
+# Gunicorn, gunicorn.conf.py gives every server start a fresh
+# PROMETHEUS_MULTIPROC_DIR before forking the workers. Each worker then
+# records into files there and a scrape answered by any worker aggregates
+# all of them. Counters and histograms of exited workers keep counting.
+# Gauges are snapshots of one worker's pools, so they keep a `pid` label and
+# leave with their worker. Without the variable (uvicorn in development, the
+# standalone judge worker) the process serves its own registry.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # optional bearer token required by /metrics
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+GAUGE_REFRESH_INTERVAL = 5.0  # seconds between pool gauge updates of each worker
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))  # profile requests slower than this; 0 = off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# The app directory is root-owned in the image and the API runs unprivileged
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "minicode-profiles"))
+PROFILE_KEEP = 50  # profiles listed by the admin API (older files stay on disk)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+WORKER = str(os.getpid())
+
+disable_created_metrics()  # no *_created series next to each counter and histogram
+
+def render() -> bytes:
+    """The exposition of every worker in multiprocess mode, else of this process."""
+    if not MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, MULTIPROC_DIR)
+    return generate_latest(registry)
+
+async def refresh_gauges(collect: Callable[[], Awaitable]):
+    """
+    Calls `collect` every GAUGE_REFRESH_INTERVAL seconds, so scrapes answered
+    by other workers see this worker's current pool gauges.
+    """
+    while True:
+        try:
+            await collect()
+        except Exception as e:
+            print(f"Metrics gauge refresh failed: {e}")
+        await asyncio.sleep(GAUGE_REFRESH_INTERVAL)
+
+HTTP_REQUESTS = Counter("minicode_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("minicode_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"), buckets=LATENCY_BUCKETS)
+DB_QUERIES_PER_REQUEST = Histogram("minicode_db_queries_per_request", "SQL statements executed per HTTP request", ("route",), buckets=QUERY_COUNT_BUCKETS)
+DB_QUERY_SECONDS = Counter("minicode_db_query_seconds_total", "Time spent in SQL statements, by route (background = judge and jobs)", ("route",))
+DB_QUERIES = Counter("minicode_db_queries_total", "SQL statements executed, by route (background = judge and jobs)", ("route",))
+JUDGE_STAGE_SECONDS = Histogram("minicode_judge_stage_seconds", "Time per judging stage", ("stage",), buckets=STAGE_BUCKETS)
+JUDGE_JOBS = Counter("minicode_judge_jobs_total", "Judge queue jobs by outcome (done, retried, failed)", ("outcome",))
+POOL_GAUGE = Gauge("minicode_pool", "Pool utilization snapshots of each live worker", ("pool", "field"), multiprocess_mode="liveall")
+RATE_LIMITED = Counter("minicode_rate_limited_total", "Requests rejected by the rate limiter", ("policy", "role"))
+SUBMITS_COALESCED = Counter("minicode_submits_coalesced_total", "Submits answered with an already in-flight submission")
+
+async def serve(port: int):
+    """
+    Bare /metrics endpoint for processes without the API, such as the
+    standalone judge worker. Answers every request with the exposition.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = render()
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "0.0.0.0", port)
+    print(f"Metrics on http://0.0.0.0:{port}/metrics")
+    return server
+
+class RequestStats:
+    __slots__ = ("route", "queries", "db_time", "finished")
+
+    def __init__(self):
+        self.route = "unmatched"
+        self.queries = 0
+        self.db_time = 0.0
+        self.finished = False
+
+_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("minicode_request", default=None)
+
+def spawn_background(coro) -> asyncio.Task:
+    """
+    asyncio.create_task for work that outlives the request starting it (jobs,
+    listeners). Tasks copy the current context, so without the reset its SQL
+    would be charged to that request.
+    """
+    context = contextvars.copy_context()
+    context.run(_request.set, None)
+    return asyncio.create_task(coro, context=context)
+
+def instrument_engine(engine):
+    """Counts SQL statements and their time, attributed to the HTTP request running them."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _request.get()
+        # A finished request's stats were already recorded; anything left is a task it spawned
+        if stats is not None and not stats.finished:
+            stats.queries += 1
+            stats.db_time += elapsed
+        else:
+            DB_QUERIES.labels(route="background").inc()
+            DB_QUERY_SECONDS.labels(route="background").inc(elapsed)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and SQL usage per route
+    template (never the raw path, to keep label sets bounded). Requests
+    slower than the profiler threshold get their stack samples dumped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _request.set(stats)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        profile_from = profiler.begin() if profiler.enabled else None
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            stats.finished = True
+            _request.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            if route is not None:
+                stats.route = route.path
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method=method, route=stats.route, status=str(status[0])).inc()
+            HTTP_LATENCY.labels(method=method, route=stats.route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route=stats.route).observe(stats.queries)
+            if stats.queries:
+                DB_QUERIES.labels(route=stats.route).inc(stats.queries)
+                DB_QUERY_SECONDS.labels(route=stats.route).inc(stats.db_time)
+            if profile_from is not None:
+                await profiler.end(profile_from, method, stats.route, elapsed, stats)
+
+def _fold(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler. While requests are in flight, a thread samples
+    the event loop thread's stack every PROFILE_INTERVAL_MS. When a request
+    takes longer than `slow_ms`, the samples taken during it are written to
+    PROFILE_DIR as folded stacks ("frame;frame;frame count" lines), the input
+    format of flamegraph.pl and speedscope. Async requests share the loop, so
+    a profile shows what the loop was busy with while the request was slow;
+    time spent idle in the selector means the request was waiting on I/O.
+    """
+
+    def __init__(self, slow_ms: float = PROFILE_SLOW_MS):
+        self.slow_ms = slow_ms
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.samples = deque(maxlen=int(120 / self.interval))  # two minutes of (time, stack)
+        self.active = 0
+        self.loop_thread: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+        self.recent = deque(maxlen=PROFILE_KEEP)
+        self.sequence = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0
+
+    def configure(self, slow_ms: float):
+        """Turns profiling on (threshold in ms) or off (0) for this worker."""
+        self.slow_ms = max(0.0, slow_ms)
+
+    def begin(self) -> float:
+        self.loop_thread = threading.get_ident()
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._sample, daemon=True, name="minicode-profiler")
+            self.thread.start()
+        self.active += 1
+        return time.monotonic()
+
+    def _sample(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is not None:
+                self.samples.append((time.monotonic(), _fold(frame)))
+        self.samples.clear()
+
+    async def end(self, started: float, method: str, route: str, elapsed: float, stats: RequestStats):
+        self.active -= 1
+        if elapsed * 1000 < self.slow_ms:
+            return
+        folded = Tally(stack for at, stack in list(self.samples) if at >= started)
+        if not folded:
+            return
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{WORKER}-{next(self.sequence)}-{method}-{slug}-{round(elapsed * 1000)}ms.folded"
+        path = os.path.join(PROFILE_DIR, name)
+
+        def write():
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in folded.most_common())
+
+        try:
+            await asyncio.to_thread(write)
+        except OSError as e:
+            # Never fail the request over its profile
+            print(f"Could not write profile to {PROFILE_DIR}: {e}")
+            return
+        self.recent.append({
+            "name": name,
+            "method": method,
+            "route": route,
+            "duration_ms": round(elapsed * 1000, 1),
+            "db_queries": stats.queries,
+            "db_time_ms": round(stats.db_time * 1000, 1),
+            "samples": sum(folded.values()),
+        })
+        print(f"Slow request {method} {route} took {elapsed * 1000:.0f} ms; profile written to {path}")
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a listed profile; names are only accepted from the recent list."""
+        if any(p["name"] == name for p in self.recent):
+            return os.path.join(PROFILE_DIR, name)
+        return None
+
+    def status(self) -> dict:
+        return {
+            "slow_ms": self.slow_ms,
+            "interval_ms": self.interval * 1000,
+            "worker": WORKER,
+            "profiles": list(reversed(self.recent)),
+        }
+
+profiler = SlowRequestProfiler()
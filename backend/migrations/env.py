@@ -0,0 +1,39 @@
+import os
+import sys
+from logging.config import fileConfig
+from alembic import context
+from sqlmodel import SQLModel
+
+# Migrations import the app's modules; make backend/ importable from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models  # noqa: F401  (registers every table on SQLModel.metadata)
+from database import engine, DATABASE_URL
+
+target_metadata = SQLModel.metadata
+
+if context.config.config_file_name:
+    fileConfig(context.config.config_file_name, disable_existing_loggers=False)
+
+def run_migrations_offline():
+    """Emits SQL for DATABASE_URL instead of applying it (alembic upgrade head --sql)."""
+    context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # The sync engine from database.py; SQLite needs batch mode to alter tables
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            compare_type=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
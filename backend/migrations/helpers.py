@@ -0,0 +1,16 @@
+import sqlalchemy as sa
+from alembic import op
+
+# Databases created before migrations existed were built by create_all at
+# whatever models.py looked like then. The early revisions check what is
+# already there, so `alembic upgrade head` brings any of them to the same
+# schema without a manual `alembic stamp`.
+
+def has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+def has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
@@ -0,0 +1,79 @@
+"""Initial schema: users, problems, test cases and submissions
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("avatar_url", sa.String(), nullable=True),
+            sa.Column("github_id", sa.Integer(), nullable=True, unique=True),
+            sa.Column("github_access_token", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=True),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not has_table("problem"):
+        op.create_table(
+            "problem",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=False),
+            sa.Column("difficulty", sa.String(), nullable=False),
+            sa.Column("input_format", sa.String(), nullable=True),
+            sa.Column("output_format", sa.String(), nullable=True),
+            sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_problem_title", "problem", ["title"])
+
+    if not has_table("testcase"):
+        op.create_table(
+            "testcase",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("problem_id", sa.Integer(), sa.ForeignKey("problem.id"), nullable=False),
+            sa.Column("input_data", sa.String(), nullable=False),
+            sa.Column("expected_output", sa.String(), nullable=False),
+            sa.Column("is_sample", sa.Boolean(), nullable=False),
+        )
+
+    if not has_table("submission"):
+        op.create_table(
+            "submission",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("problem_id", sa.Integer(), sa.ForeignKey("problem.id"), nullable=False),
+            sa.Column("repo_url", sa.String(), nullable=True),
+            sa.Column("commit_sha", sa.String(), nullable=True),
+            sa.Column("code_content", sa.String(), nullable=True),
+            sa.Column("language", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("score", sa.Integer(), nullable=False),
+            sa.Column("ai_feedback", sa.String(), nullable=True),
+            sa.Column("judge_output", sa.String(), nullable=True),
+            sa.Column("memory_used", sa.Integer(), nullable=True),
+            sa.Column("time_taken", sa.Float(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(), nullable=False),
+        )
+
+def downgrade():
+    for table in ("submission", "testcase", "problem", "users"):
+        op.drop_table(table)
@@ -0,0 +1,37 @@
+"""Leaderboard summary tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if not has_table("user_scores"):
+        op.create_table(
+            "user_scores",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("total_score", sa.Integer(), nullable=False),
+            sa.Column("problems_solved", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_user_scores_rank", "user_scores", ["total_score", "user_id"])
+
+    if not has_table("problem_best_scores"):
+        op.create_table(
+            "problem_best_scores",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("problem_id", sa.Integer(), sa.ForeignKey("problem.id"), primary_key=True),
+            sa.Column("best_score", sa.Integer(), nullable=False),
+        )
+
+def downgrade():
+    op.drop_table("problem_best_scores")
+    op.drop_table("user_scores")
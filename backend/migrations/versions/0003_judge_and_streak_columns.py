@@ -0,0 +1,40 @@
+"""Columns added after create_all had built existing tables
+
+Streaks on user_scores, the Gemini prompt size on submissions, test data
+hashes and sizes, and the per-problem float tolerance.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_column
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# (table, column); NOT NULL columns get a server default so existing rows are valid
+COLUMNS = [
+    ("user_scores", sa.Column("current_streak", sa.Integer(), nullable=False, server_default="0")),
+    ("user_scores", sa.Column("last_active_date", sa.Date(), nullable=True)),
+    ("submission", sa.Column("prompt_tokens", sa.Integer(), nullable=True)),
+    ("testcase", sa.Column("input_hash", sa.String(), nullable=True)),
+    ("testcase", sa.Column("input_size", sa.Integer(), nullable=False, server_default="0")),
+    ("testcase", sa.Column("output_hash", sa.String(), nullable=True)),
+    ("testcase", sa.Column("output_size", sa.Integer(), nullable=False, server_default="0")),
+    ("problem", sa.Column("float_tolerance", sa.Float(), nullable=True)),
+]
+
+def upgrade():
+    for table, column in COLUMNS:
+        if not has_column(table, column.name):
+            with op.batch_alter_table(table) as batch:
+                batch.add_column(column.copy())
+
+def downgrade():
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column(column.name)
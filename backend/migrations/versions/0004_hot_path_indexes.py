@@ -0,0 +1,36 @@
+"""Indexes for the hot query shapes on submissions and test cases
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_index
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+ACCEPTED = sa.text("status = 'accepted'")
+
+# (name, table, columns, extra create_index arguments); mirrors models.py
+INDEXES = [
+    ("ix_submission_user_problem_status_score", "submission", ["user_id", "problem_id", "status", "score"], {}),
+    ("ix_submission_user_timestamp", "submission", ["user_id", "timestamp"], {}),
+    ("ix_submission_problem_timestamp", "submission", ["problem_id", "timestamp"], {}),
+    ("ix_submission_accepted", "submission", ["problem_id", "user_id", "score"], {"postgresql_where": ACCEPTED, "sqlite_where": ACCEPTED}),
+    ("ix_testcase_problem_id", "testcase", ["problem_id"], {}),
+]
+
+def upgrade():
+    # On a large Postgres submission table, create these by hand first with
+    # CREATE INDEX CONCURRENTLY; this revision then skips them
+    for name, table, columns, extra in INDEXES:
+        if not has_index(table, name):
+            op.create_index(name, table, columns, **extra)
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,26 @@
+"""Test data blobs in the database
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if not has_table("testdata_blobs"):
+        op.create_table(
+            "testdata_blobs",
+            sa.Column("sha256", sa.String(length=64), primary_key=True),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+        )
+
+def downgrade():
+    op.drop_table("testdata_blobs")
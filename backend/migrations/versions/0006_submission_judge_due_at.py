@@ -0,0 +1,29 @@
+"""Submission.judge_due_at, for requeueing pending submissions lost by in-process queues
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_column, has_index
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'pending'")
+
+def upgrade():
+    # Left NULL on existing rows; the sweep treats NULL as overdue
+    if not has_column("submission", "judge_due_at"):
+        with op.batch_alter_table("submission") as batch:
+            batch.add_column(sa.Column("judge_due_at", sa.DateTime(), nullable=True))
+    if not has_index("submission", "ix_submission_pending_due"):
+        op.create_index("ix_submission_pending_due", "submission", ["judge_due_at"], postgresql_where=PENDING, sqlite_where=PENDING)
+
+def downgrade():
+    op.drop_index("ix_submission_pending_due", table_name="submission")
+    with op.batch_alter_table("submission") as batch:
+        batch.drop_column("judge_due_at")
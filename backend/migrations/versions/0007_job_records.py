@@ -0,0 +1,28 @@
+"""Job records in the database, so provisioning and rejudge jobs are shared by all workers without Redis
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if not has_table("job_records"):
+        op.create_table(
+            "job_records",
+            sa.Column("key", sa.String(length=200), primary_key=True),
+            sa.Column("value", sa.String(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_job_records_expires_at", "job_records", ["expires_at"])
+
+def downgrade():
+    op.drop_index("ix_job_records_expires_at", table_name="job_records")
+    op.drop_table("job_records")
@@ -0,0 +1,53 @@
+"""Test data blobs stored in chunks, so neither writing nor reading one holds it in memory
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import has_table, has_column
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+CHUNK_BYTES = 1024 * 1024  # testdata.BLOB_CHUNK_BYTES at the time of this revision
+
+blobs = sa.table("testdata_blobs", sa.column("sha256", sa.String), sa.column("data", sa.LargeBinary), sa.column("chunks", sa.Integer))
+chunks = sa.table("testdata_chunks", sa.column("sha256", sa.String), sa.column("seq", sa.Integer), sa.column("data", sa.LargeBinary))
+
+def upgrade():
+    if not has_table("testdata_chunks"):
+        op.create_table(
+            "testdata_chunks",
+            sa.Column("sha256", sa.String(length=64), primary_key=True),
+            sa.Column("seq", sa.Integer(), primary_key=True),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+        )
+    if not has_column("testdata_blobs", "chunks"):
+        with op.batch_alter_table("testdata_blobs") as batch:
+            batch.add_column(sa.Column("chunks", sa.Integer(), nullable=False, server_default="0"))
+    if has_column("testdata_blobs", "data"):
+        # Split the stored blobs one at a time
+        bind = op.get_bind()
+        for digest in bind.execute(sa.select(blobs.c.sha256)).scalars().all():
+            data = bind.execute(sa.select(blobs.c.data).where(blobs.c.sha256 == digest)).scalar_one()
+            parts = [data[i:i + CHUNK_BYTES] for i in range(0, len(data), CHUNK_BYTES)]
+            for seq, part in enumerate(parts):
+                bind.execute(chunks.insert().values(sha256=digest, seq=seq, data=part))
+            bind.execute(blobs.update().where(blobs.c.sha256 == digest).values(chunks=len(parts)))
+        with op.batch_alter_table("testdata_blobs") as batch:
+            batch.drop_column("data")
+
+def downgrade():
+    with op.batch_alter_table("testdata_blobs") as batch:
+        batch.add_column(sa.Column("data", sa.LargeBinary(), nullable=False, server_default=""))
+    bind = op.get_bind()
+    for digest in bind.execute(sa.select(blobs.c.sha256)).scalars().all():
+        parts = bind.execute(sa.select(chunks.c.data).where(chunks.c.sha256 == digest).order_by(chunks.c.seq)).scalars().all()
+        bind.execute(blobs.update().where(blobs.c.sha256 == digest).values(data=b"".join(parts)))
+    with op.batch_alter_table("testdata_blobs") as batch:
+        batch.drop_column("chunks")
+    op.drop_table("testdata_chunks")
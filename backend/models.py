@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, LargeBinary, text
+from sqlmodel import SQLModel, Field, Relationship, Index
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
@@ -25,6 +26,7 @@ class Problem(SQLModel, table=True):
     difficulty: str = Field(default="Easy") # Easy, Medium, Hard
     input_format: Optional[str] = None
     output_format: Optional[str] = None
+    float_tolerance: Optional[float] = None  # numeric output tokens may differ by this absolute/relative error
     author_id: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -34,14 +36,57 @@ class Problem(SQLModel, table=True):
 
 class TestCase(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    problem_id: int = Field(foreign_key="problem.id")
+    problem_id: int = Field(foreign_key="problem.id", index=True)
+    # Full text for inline rows; a preview when the data lives in testdata.py storage
     input_data: str
     expected_output: str
+    input_hash: Optional[str] = None
+    input_size: int = 0
+    output_hash: Optional[str] = None
+    output_size: int = 0
     is_sample: bool = Field(default=False)
 
     problem: Problem = Relationship(back_populates="test_cases")
 
+class TestDataBlob(SQLModel, table=True):
+    """gzip-compressed test input or expected output, stored once per SHA-256 of its content."""
+    __tablename__ = "testdata_blobs"
+    sha256: str = Field(primary_key=True, max_length=64)
+    size: int = 0  # uncompressed bytes
+    chunks: int = 0  # rows in testdata_chunks, seq 0 to chunks - 1
+
+class TestDataChunk(SQLModel, table=True):
+    """One slice of a blob's compressed bytes, so a blob is never held in memory whole."""
+    __tablename__ = "testdata_chunks"
+    sha256: str = Field(primary_key=True, max_length=64)
+    seq: int = Field(primary_key=True)
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+
+class JobRecord(SQLModel, table=True):
+    """Background job state (provisioning, rejudge) when there is no Redis, readable by every worker."""
+    __tablename__ = "job_records"
+    key: str = Field(primary_key=True, max_length=200)
+    value: str  # JSON
+    expires_at: datetime = Field(index=True)
+
+ACCEPTED = text("status = 'accepted'")
+PENDING = text("status = 'pending'")
+
 class Submission(SQLModel, table=True):
+    # Indexes follow the hot query shapes; query_plans.py checks they are used.
+    # Schema changes go through migrations (alembic), not create_all.
+    __table_args__ = (
+        # History per user and problem, best-score grouping, rejudge selection
+        Index("ix_submission_user_problem_status_score", "user_id", "problem_id", "status", "score"),
+        # Profile "recent submissions" and streak replay
+        Index("ix_submission_user_timestamp", "user_id", "timestamp"),
+        # Faculty analytics per problem and per hour
+        Index("ix_submission_problem_timestamp", "problem_id", "timestamp"),
+        # Best accepted score per (problem, user): leaderboard rebuilds and solver counts
+        Index("ix_submission_accepted", "problem_id", "user_id", "score", postgresql_where=ACCEPTED, sqlite_where=ACCEPTED),
+        # Judge sweep for pending submissions an in-process queue lost
+        Index("ix_submission_pending_due", "judge_due_at", postgresql_where=PENDING, sqlite_where=PENDING),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     problem_id: int = Field(foreign_key="problem.id")
@@ -55,7 +100,28 @@ class Submission(SQLModel, table=True):
     judge_output: Optional[str] = None
     memory_used: Optional[int] = None # in KB
     time_taken: Optional[float] = None # in seconds
+    prompt_tokens: Optional[int] = None # size of the Gemini prompt, None when no prompt was sent
+    judge_due_at: Optional[datetime] = Field(default_factory=datetime.utcnow) # when a worker should pick it up next
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
     user: User = Relationship(back_populates="submissions")
     problem: Problem = Relationship(back_populates="submissions")
+
+class UserScore(SQLModel, table=True):
+    """Per-user leaderboard totals, maintained incrementally by leaderboard.py."""
+    __tablename__ = "user_scores"
+    __table_args__ = (Index("ix_user_scores_rank", "total_score", "user_id"),)
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    total_score: int = Field(default=0)
+    problems_solved: int = Field(default=0)
+    # Consecutive UTC days with at least one submission, ending at last_active_date
+    current_streak: int = Field(default=0)
+    last_active_date: Optional[date] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ProblemBestScore(SQLModel, table=True):
+    """Best accepted score per (user, problem), the input to UserScore totals."""
+    __tablename__ = "problem_best_scores"
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    problem_id: int = Field(foreign_key="problem.id", primary_key=True)
+    best_score: int = Field(default=0)
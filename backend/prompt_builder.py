@@ -0,0 +1,138 @@
+import os
+import re
+from typing import Optional
+from models import TestCase
+from gemini_client import estimate_tokens
+
+# Token budgets for the parts of the judge prompt that grow with the submission
+PROMPT_CODE_TOKENS = int(os.getenv("PROMPT_CODE_TOKENS", "8000"))
+PROMPT_TESTS_TOKENS = int(os.getenv("PROMPT_TESTS_TOKENS", "3000"))
+PROMPT_PROBLEM_TOKENS = int(os.getenv("PROMPT_PROBLEM_TOKENS", "3000"))
+PROMPT_TEST_FIELD_CHARS = int(os.getenv("PROMPT_TEST_FIELD_CHARS", "400"))  # per input / expected output
+
+CHARS_PER_TOKEN = 4  # matches gemini_client.estimate_tokens
+
+def clip(text: str, max_chars: int) -> str:
+    """Keeps the head and tail of an oversized text and notes how much was cut."""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n... [{omitted} characters omitted, {len(text)} total] ...\n{text[-tail:] if tail else ''}"
+
+def clip_test_field(text: str, size: int) -> str:
+    """Clips a test input / output; `size` is the full data's size when `text` is only its stored preview."""
+    if size <= len(text.encode("utf-8")):
+        return clip(text, PROMPT_TEST_FIELD_CHARS)
+    return f"{text[:PROMPT_TEST_FIELD_CHARS]}\n... [truncated, {size} bytes in total] ..."
+
+def format_test_cases(test_cases: list[TestCase], failed: Optional[set[int]] = None, budget: int = PROMPT_TESTS_TOKENS) -> str:
+    """
+    Renders as many test cases as fit in `budget` tokens: samples first, then
+    tests that failed execution, then the rest smallest first. Large fields
+    are clipped with their size noted, and numbering follows the original
+    order so it lines up with the execution report.
+    """
+    if not test_cases:
+        return "No test cases provided. Judge based on problem description."
+
+    failed = failed or set()
+    order = sorted(
+        range(len(test_cases)),
+        key=lambda i: (
+            not test_cases[i].is_sample,
+            i not in failed,
+            (test_cases[i].input_size or len(test_cases[i].input_data))
+            + (test_cases[i].output_size or len(test_cases[i].expected_output)),
+            i,
+        ),
+    )
+
+    parts = []
+    used = 0
+    for i in order:
+        tc = test_cases[i]
+        block = (
+            f"Test Case {i + 1}{' (sample)' if tc.is_sample else ''}:\n"
+            f"  Input: {clip_test_field(tc.input_data, tc.input_size)}\n"
+            f"  Expected Output: {clip_test_field(tc.expected_output, tc.output_size)}\n"
+        )
+        cost = estimate_tokens(block)
+        if parts and used + cost > budget:
+            break
+        parts.append((i, block))
+        used += cost
+
+    shown = sorted(parts)
+    text = "\n".join(block for _, block in shown)
+    omitted = len(test_cases) - len(shown)
+    if omitted:
+        text += f"\n({omitted} more test cases not shown; {len(test_cases)} in total.)\n"
+    return text
+
+FILE_HEADER = "# File: "
+# Layout of code_content stored before files were fenced; still read for rejudges
+LEGACY_FILE_HEADER = re.compile(r"^# ===== (.+) =====\n", re.MULTILINE)
+
+def fence_for(content: str) -> str:
+    """A backtick fence longer than any backtick run in `content`, so the content cannot close it."""
+    longest = max((len(run) for run in re.findall(r"`+", content)), default=0)
+    return "`" * max(3, longest + 1)
+
+def render_files(files: dict[str, str]) -> str:
+    """
+    Flattens a file set into one text block for the AI prompt and
+    Submission.code_content: "# File: path" and the content in a fence the
+    content cannot contain, so no file can fake a boundary. A lone
+    solution.py is kept as is unless it could pass for either layout.
+    """
+    if list(files) == ["solution.py"]:
+        content = files["solution.py"]
+        if not content.startswith(FILE_HEADER) and not LEGACY_FILE_HEADER.match(content):
+            return content
+    blocks = []
+    for path, content in files.items():
+        fence = fence_for(content)
+        blocks.append(f"{FILE_HEADER}{path}\n{fence}\n{content}\n{fence}")
+    return "\n\n".join(blocks)
+
+def split_rendered_files(code: str) -> dict[str, str]:
+    """Inverse of render_files, for re-running a stored Submission.code_content."""
+    if LEGACY_FILE_HEADER.match(code):
+        parts = LEGACY_FILE_HEADER.split(code)[1:]
+        return {path: content.removesuffix("\n\n") for path, content in zip(parts[::2], parts[1::2])}
+    if not code.startswith(FILE_HEADER):
+        return {"solution.py": code}
+    files = {}
+    start = 0
+    try:
+        while start < len(code):
+            header_end = code.index("\n", start)
+            fence_end = code.index("\n", header_end + 1)
+            fence = code[header_end + 1:fence_end]
+            # The content has no backtick run this long, so this is its closing fence
+            close = code.index(f"\n{fence}", fence_end)
+            files[code[start + len(FILE_HEADER):header_end]] = code[fence_end + 1:close]
+            start = close + 1 + len(fence) + 2  # past the fence and the "\n\n" separator
+    except ValueError:
+        return {"solution.py": code}
+    return files
+
+def trim_code(files: dict[str, str], budget: int = PROMPT_CODE_TOKENS) -> str:
+    """
+    Renders the submission's files for the prompt. When they exceed `budget`
+    tokens, every file keeps a share of the budget proportional to its size
+    (the head and tail of each file, with the cut noted).
+    """
+    total = sum(len(content) for content in files.values())
+    max_chars = budget * CHARS_PER_TOKEN
+    if total <= max_chars:
+        return render_files(files)
+    return render_files({
+        path: clip(content, max(400, max_chars * len(content) // total))
+        for path, content in files.items()
+    })
+
+def trim_text(text: str, budget: int) -> str:
+    return clip(text, budget * CHARS_PER_TOKEN)
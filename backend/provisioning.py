@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import User, Problem
+from repo_manager import create_student_repo
+from github_client import BACKGROUND, GitHubRateLimited, github_scheduler
+from blocking import run_blocking
+from jobstore import set_value, get_value, replace_value
+from metrics import spawn_background
+
+PROVISION_CONCURRENCY = int(os.getenv("PROVISION_CONCURRENCY", "8"))  # repo creations in flight per process
+PROVISION_MAX_ATTEMPTS = int(os.getenv("PROVISION_MAX_ATTEMPTS", "5"))
+PROVISION_BACKOFF_MAX = 15 * 60.0  # longest rate-limit wait before retrying, seconds
+JOB_TTL = 60 * 60 * 24  # seconds a job record stays readable
+# A running job renews its lease every JOB_HEARTBEAT seconds. One whose lease
+# ran out died with its worker (crash, --max-requests recycle): it reads as
+# failed and its claim can be taken over.
+JOB_LEASE = 120.0
+JOB_HEARTBEAT = 30.0
+FINISHED = ("done", "failed")
+
+KEY_PREFIX = "minicode:provision:"
+
+# Job records and claims go through jobstore (Redis, else the database), so
+# any worker can report them and claims hold across workers
+_running: set[asyncio.Task] = set()
+_semaphore = asyncio.Semaphore(PROVISION_CONCURRENCY)
+
+async def save_job(job: dict):
+    if job["status"] not in FINISHED:
+        job["lease_until"] = time.time() + JOB_LEASE
+    await set_value(KEY_PREFIX + job["id"], json.dumps(job), JOB_TTL)
+
+async def get_job(job_id: str) -> Optional[dict]:
+    value = await get_value(KEY_PREFIX + job_id)
+    if not value:
+        return None
+    job = json.loads(value)
+    if job["status"] not in FINISHED and job.get("lease_until", 0) < time.time():
+        job.update({"status": "failed", "error": "Provisioning stopped unexpectedly; start it again"})
+    return job
+
+async def _beat(job: dict):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT)
+        try:
+            await save_job(job)
+        except Exception as e:
+            print(f"Could not renew the lease of job {job['id']}: {e}")
+
+@asynccontextmanager
+async def heartbeat(job: dict):
+    """Renews the job's lease while the block runs, including rate-limit waits."""
+    task = asyncio.create_task(_beat(job))
+    try:
+        yield
+    finally:
+        task.cancel()
+        # A renewal still in flight must not land after the caller's final save
+        await asyncio.gather(task, return_exceptions=True)
+
+def new_job(kind: str, problem_id: int, **fields) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "problem_id": problem_id,
+        "status": "queued",
+        "started_at": time.time(),
+        "finished_at": None,
+        **fields,
+    }
+
+async def claim(user_id: int, problem_id: int, job: dict) -> Optional[dict]:
+    """
+    Registers `job` as the provisioning of this user's repo for this problem.
+    Returns the existing job instead if one is queued, running or done, so
+    repeated clicks and bulk runs never provision twice. Failed jobs, and
+    jobs whose lease expired with their worker, can be replaced.
+    """
+    claim_key = f"{KEY_PREFIX}repo:{user_id}:{problem_id}"
+    while True:
+        if await set_value(claim_key, job["id"], JOB_TTL, nx=True):
+            return None
+        existing_id = await get_value(claim_key)
+        if existing_id is None:
+            continue  # expired in between
+        existing = await get_job(existing_id)
+        if existing and existing["status"] != "failed":
+            return existing
+        # The previous attempt failed or died; take its place unless another claimer just did
+        if await replace_value(claim_key, existing_id, job["id"], JOB_TTL):
+            return None
+
+async def run_repo_job(user: User, problem: Problem, job: dict) -> dict:
+    """
+    Creates the repo, waiting out GitHub rate limits between attempts. Calls go
+    through the GitHub scheduler at background priority, so they yield to
+    judge fetches with the same token and stop short of its quota.
+    """
+    token = user.github_access_token
+    async with heartbeat(job):
+        for attempt in range(1, PROVISION_MAX_ATTEMPTS + 1):
+            job.update({"status": "running", "attempts": attempt})
+            await save_job(job)
+            try:
+                async with _semaphore, github_scheduler.slot(token, BACKGROUND):
+                    client = github_scheduler.github(token)
+                    try:
+                        job["repo_url"] = await run_blocking(create_student_repo, user, problem, client)
+                    finally:
+                        github_scheduler.observe_github(token, client)
+                job.update({"status": "done", "error": None, "retry_at": None})
+                break
+            except GitHubRateLimited as e:
+                if e.__cause__ is not None:  # GitHub answered with a limit, not just the scheduler
+                    github_scheduler.pause(token, e.retry_after, BACKGROUND)
+                if attempt == PROVISION_MAX_ATTEMPTS:
+                    job.update({"status": "failed", "error": str(e)})
+                    break
+                # Jitter spreads a class's worth of retries instead of firing them together
+                delay = min(PROVISION_BACKOFF_MAX, e.retry_after) + random.uniform(0, 5)
+                job.update({"status": "waiting", "retry_at": time.time() + delay})
+                await save_job(job)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                print(f"Provisioning repo for {user.username} / problem {problem.id} failed: {e}")
+                job.update({"status": "failed", "error": str(e)})
+                break
+    job["finished_at"] = time.time()
+    await save_job(job)
+    return job
+
+def _spawn(coro):
+    task = spawn_background(coro)
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+async def start_provisioning(user: User, problem: Problem) -> dict:
+    """Returns the user's provisioning job for the problem, starting one in the background if needed."""
+    job = new_job("repo", problem.id, user_id=user.id, repo_url=None, error=None, attempts=0, retry_at=None)
+    existing = await claim(user.id, problem.id, job)
+    if existing:
+        return existing
+    await save_job(job)
+    _spawn(run_repo_job(user, problem, job))
+    return job
+
+async def provision_problem(session_factory: Callable[[], AsyncSession], problem_id: int, job: dict) -> dict:
+    """
+    Pre-provisions the problem's repo for every student with a GitHub token.
+    Students that already have a repo (or a job under way) are counted, not
+    redone. PROVISION_CONCURRENCY students are worked on at a time, and an
+    error is recorded on that student's job and counted as failed without
+    stopping the others.
+    """
+    async with session_factory() as session:
+        problem = await session.get(Problem, problem_id)
+        if not problem:
+            raise ValueError(f"Problem {problem_id} not found")
+        students = (await session.exec(select(User).where(User.role == "student"))).all()
+
+    job.update({"status": "running", "total": len(students)})
+    await save_job(job)
+
+    async def provision_one(student: User):
+        repo_job = None
+        try:
+            if not student.github_access_token:
+                job["skipped"] += 1
+                return
+            repo_job = new_job("repo", problem_id, user_id=student.id, repo_url=None, error=None, attempts=0, retry_at=None)
+            existing = await claim(student.id, problem_id, repo_job)
+            if existing:
+                job["already"] += 1
+                return
+            await save_job(repo_job)
+            result = await run_repo_job(student, problem, repo_job)
+            job["provisioned" if result["status"] == "done" else "failed"] += 1
+        except Exception as e:
+            print(f"Provisioning repo for {student.username} / problem {problem_id} failed: {e}")
+            job["failed"] += 1
+            if repo_job is not None:
+                repo_job.update({"status": "failed", "error": str(e), "finished_at": time.time()})
+                try:
+                    await save_job(repo_job)
+                except Exception as e:
+                    print(f"Could not record the failure of job {repo_job['id']}: {e}")
+        finally:
+            job["done"] += 1
+            try:
+                await save_job(job)
+            except Exception as e:
+                print(f"Could not save bulk provisioning progress: {e}")
+
+    pending = iter(students)
+
+    async def worker():
+        for student in pending:  # shared iterator: each student goes to exactly one worker
+            await provision_one(student)
+
+    async with heartbeat(job):
+        await asyncio.gather(*(worker() for _ in range(min(PROVISION_CONCURRENCY, len(students)))))
+    job.update({"status": "done", "finished_at": time.time()})
+    await save_job(job)
+    return job
+
+async def start_bulk_provisioning(session_factory: Callable[[], AsyncSession], problem_id: int) -> dict:
+    """Runs provision_problem in the background of this process and returns its job record."""
+    job = new_job("bulk", problem_id, total=0, done=0, provisioned=0, already=0, skipped=0, failed=0)
+    await save_job(job)
+
+    async def run():
+        try:
+            await provision_problem(session_factory, problem_id, job)
+        except Exception as e:
+            print(f"Bulk provisioning of problem {problem_id} failed: {e}")
+            job.update({"status": "failed", "error": str(e), "finished_at": time.time()})
+            await save_job(job)
+
+    _spawn(run())
+    return job
@@ -0,0 +1,83 @@
+import re
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from database import engine
+import analytics
+import judge_queue
+import leaderboard
+import main
+import rejudge
+
+# Tables that grow with usage. A hot query must reach them through an index.
+HOT_TABLES = {"submission", "testcase", "user_scores", "problem_best_scores", "users"}
+
+def hot_queries(dialect: str) -> dict:
+    """
+    The request-path and judge statements, built by the same functions the
+    code runs them through, with representative parameters.
+    """
+    since = datetime.utcnow() - timedelta(hours=48)
+    return {
+        "profile recent submissions (main.get_me)": main.recent_submissions_query(1),
+        "submission history for a problem (main.get_my_submissions)": main.submission_history_query(1, 51, problem_id=1),
+        "submission history, next page (main.get_my_submissions)": main.submission_history_query(1, 51, cursor=1000),
+        "login (main.login)": main.login_query("admin"),
+        "analytics totals (analytics.compute_problem_analytics)": analytics.totals_query(1),
+        "analytics score counts (analytics.compute_problem_analytics)": analytics.score_counts_query(1),
+        "analytics per hour (analytics.compute_problem_analytics)": analytics.per_hour_query(1, since, dialect),
+        "best accepted scores per problem (leaderboard.rebuild_problem_scores)": leaderboard.best_scores_query(1),
+        "latest judged submissions (rejudge.select_submissions)": rejudge.select_submissions_query(1),
+        "test cases of a problem (judge_queue.process_submission)": judge_queue.test_cases_query(1),
+        "overdue pending submissions (judge_queue.requeue_overdue)": judge_queue.overdue_query(since),
+        "leaderboard page (leaderboard.get_leaderboard_page)": leaderboard.leaderboard_page_query(51),
+        "leaderboard next page (leaderboard.get_leaderboard_page)": leaderboard.leaderboard_page_query(51, (100, 1, 50)),
+        "rank of a user (leaderboard.get_user_rank)": leaderboard.users_ahead_query(100, 1),
+        "best score lookup (leaderboard.record_verdict)": leaderboard.best_score_query(1, 1),
+    }
+
+def explain(connection, statement) -> list[str]:
+    """Returns the tables the plan reads with a full sequential scan."""
+    sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        # "SCAN submission" reads every row; "SCAN ... USING [COVERING] INDEX" and "SEARCH" do not
+        return [m.group(1) for row in rows if (m := re.match(r"SCAN (?:TABLE )?(\w+)\b(?! USING)", row[-1]))]
+    # Postgres picks sequential scans on small tables whatever the indexes, so
+    # disable them: a Seq Scan that remains means no usable index exists
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return scans
+
+def hot_table_scans(connection, statement) -> list[str]:
+    """Hot tables the statement's plan reads with a sequential scan."""
+    with connection.begin():
+        return [table for table in explain(connection, statement) if table in HOT_TABLES]
+
+def check() -> int:
+    """Explains every hot query against DATABASE_URL; returns the number that scan a hot table."""
+    failures = 0
+    with engine.connect() as connection:
+        for name, statement in hot_queries(connection.dialect.name).items():
+            scanned = hot_table_scans(connection, statement)
+            failures += bool(scanned)
+            print(f"{'SEQ SCAN' if scanned else 'ok':8}  {name}" + (f": {', '.join(scanned)}" if scanned else ""))
+    return failures
+
+if __name__ == "__main__":
+    # Run against a migrated database (alembic upgrade head), e.g. in CI on a
+    # scratch SQLite file or Postgres database
+    failed = check()
+    if failed:
+        print(f"{failed} hot queries fall back to sequential scans; add or fix an index (and a migration).")
+        sys.exit(1)
+    print("All hot queries use indexes.")
@@ -0,0 +1,138 @@
+import os
+import math
+import time
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from redis.exceptions import RedisError
+from models import User
+from auth import get_current_user
+from cache import TTLCache
+from redis_client import get_redis
+from metrics import RATE_LIMITED
+
+# Token buckets per (policy, caller), shared by every worker and host through
+# Redis when REDIS_URL is set, otherwise kept per process. A policy maps roles
+# to "requests/seconds": a caller may burst `requests` and then gets one more
+# every seconds/requests. "*" covers roles not listed, 0 means unlimited.
+# Override one with RATE_LIMIT_<POLICY>, e.g. RATE_LIMIT_SUBMIT="student=10/60,*=0".
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+
+DEFAULT_POLICIES = {
+    "submit": "student=6/60,*=60/60",  # each submit costs a GitHub fetch and a Gemini call
+    "start": "student=10/60,*=60/60",  # repo provisioning
+    "login": "anonymous=10/60",  # per client IP; bcrypt is CPU-bound
+    "github_login": "anonymous=20/60",  # per client IP; two GitHub calls each
+}
+
+KEY_PREFIX = "minicode:ratelimit:"
+
+# Refill and take one token atomically. Redis' own clock keeps buckets
+# consistent across hosts; replicate_commands() allows writes after TIME on
+# Redis < 7 (deprecated and a no-op since).
+TAKE_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+def parse_policy(spec: str) -> dict[str, tuple[int, float]]:
+    """"student=6/60,*=60/60" -> {"student": (6, 60.0), "*": (60, 60.0)}"""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        role, _, limit = part.partition("=")
+        requests, _, seconds = limit.partition("/")
+        limits[role.strip()] = (int(requests), float(seconds or 60))
+    return limits
+
+POLICIES = {
+    name: parse_policy(os.getenv(f"RATE_LIMIT_{name.upper()}", spec))
+    for name, spec in DEFAULT_POLICIES.items()
+}
+
+class RateLimiter:
+    def __init__(self, policies: dict):
+        self.policies = policies
+        # Idle buckets are full again after one window, so dropping them is safe
+        self.local = TTLCache(maxsize=100_000, ttl=3600)
+        self._take = None
+
+    def limit(self, policy: str, role: str) -> Optional[tuple[int, float]]:
+        limits = self.policies.get(policy, {})
+        limit = limits.get(role, limits.get("*"))
+        return limit if limit and limit[0] > 0 else None
+
+    async def take(self, policy: str, role: str, caller: str) -> Optional[float]:
+        """Spends one request of `caller`'s budget; returns None if allowed, else seconds until it would be."""
+        limit = self.limit(policy, role)
+        if not RATE_LIMIT_ENABLED or limit is None:
+            return None
+        capacity, seconds = limit
+        rate = capacity / seconds
+        key = f"{KEY_PREFIX}{policy}:{caller}"
+        client = get_redis()
+        if client:
+            if self._take is None:
+                self._take = client.register_script(TAKE_SCRIPT)
+            try:
+                allowed, tokens = await self._take(keys=[key], args=[capacity, rate])
+            except RedisError as e:
+                # Fail open: an unreachable Redis should not take submissions down with it
+                print(f"Rate limiter unavailable, allowing request: {e}")
+                return None
+            tokens = float(tokens)
+        else:
+            now = time.monotonic()
+            tokens, updated = self.local.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.local.set(key, (tokens, now))
+        return None if allowed else (1 - tokens) / rate
+
+    async def check(self, policy: str, role: str, caller: str):
+        retry_after = await self.take(policy, role, caller)
+        if retry_after is not None:
+            RATE_LIMITED.labels(policy=policy, role=role).inc()
+            seconds = max(1, math.ceil(retry_after))
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many requests; try again in {seconds} seconds",
+                headers={"Retry-After": str(seconds)},
+            )
+
+rate_limiter = RateLimiter(POLICIES)
+
+def rate_limit(policy: str):
+    """Dependency like require_role: returns the current user after charging them one request of `policy`."""
+    async def limiter(user: User = Depends(get_current_user)):
+        await rate_limiter.check(policy, user.role, f"user:{user.id}")
+        return user
+    return limiter
+
+def rate_limit_ip(policy: str):
+    """
+    Dependency for unauthenticated routes, charging the client address as role
+    "anonymous". Behind a proxy this relies on Gunicorn's --forwarded-allow-ips
+    trusting it, otherwise every client shares the proxy's address.
+    """
+    async def limiter(request: Request):
+        host = request.client.host if request.client else "unknown"
+        await rate_limiter.check(policy, "anonymous", f"ip:{host}")
+    return limiter
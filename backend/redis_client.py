@@ -0,0 +1,19 @@
+import os
+from typing import Optional
+import redis.asyncio as redis
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+_client: Optional[redis.Redis] = None
+
+def get_redis() -> Optional[redis.Redis]:
+    """
+    Returns the shared async Redis client, or None when REDIS_URL is not set.
+    Callers are expected to fall back to an in-process implementation.
+    """
+    global _client
+    if not REDIS_URL:
+        return None
+    if _client is None:
+        _client = redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Callable, Optional
+from sqlmodel import select, func, and_, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models import Submission, User, Problem, TestCase
+from judge import resolve_verdict
+from prompt_builder import split_rendered_files
+from github_fetch import fetch_repo_files, parse_repo_url
+from github_client import BACKGROUND, GitHubRateLimited
+from leaderboard import rebuild_problem_scores
+from analytics import invalidate_problem_analytics
+from jobstore import set_value, get_value
+from metrics import spawn_background
+
+REJUDGE_CONCURRENCY = int(os.getenv("REJUDGE_CONCURRENCY", "4"))
+JOB_TTL = 60 * 60 * 24  # seconds a finished job's progress stays readable
+
+KEY_PREFIX = "minicode:rejudge:"
+# Older judges stored this instead of code when the GitHub fetch failed
+FETCH_ERROR_PLACEHOLDER = "# Error fetching code:"
+
+# Job progress goes through jobstore (Redis, else the database), so any worker can report it
+_running: set[asyncio.Task] = set()
+
+async def save_job(job: dict):
+    await set_value(KEY_PREFIX + job["id"], json.dumps(job), JOB_TTL)
+
+async def get_job(job_id: str) -> Optional[dict]:
+    value = await get_value(KEY_PREFIX + job_id)
+    return json.loads(value) if value else None
+
+def in_scope(problem_id: int, scope: str = "latest"):
+    """
+    Condition on Submission for the finished submissions a rejudge covers:
+    each user's latest one plus every accepted one, or every one with
+    scope="all". Accepted submissions are always included because best scores
+    count all of them; a stale accepted verdict left out would keep its points.
+    """
+    if scope == "latest":
+        latest = (
+            select(func.max(Submission.id))
+            .where(Submission.problem_id == problem_id, Submission.status != "pending")
+            .group_by(Submission.user_id)
+        )
+        accepted = and_(Submission.problem_id == problem_id, Submission.status == "accepted")
+        return or_(Submission.id.in_(latest), accepted)
+    return and_(Submission.problem_id == problem_id, Submission.status != "pending")
+
+def select_submissions_query(problem_id: int, scope: str = "latest"):
+    return select(Submission).where(in_scope(problem_id, scope)).order_by(Submission.id)
+
+async def select_submissions(session: AsyncSession, problem_id: int, scope: str = "latest") -> list[Submission]:
+    return (await session.exec(select_submissions_query(problem_id, scope))).all()
+
+async def load_files(submission: Submission, token: Optional[str]) -> Optional[dict[str, str]]:
+    """
+    The code a submission was judged on: the stored code_content, or the repo
+    at the recorded commit when only the SHA is known. None if neither exists.
+    Submissions from before commit_sha was recorded only have code_content.
+    """
+    if submission.code_content and not submission.code_content.startswith(FETCH_ERROR_PLACEHOLDER):
+        return split_rendered_files(submission.code_content)
+    if submission.commit_sha and token and submission.repo_url:
+        owner, repo = parse_repo_url(submission.repo_url)
+        return await fetch_repo_files(token, owner, repo, submission.commit_sha, submission.language, BACKGROUND)
+    return None
+
+async def rejudge_problem(
+    session_factory: Callable[[], AsyncSession],
+    problem_id: int,
+    scope: str = "latest",
+    job: Optional[dict] = None,
+    concurrency: int = REJUDGE_CONCURRENCY,
+) -> dict:
+    """
+    Re-evaluates a problem's submissions against its current test cases.
+
+    Verdicts are computed by a bounded pool without holding database
+    connections, with identical code served from the verdict cache. All
+    results and the problem's leaderboard scores are then written in one
+    transaction, so totals never reflect a half-finished rejudge.
+    """
+    job = job or new_job(problem_id, scope)
+    async with session_factory() as session:
+        problem = await session.get(Problem, problem_id)
+        if not problem:
+            raise ValueError(f"Problem {problem_id} not found")
+        test_cases = (await session.exec(select(TestCase).where(TestCase.problem_id == problem_id))).all()
+        submissions = await select_submissions(session, problem_id, scope)
+        user_ids = {s.user_id for s in submissions}
+        tokens = dict((await session.exec(
+            select(User.id, User.github_access_token).where(User.id.in_(user_ids))
+        )).all()) if user_ids else {}
+
+    job.update({"status": "running", "total": len(submissions)})
+    await save_job(job)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results: dict[int, dict] = {}
+
+    async def rejudge_one(submission: Submission):
+        async with semaphore:
+            try:
+                files = await load_files(submission, tokens.get(submission.user_id))
+                if files is None:
+                    job["skipped"] += 1
+                    return
+                verdict = await resolve_verdict(files, problem, test_cases, submission.language)
+                results[submission.id] = verdict
+                if verdict["status"] != submission.status or verdict["score"] != submission.score:
+                    job["changed"] += 1
+            except GitHubRateLimited:
+                # The owner's token is saving its quota for judging; keep the old verdict
+                job["rate_limited"] += 1
+            except Exception as e:
+                print(f"Rejudge failed for submission {submission.id}: {e}")
+                job["errors"] += 1
+            finally:
+                job["done"] += 1
+                await save_job(job)
+
+    await asyncio.gather(*(rejudge_one(s) for s in submissions))
+
+    # One transaction: every new verdict plus the recomputed leaderboard rows
+    async with session_factory() as session:
+        for submission_id, verdict in results.items():
+            submission = await session.get(Submission, submission_id)
+            for field, value in verdict.items():
+                setattr(submission, field, value)
+            session.add(submission)
+        await session.flush()
+        await rebuild_problem_scores(session, problem_id)
+        await session.commit()
+    await invalidate_problem_analytics(problem_id)
+
+    job.update({"status": "done", "finished_at": time.time()})
+    await save_job(job)
+    return job
+
+def new_job(problem_id: int, scope: str, created_by: Optional[int] = None) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "problem_id": problem_id,
+        "scope": scope,
+        "created_by": created_by,  # user id; None for the CLI
+        "status": "queued",
+        "total": 0,
+        "done": 0,
+        "changed": 0,
+        "skipped": 0,
+        "rate_limited": 0,
+        "errors": 0,
+        "started_at": time.time(),
+        "finished_at": None,
+    }
+
+async def start_rejudge(
+    session_factory: Callable[[], AsyncSession],
+    problem_id: int,
+    scope: str = "latest",
+    created_by: Optional[int] = None,
+) -> dict:
+    """Runs rejudge_problem in the background of this process and returns its job record."""
+    job = new_job(problem_id, scope, created_by)
+    await save_job(job)
+
+    async def run():
+        try:
+            await rejudge_problem(session_factory, problem_id, scope, job)
+        except Exception as e:
+            print(f"Rejudge of problem {problem_id} failed: {e}")
+            job.update({"status": "failed", "error": str(e), "finished_at": time.time()})
+            await save_job(job)
+
+    task = spawn_background(run())
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return job
+
+async def _main(problem_id: int, scope: str):
+    from database import async_session_factory
+
+    job = new_job(problem_id, scope)
+    progress = asyncio.create_task(rejudge_problem(async_session_factory, problem_id, scope, job))
+    while not progress.done():
+        await asyncio.sleep(2)
+        print(f"{job['done']}/{job['total']} rejudged, {job['changed']} changed, {job['skipped']} skipped, {job['errors']} errors")
+    return await progress
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    if not args or not args[0].isdigit() or args[1:] not in ([], ["--all"]):
+        print("Usage: python rejudge.py <problem_id> [--all]")
+        sys.exit(1)
+    result = asyncio.run(_main(int(args[0]), "all" if args[1:] else "latest"))
+    print(f"Rejudge finished: {result['done']}/{result['total']} submissions, {result['changed']} changed.")
@@ -1,66 +1,92 @@
 import os
-from github import Github
-from sqlmodel import Session
+from typing import Optional
+from github import Github, GithubException, RateLimitExceededException
 from models import User, Problem
+from github_client import GITHUB_API_URL, GITHUB_SECONDARY_LIMIT_WAIT, GitHubRateLimited, rate_limit_delay
 
-def create_student_repo(user: User, problem: Problem, session: Session):
+# "owner/repo" of a GitHub template repository holding the starter files
+GITHUB_TEMPLATE_REPO = os.getenv("GITHUB_TEMPLATE_REPO")
+
+STARTER_CODE = "# Write your solution here\n\ndef solve():\n    pass\n"
+
+def repo_name_for(user: User, problem: Problem) -> str:
+    return f"minicode-{user.username}-{problem.title.lower().replace(' ', '-')}"
+
+def starter_files(problem: Problem) -> list[tuple[str, str, str]]:
+    """(path, commit message, content) of the files a repo starts with, in commit order."""
+    return [
+        ("README.md", "Initialize with problem description", f"# {problem.title}\n\n{problem.description}"),
+        ("solution.py", "Add starter code", STARTER_CODE),
+    ]
+
+def has_file(repo, path: str) -> bool:
+    try:
+        repo.get_contents(path, ref="main")
+        return True
+    except GithubException as e:
+        if e.status != 404:  # also 404 while the repo is empty
+            raise
+        return False
+
+def create_student_repo(user: User, problem: Problem, g: Optional[Github] = None) -> str:
     """
-    Creates a dedicated repository for a student to solve a specific problem.
+    Creates (or finds) the student's private repository for a problem and
+    returns its URL. Idempotent: an existing repo with the same name is reused.
+    With GITHUB_TEMPLATE_REPO set this is one API call; otherwise the repo is
+    created empty and the README and starter file are added (three calls).
+    If an earlier attempt stopped between those calls, the existing repo is
+    checked and whichever starter files are missing are added before the URL
+    is returned.
+    Blocking (PyGithub); call it through blocking.run_blocking from async code.
+    Raises GitHubRateLimited instead of sleeping when GitHub throttles.
+    `g` is the token's pooled client from github_client.github_scheduler.
     """
     if not user.github_access_token:
         raise Exception("User has no GitHub access token")
-    
-    g = Github(user.github_access_token)
-    repo_name = f"minicode-{user.username}-{problem.title.lower().replace(' ', '-')}"
-    
+
+    # No client-side retries: rate-limit waits are scheduled by the caller
+    g = g or Github(user.github_access_token, base_url=GITHUB_API_URL, retry=None)
+    repo_name = repo_name_for(user, problem)
+    description = f"Solution for {problem.title} on MiniCode"
+
     try:
-        # Create the repository
-        # In a real scenario, you might want to use a template repo
-        # repo = g.get_user().create_repo_from_template(repo_name, template_repo)
-        
-        repo = g.get_user().create_repo(
-            repo_name,
-            description=f"Solution for {problem.title} on MiniCode",
-            private=True,
-            auto_init=True
-        )
-        
-        # Update the auto-generated README with problem description
-        try:
-            readme = repo.get_contents("README.md", ref="main")
-            repo.update_file(
-                "README.md",
-                "Initialize with problem description",
-                f"# {problem.title}\n\n{problem.description}",
-                readme.sha,
-                branch="main"
+        if GITHUB_TEMPLATE_REPO:
+            _, data = g.requester.requestJsonAndCheck(
+                "POST",
+                f"/repos/{GITHUB_TEMPLATE_REPO}/generate",
+                input={"owner": user.username, "name": repo_name, "description": description, "private": True},
             )
-        except Exception:
-            pass
-        
-        # Create a starter code file
-        repo.create_file(
-            "solution.py",
-            "Add starter code",
-            "# Write your solution here\n\ndef solve():\n    pass\n",
-            branch="main"
-        )
-        
-        return repo.html_url
-    except Exception as e:
-        print(f"Error creating repo: {e}")
-        # If repo already exists, just return its URL or handle accordingly
+            return data["html_url"]
+
         try:
-            repo = g.get_user().get_repo(repo_name)
-            return repo.html_url
-        except:
-            raise e
+            repo = g.get_user().create_repo(repo_name, description=description, private=True, auto_init=False)
+            missing = starter_files(problem)
+        except GithubException as e:
+            if e.status != 422:
+                raise
+            # The name is taken: provisioned before, possibly by an attempt that stopped halfway
+            repo = g.get_repo(f"{user.username}/{repo_name}")
+            missing = [f for f in starter_files(problem) if not has_file(repo, f[0])]
+        # The first commit on an empty repo creates the main branch
+        for path, message, content in missing:
+            repo.create_file(path, message, content, branch="main")
+        return repo.html_url
+    except GithubException as e:
+        delay = rate_limit_delay(e.status, e.headers)
+        if delay is None and (isinstance(e, RateLimitExceededException) or "rate limit" in str(e.data).lower()):
+            delay = GITHUB_SECONDARY_LIMIT_WAIT
+        if delay is not None:
+            raise GitHubRateLimited(delay) from e
+        if e.status != 422:
+            raise
+        # 422: the name is taken, i.e. the repo was generated from the template before
+        return g.get_repo(f"{user.username}/{repo_name}").html_url
 
 def commit_code_to_repo(user: User, repo_name: str, file_path: str, content: str, commit_message: str):
     """
     Commits code from the in-browser editor to the student's repository.
     """
-    g = Github(user.github_access_token)
+    g = Github(user.github_access_token, base_url=GITHUB_API_URL)
     repo = g.get_user().get_repo(repo_name)
     
     try:
@@ -0,0 +1,44 @@
+"""
+Resource-limited launcher for student code, run as its own small interpreter:
+
+    python -I -S sandbox.py REPORT CPU_SECONDS MEMORY_BYTES OUTPUT_BYTES -- command...
+
+It forks the command with rlimits applied, waits for it, and writes the exit
+code and rusage to REPORT as JSON. executor.py normally starts it inside a
+bubblewrap jail (see executor.jail_command). Linux carries the forking process's peak
+RSS over into the child's ru_maxrss, so measuring from this tiny process
+instead of the API worker keeps the server's memory out of the numbers.
+"""
+import os
+import sys
+import json
+import resource
+
+def main():
+    report_path, cpu, memory, output = sys.argv[1:5]
+    command = sys.argv[sys.argv.index("--") + 1:]
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            cpu, memory, output = int(cpu), int(memory), int(output)
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            # No new processes or threads: nothing outlives the run or forks past the limits
+            resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+            os.execv(command[0], command)
+        finally:
+            os._exit(127)
+
+    _, status, usage = os.wait4(pid, 0)
+    with open(report_path, "w") as f:
+        json.dump({
+            "returncode": os.waitstatus_to_exitcode(status),
+            "cpu_time": usage.ru_utime + usage.ru_stime,
+            "memory_kb": usage.ru_maxrss,
+        }, f)
+
+if __name__ == "__main__":
+    main()
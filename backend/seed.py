@@ -1,8 +1,18 @@
 import os
-from sqlmodel import Session, select
-from models import User, Problem, TestCase
-from main import engine, create_db_and_tables
+import random
+import asyncio
+from datetime import datetime, timedelta
+from sqlmodel import Session, select, func
+from models import User, Problem, TestCase, Submission
+from database import engine, async_session_factory, create_db_and_tables
 from auth import get_password_hash
+from testdata import build_test_case
+from leaderboard import rebuild_leaderboard
+
+# Load-test data (python seed.py load ...): users, problems and submissions
+# with "bench" names, used by bench.py. Every bench user's password is this.
+BENCH_PASSWORD = "password"
+BENCH_STATUSES = {"accepted": 45, "wrong_answer": 30, "runtime_error": 10, "tle": 8, "error": 7}
 
 def seed_db():
     create_db_and_tables()
@@ -53,9 +63,9 @@ def seed_db():
             session.refresh(p1)
             
             session.add_all([
-                TestCase(problem_id=p1.id, input_data="2 7 11 15\n9", expected_output="0 1", is_sample=True),
-                TestCase(problem_id=p1.id, input_data="3 2 4\n6", expected_output="1 2", is_sample=True),
-                TestCase(problem_id=p1.id, input_data="3 3\n6", expected_output="0 1", is_sample=True),
+                build_test_case(p1.id, "2 7 11 15\n9", "0 1", is_sample=True),
+                build_test_case(p1.id, "3 2 4\n6", "1 2", is_sample=True),
+                build_test_case(p1.id, "3 3\n6", "0 1", is_sample=True),
             ])
             
             # Problem 2: Hello World
@@ -72,7 +82,7 @@ def seed_db():
             session.refresh(p2)
             
             session.add_all([
-                TestCase(problem_id=p2.id, input_data="", expected_output="Hello World", is_sample=True),
+                build_test_case(p2.id, "", "Hello World", is_sample=True),
             ])
             
             # Problem 3: FizzBuzz
@@ -89,8 +99,8 @@ def seed_db():
             session.refresh(p3)
             
             session.add_all([
-                TestCase(problem_id=p3.id, input_data="5", expected_output="1\n2\nFizz\n4\nBuzz", is_sample=True),
-                TestCase(problem_id=p3.id, input_data="15", expected_output="1\n2\nFizz\n4\nBuzz\nFizz\n7\n8\nFizz\nBuzz\n11\nFizz\n13\n14\nFizzBuzz", is_sample=True),
+                build_test_case(p3.id, "5", "1\n2\nFizz\n4\nBuzz", is_sample=True),
+                build_test_case(p3.id, "15", "1\n2\nFizz\n4\nBuzz\nFizz\n7\n8\nFizz\nBuzz\n11\nFizz\n13\n14\nFizzBuzz", is_sample=True),
             ])
 
             # Problem 4: Reverse String
@@ -107,8 +117,8 @@ def seed_db():
             session.refresh(p4)
 
             session.add_all([
-                TestCase(problem_id=p4.id, input_data="hello", expected_output="olleh", is_sample=True),
-                TestCase(problem_id=p4.id, input_data="Hannah", expected_output="hannaH", is_sample=True),
+                build_test_case(p4.id, "hello", "olleh", is_sample=True),
+                build_test_case(p4.id, "Hannah", "hannaH", is_sample=True),
             ])
 
             # Problem 5: Maximum Subarray
@@ -125,9 +135,9 @@ def seed_db():
             session.refresh(p5)
 
             session.add_all([
-                TestCase(problem_id=p5.id, input_data="-2 1 -3 4 -1 2 1 -5 4", expected_output="6", is_sample=True),
-                TestCase(problem_id=p5.id, input_data="1", expected_output="1", is_sample=True),
-                TestCase(problem_id=p5.id, input_data="5 4 -1 7 8", expected_output="23", is_sample=True),
+                build_test_case(p5.id, "-2 1 -3 4 -1 2 1 -5 4", "6", is_sample=True),
+                build_test_case(p5.id, "1", "1", is_sample=True),
+                build_test_case(p5.id, "5 4 -1 7 8", "23", is_sample=True),
             ])
 
             session.commit()
@@ -138,18 +148,112 @@ def seed_db():
                 tc_count = len(session.exec(select(TestCase).where(TestCase.problem_id == p.id)).all())
                 if tc_count == 0:
                     if "hello" in p.title.lower():
-                        session.add(TestCase(problem_id=p.id, input_data="", expected_output="Hello World", is_sample=True))
+                        session.add(build_test_case(p.id, "", "Hello World", is_sample=True))
                     elif "two sum" in p.title.lower():
                         session.add_all([
-                            TestCase(problem_id=p.id, input_data="2 7 11 15\n9", expected_output="0 1", is_sample=True),
-                            TestCase(problem_id=p.id, input_data="3 2 4\n6", expected_output="1 2", is_sample=True),
+                            build_test_case(p.id, "2 7 11 15\n9", "0 1", is_sample=True),
+                            build_test_case(p.id, "3 2 4\n6", "1 2", is_sample=True),
                         ])
                     else:
-                        session.add(TestCase(problem_id=p.id, input_data="sample input", expected_output="sample output", is_sample=True))
+                        session.add(build_test_case(p.id, "sample input", "sample output", is_sample=True))
             session.commit()
             print("Added test cases to existing problems.")
         
         print("Database seeded successfully.")
 
+async def _rebuild_leaderboard():
+    async with async_session_factory() as session:
+        return await rebuild_leaderboard(session)
+
+def seed_load(users: int, problems: int, submissions: int, seed: int = 0):
+    """
+    Tops the database up to `users` bench students, `problems` bench problems
+    ("A + B" with three test cases) and `submissions` bench submissions spread
+    over the last 30 days, then rebuilds the leaderboard. Safe to rerun.
+    Bench students get a fake GitHub token so they can submit against the
+    stand-in GitHub API of bench.py.
+    """
+    create_db_and_tables()
+    rng = random.Random(seed)
+    with Session(engine) as session:
+        # bcrypt is slow on purpose; one hash is shared by every bench user
+        hashed = get_password_hash(BENCH_PASSWORD)
+        have = session.exec(select(func.count()).select_from(User).where(User.username.like("bench%"))).one()
+        session.add_all(
+            User(
+                username=f"bench{i:05d}",
+                email=f"bench{i:05d}@minicode.test",
+                full_name=f"Bench User {i}",
+                role="student",
+                hashed_password=hashed,
+                github_access_token=f"bench-token-{i}",
+            )
+            for i in range(have, users)
+        )
+        session.commit()
+
+        faculty = session.exec(select(User).where(User.role == "faculty")).first()
+        have = session.exec(select(func.count()).select_from(Problem).where(Problem.title.like("Bench Problem %"))).one()
+        for i in range(have, problems):
+            problem = Problem(
+                title=f"Bench Problem {i}",
+                description="Read two integers a and b and print a + b.",
+                difficulty=rng.choice(["Easy", "Medium", "Hard"]),
+                input_format="Two space-separated integers",
+                output_format="A single integer",
+                author_id=faculty.id if faculty else None,
+            )
+            session.add(problem)
+            session.commit()
+            session.refresh(problem)
+            for n in range(3):
+                a, b = rng.randint(-1000, 1000), rng.randint(-1000, 1000)
+                session.add(build_test_case(problem.id, f"{a} {b}", str(a + b), is_sample=n == 0))
+        session.commit()
+
+        user_rows = session.exec(select(User.id, User.username).where(User.username.like("bench%"))).all()
+        problem_rows = session.exec(select(Problem.id, Problem.title).where(Problem.title.like("Bench Problem %"))).all()
+        if not user_rows or not problem_rows:
+            return
+        have = session.exec(
+            select(func.count()).select_from(Submission).join(User, User.id == Submission.user_id).where(User.username.like("bench%"))
+        ).one()
+        now = datetime.utcnow()
+        statuses, weights = zip(*BENCH_STATUSES.items())
+        batch = []
+        for _ in range(have, submissions):
+            user_id, username = rng.choice(user_rows)
+            problem_id, title = rng.choice(problem_rows)
+            status = rng.choices(statuses, weights)[0]
+            batch.append(Submission(
+                user_id=user_id,
+                problem_id=problem_id,
+                repo_url=f"https://github.com/{username}/minicode-{username}-{title.lower().replace(' ', '-')}",
+                language="python",
+                status=status,
+                score=rng.choice([60, 80, 100]) if status == "accepted" else 0,
+                time_taken=round(rng.uniform(0.01, 1.5), 3),
+                memory_used=rng.randint(8000, 64000),
+                timestamp=now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600)),
+            ))
+            if len(batch) == 1000:
+                session.add_all(batch)
+                session.commit()
+                batch = []
+        session.add_all(batch)
+        session.commit()
+
+    count = asyncio.run(_rebuild_leaderboard())
+    print(f"Load data: {users} bench users, {problems} bench problems, {submissions} submissions ({count} on the leaderboard).")
+
 if __name__ == "__main__":
-    seed_db()
+    import sys
+
+    args = sys.argv[1:]
+    if not args:
+        seed_db()
+    elif args[0] == "load" and len(args) == 4 and all(a.isdigit() for a in args[1:]):
+        seed_load(*(int(a) for a in args[1:]))
+    else:
+        print("Usage: python seed.py [load <users> <problems> <submissions>]")
+        sys.exit(1)
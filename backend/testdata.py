@@ -0,0 +1,211 @@
+import io
+import os
+import gzip
+import hashlib
+import tempfile
+import shutil
+from typing import BinaryIO, Optional, Union
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, insert
+from models import TestCase, TestDataBlob, TestDataChunk
+from database import engine
+
+# Content-addressed, gzip-compressed test inputs and expected outputs. The
+# blobs live in the database (testdata_blobs, their bytes split over
+# testdata_chunks), so every API and judge container sees the same data and
+# nothing is lost with an ephemeral disk. TESTDATA_DIR is only a per-host
+# cache of blobs fetched from there. Blobs move in and out one chunk at a
+# time, so memory stays flat whatever the test size.
+TESTDATA_DIR = os.getenv("TESTDATA_DIR", os.path.join(tempfile.gettempdir(), "minicode-testdata"))
+TESTDATA_CACHE_MB = int(os.getenv("TESTDATA_CACHE_MB", "512"))  # least recently used blobs are evicted past this
+TESTDATA_PREVIEW_CHARS = int(os.getenv("TESTDATA_PREVIEW_CHARS", "1000"))  # kept in the TestCase row
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 8 * 1024 * 1024  # compressed bytes kept in memory before spilling to a temp file
+BLOB_CHUNK_BYTES = 1024 * 1024  # compressed bytes per testdata_chunks row
+
+def blob_path(digest: str) -> str:
+    return os.path.join(TESTDATA_DIR, "blobs", digest[:2], f"{digest}.gz")
+
+def _publish(tmp_path: str, path: str):
+    """Moves a finished temp file into place; identical content may already be there."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+
+def _evict():
+    """Drops least recently used cached blobs until the cache fits TESTDATA_CACHE_MB."""
+    entries = []
+    for root, _, names in os.walk(os.path.join(TESTDATA_DIR, "blobs")):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= TESTDATA_CACHE_MB * 1024 * 1024:
+            break
+        try:
+            os.remove(path)  # readers that already opened it keep reading
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def _fill_cache(digest: str) -> BinaryIO:
+    """
+    Copies a blob from the database into the local cache one chunk at a time
+    and returns it opened for reading. Raises FileNotFoundError if it is not stored.
+    """
+    os.makedirs(TESTDATA_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=TESTDATA_DIR, suffix=".tmp")
+    f = os.fdopen(fd, "w+b")
+    try:
+        with Session(engine) as session:
+            blob = session.get(TestDataBlob, digest)
+            if blob is None:
+                raise FileNotFoundError(f"Test data {digest} is not stored")
+            for seq in range(blob.chunks):
+                f.write(session.exec(
+                    select(TestDataChunk.data).where(TestDataChunk.sha256 == digest, TestDataChunk.seq == seq)
+                ).one())
+        f.flush()
+        f.seek(0)
+        # The open file stays readable even if eviction removes it right away
+        _publish(tmp_path, blob_path(digest))
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    _evict()
+    return f
+
+def save_blob(digest: str, size: int, compressed: BinaryIO):
+    """Inserts a compressed blob chunk by chunk unless a blob with this hash is already stored."""
+    with Session(engine) as session:
+        if session.get(TestDataBlob, digest) is not None:
+            return
+        seq = 0
+        while chunk := compressed.read(BLOB_CHUNK_BYTES):
+            session.exec(insert(TestDataChunk).values(sha256=digest, seq=seq, data=chunk))
+            seq += 1
+        session.add(TestDataBlob(sha256=digest, size=size, chunks=seq))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()  # stored concurrently by another upload
+
+def store_stream(stream: BinaryIO) -> tuple[str, int, str]:
+    """
+    Compresses a binary stream chunk by chunk and stores it in the database.
+    Returns (sha256, size in bytes, text preview of the first characters).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    head = bytearray()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+        with gzip.GzipFile(fileobj=spool, mode="wb", mtime=0) as gz:
+            while chunk := stream.read(CHUNK_SIZE):
+                hasher.update(chunk)
+                size += len(chunk)
+                if len(head) < TESTDATA_PREVIEW_CHARS * 4:
+                    head += chunk[:TESTDATA_PREVIEW_CHARS * 4 - len(head)]
+                gz.write(chunk)
+        spool.seek(0)
+        digest = hasher.hexdigest()
+        save_blob(digest, size, spool)
+    preview = head.decode("utf-8", errors="ignore")[:TESTDATA_PREVIEW_CHARS]
+    return digest, size, preview
+
+def open_blob(digest: str) -> BinaryIO:
+    """Opens a blob decompressing, from the local cache or else the database."""
+    path = blob_path(digest)
+    try:
+        f = open(path, "rb")
+        os.utime(path)  # marks it recently used for eviction
+    except FileNotFoundError:
+        f = _fill_cache(digest)
+    return gzip.GzipFile(fileobj=f, mode="rb")
+
+def materialize(digest: str, path: str) -> str:
+    """
+    Decompresses a blob to `path` (a file of one test run, deleted with it),
+    so only compressed data stays on disk between runs.
+    """
+    with open(path, "wb") as dst, open_blob(digest) as src:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return path
+
+def open_expected(tc: TestCase) -> BinaryIO:
+    """Streams a test case's expected output, stored or inline."""
+    if tc.output_hash:
+        return open_blob(tc.output_hash)
+    return io.BytesIO(tc.expected_output.encode("utf-8"))
+
+def _as_stream(data: Union[str, bytes, BinaryIO]) -> BinaryIO:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return data
+
+def build_test_case(
+    problem_id: int,
+    input_data: Union[str, bytes, BinaryIO],
+    expected_output: Union[str, bytes, BinaryIO],
+    is_sample: bool = False,
+) -> TestCase:
+    """
+    Stores both sides of a test case and returns its row: hashes and sizes,
+    plus a short preview in input_data / expected_output for the problem
+    page and the AI prompt.
+    """
+    input_hash, input_size, input_preview = store_stream(_as_stream(input_data))
+    output_hash, output_size, output_preview = store_stream(_as_stream(expected_output))
+    return TestCase(
+        problem_id=problem_id,
+        input_data=input_preview,
+        expected_output=output_preview,
+        input_hash=input_hash,
+        input_size=input_size,
+        output_hash=output_hash,
+        output_size=output_size,
+        is_sample=is_sample,
+    )
+
+def is_truncated(preview: str, digest: Optional[str], size: int) -> bool:
+    """Whether a TestCase text column holds only the start of its stored data."""
+    return digest is not None and len(preview.encode("utf-8")) < size
+
+def migrate_test_case(tc: TestCase) -> bool:
+    """Moves an inline test case into the store; False if it already was."""
+    if tc.input_hash and tc.output_hash:
+        return False
+    stored = build_test_case(tc.problem_id, tc.input_data, tc.expected_output, tc.is_sample)
+    for field in ("input_data", "expected_output", "input_hash", "input_size", "output_hash", "output_size"):
+        setattr(tc, field, getattr(stored, field))
+    return True
+
+async def _migrate() -> int:
+    """Moves every inline test case into the store; returns how many were moved."""
+    from database import async_session_factory
+
+    async with async_session_factory() as session:
+        migrated = 0
+        for tc in (await session.exec(select(TestCase).where(TestCase.output_hash == None))).all():  # noqa: E711
+            if migrate_test_case(tc):
+                session.add(tc)
+                migrated += 1
+        await session.commit()
+    return migrated
+
+if __name__ == "__main__":
+    import sys
+    import asyncio
+
+    if sys.argv[1:] != ["migrate"]:
+        print("Usage: python testdata.py migrate")
+        sys.exit(1)
+    migrated = asyncio.run(_migrate())
+    print(f"Moved {migrated} inline test cases into the database.")
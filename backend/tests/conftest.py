@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+
+# The app reads DATABASE_URL at import time, so point it at a scratch database
+# before any test module imports it. TEST_DATABASE_URL runs the suite against
+# another database instead (e.g. Postgres in CI); it is migrated the same way.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="minicode-tests-"), "test.db"
+)
+os.environ.pop("REDIS_URL", None)
+
+import pytest  # noqa: E402
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+@pytest.fixture(scope="session")
+def migrated_engine():
+    """The sync engine on DATABASE_URL, upgraded to the latest migration."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    command.upgrade(config, "head")
+    from database import engine
+    return engine
+
+@pytest.fixture
+def session_factory(migrated_engine):
+    """
+    Async sessions on the test database. Each test gets its own engine without
+    a pool, since a pooled aiosqlite/asyncpg connection cannot outlive the
+    event loop of the asyncio.run() that opened it.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import NullPool
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from database import DATABASE_URL, async_database_url
+
+    url, connect_args = async_database_url(DATABASE_URL)
+    return async_sessionmaker(
+        create_async_engine(url, connect_args=connect_args, poolclass=NullPool),
+        class_=AsyncSession, expire_on_commit=False,
+    )
+
+@pytest.fixture
+def add_rows(migrated_engine):
+    """Inserts model instances and returns them with their ids, detached."""
+    from sqlmodel import Session
+
+    def add(*rows):
+        with Session(migrated_engine, expire_on_commit=False) as session:
+            session.add_all(rows)
+            session.commit()
+        return rows
+    return add
+
+@pytest.fixture
+def make_problem(add_rows):
+    """A new problem with `n` students, so tests never share score rows."""
+    import uuid
+    from models import Problem, User
+
+    def make(n: int = 1):
+        tag = uuid.uuid4().hex[:8]
+        problem, *users = add_rows(
+            Problem(title=f"Problem {tag}", description="-"),
+            *(User(username=f"student-{tag}-{i}", email=f"{tag}-{i}@example.com", role="student") for i in range(n)),
+        )
+        return problem, users
+    return make
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlmodel import Session, select, update
+import judge_queue
+from judge_queue import InMemoryJudgeQueue, RedisJudgeQueue, requeue_overdue, touch_queued
+from models import Submission
+
+class Clock:
+    """Stands in for judge_queue's `time` module so visibility timeouts pass instantly."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(judge_queue, "time", clock)
+    return clock
+
+def redis_queue():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis runs the reserve script through it
+    return RedisJudgeQueue(fakeredis.FakeAsyncRedis())
+
+@pytest.fixture(params=["memory", "redis"])
+def make_queue(request):
+    return InMemoryJudgeQueue if request.param == "memory" else redis_queue
+
+def test_reserved_job_stays_hidden_until_its_visibility_timeout(clock, make_queue):
+    async def run():
+        queue = make_queue()
+        await queue.enqueue(1)
+        clock.now += 1
+        await queue.enqueue(2)
+        await queue.enqueue(1)  # already queued: keeps its place
+        assert await queue.depth() == 2
+
+        assert await queue.reserve() == (1, 1)
+        assert await queue.reserve() == (2, 1)
+        assert await queue.reserve() is None
+
+        # A worker that died mid-judge lets the job reappear, as a new attempt
+        clock.now += judge_queue.JUDGE_VISIBILITY_TIMEOUT
+        assert await queue.reserve() == (1, 2)
+    asyncio.run(run())
+
+def test_extend_keeps_a_job_reserved_and_ack_removes_it(clock, make_queue):
+    async def run():
+        queue = make_queue()
+        await queue.enqueue(1)
+        assert await queue.reserve() == (1, 1)
+        clock.now += judge_queue.JUDGE_VISIBILITY_TIMEOUT - 1
+        await queue.extend(1, judge_queue.JUDGE_VISIBILITY_TIMEOUT)
+        clock.now += 2
+        assert await queue.reserve() is None
+
+        await queue.ack(1)
+        await queue.extend(1, 10)  # late heartbeat after the ack must not bring it back
+        clock.now += judge_queue.JUDGE_VISIBILITY_TIMEOUT * 2
+        assert await queue.reserve() is None
+        assert await queue.depth() == 0
+
+        # Attempts restart once a job was acked
+        await queue.enqueue(1)
+        assert await queue.reserve() == (1, 1)
+    asyncio.run(run())
+
+def test_retry_delays_the_next_attempt(clock, make_queue):
+    async def run():
+        queue = make_queue()
+        await queue.enqueue(1)
+        await queue.reserve()
+        await queue.retry(1, 30)
+        clock.now += 29
+        assert await queue.reserve() is None
+        clock.now += 1
+        assert await queue.reserve() == (1, 2)
+    asyncio.run(run())
+
+def overdue_submissions(migrated_engine, add_rows, make_problem, *due):
+    problem, (user,) = make_problem()
+    ids = [s.id for s in add_rows(*(
+        Submission(user_id=user.id, problem_id=problem.id, status=status, judge_due_at=due_at)
+        for status, due_at in due
+    ))]
+    # The model defaults judge_due_at to now; NULL is left by rows from before the column
+    undated = [submission_id for submission_id, (_, due_at) in zip(ids, due) if due_at is None]
+    with Session(migrated_engine) as session:
+        session.exec(update(Submission).where(Submission.id.in_(undated)).values(judge_due_at=None))
+        session.commit()
+    return ids
+
+def due_at(session_factory, submission_id):
+    async def run():
+        async with session_factory() as session:
+            return (await session.exec(select(Submission.judge_due_at).where(Submission.id == submission_id))).one()
+    return asyncio.run(run())
+
+def test_requeue_overdue_claims_each_lost_submission_once(migrated_engine, session_factory, add_rows, make_problem):
+    now = datetime.utcnow()
+    long_ago = now - timedelta(seconds=judge_queue.JUDGE_REQUEUE_AFTER + 60)
+    lost, lost_undated, recent, judged = overdue_submissions(
+        migrated_engine, add_rows, make_problem,
+        ("pending", long_ago), ("pending", None), ("pending", now), ("accepted", long_ago),
+    )
+    mine = {lost, lost_undated, recent, judged}
+
+    async def sweep_twice():
+        # Two workers sweeping at once must split the lost submissions, not share them
+        first, second = InMemoryJudgeQueue(), InMemoryJudgeQueue()
+        await asyncio.gather(requeue_overdue(first, session_factory), requeue_overdue(second, session_factory))
+        return set(first.jobs) & mine, set(second.jobs) & mine
+    first, second = asyncio.run(sweep_twice())
+
+    assert first | second == {lost, lost_undated}
+    assert not first & second
+    # Claimed submissions are due again from now, so the next sweep skips them
+    assert due_at(session_factory, lost) >= now
+    again = InMemoryJudgeQueue()
+    asyncio.run(requeue_overdue(again, session_factory))
+    assert not set(again.jobs) & mine
+
+def test_touch_queued_protects_submissions_this_process_still_holds(migrated_engine, session_factory, add_rows, make_problem):
+    now = datetime.utcnow()
+    long_ago = now - timedelta(seconds=judge_queue.JUDGE_REQUEUE_AFTER + 60)
+    later = now + timedelta(seconds=120)
+    held, held_retry, held_done, dead = overdue_submissions(
+        migrated_engine, add_rows, make_problem,
+        ("pending", long_ago), ("pending", later), ("accepted", long_ago), ("pending", long_ago),
+    )
+
+    async def sweep():
+        queue = InMemoryJudgeQueue()
+        for submission_id in (held, held_retry, held_done):
+            await queue.enqueue(submission_id)
+        await queue.reserve()  # being judged still counts as held
+        await touch_queued(queue, session_factory)
+        other = InMemoryJudgeQueue()
+        await requeue_overdue(other, session_factory)
+        return set(other.jobs)
+    requeued = asyncio.run(sweep())
+
+    assert dead in requeued
+    assert not {held, held_retry, held_done} & requeued
+    assert due_at(session_factory, held) >= now
+    assert due_at(session_factory, held_retry) == later  # a retry due later keeps its time
+    assert due_at(session_factory, held_done) == long_ago
@@ -0,0 +1,133 @@
+import asyncio
+from sqlmodel import update
+from models import Submission, UserScore, ProblemBestScore
+from leaderboard import (
+    record_verdict, rebuild_problem_scores, get_leaderboard_page, leaderboard_cursor,
+    parse_leaderboard_cursor, get_user_rank,
+)
+from rejudge import select_submissions_query
+from main import submission_history_query
+
+def submit(add_rows, problem, user, status, score=0):
+    return add_rows(Submission(user_id=user.id, problem_id=problem.id, status=status, score=score))[0]
+
+def record(session_factory, *submissions):
+    async def run():
+        for submission in submissions:
+            async with session_factory() as session:
+                await record_verdict(session, submission)
+                await session.commit()
+    asyncio.run(run())
+
+def totals(session_factory, problem, user):
+    """(total_score, problems_solved, best score on `problem` or None)."""
+    async def run():
+        async with session_factory() as session:
+            entry = await session.get(UserScore, user.id)
+            best = await session.get(ProblemBestScore, (user.id, problem.id))
+            return (entry.total_score, entry.problems_solved) if entry else (0, 0), best.best_score if best else None
+    (total, solved), best = asyncio.run(run())
+    return total, solved, best
+
+def test_record_verdict_keeps_best_accepted_score(session_factory, add_rows, make_problem):
+    problem, (user,) = make_problem()
+    other, _ = make_problem(0)
+
+    record(session_factory, submit(add_rows, problem, user, "wrong_answer", 90))
+    assert totals(session_factory, problem, user) == (0, 0, None)
+
+    record(session_factory, submit(add_rows, problem, user, "accepted", 60))
+    assert totals(session_factory, problem, user) == (60, 1, 60)
+
+    # Higher score adds the difference; lower or equal scores change nothing
+    record(session_factory, submit(add_rows, problem, user, "accepted", 80))
+    record(session_factory, submit(add_rows, problem, user, "accepted", 70), submit(add_rows, problem, user, "accepted", 80))
+    assert totals(session_factory, problem, user) == (80, 1, 80)
+
+    record(session_factory, submit(add_rows, other, user, "accepted", 50))
+    assert totals(session_factory, problem, user) == (130, 2, 80)
+
+def test_rebuild_problem_scores_applies_rejudged_verdicts(session_factory, add_rows, make_problem):
+    problem, (kept, lowered, lost, new) = make_problem(4)
+    other, _ = make_problem(0)
+    first = [
+        submit(add_rows, problem, kept, "accepted", 100),
+        submit(add_rows, problem, lowered, "accepted", 90),
+        submit(add_rows, problem, lowered, "accepted", 70),
+        submit(add_rows, problem, lost, "accepted", 40),
+        submit(add_rows, other, lost, "accepted", 30),
+    ]
+    record(session_factory, *first)
+    _, lowered_best, _, lost_only, _ = first
+    new_wrong = submit(add_rows, problem, new, "wrong_answer", 0)
+
+    # A rejudge rewrites verdicts in place, then rebuilds the problem's scores
+    async def rejudge():
+        async with session_factory() as session:
+            for submission, status, score in (
+                (lowered_best, "wrong_answer", 0), (lost_only, "runtime_error", 0), (new_wrong, "accepted", 55),
+            ):
+                await session.exec(update(Submission).where(Submission.id == submission.id).values(status=status, score=score))
+            await rebuild_problem_scores(session, problem.id)
+            await session.commit()
+    asyncio.run(rejudge())
+
+    assert totals(session_factory, problem, kept) == (100, 1, 100)
+    assert totals(session_factory, problem, lowered) == (70, 1, 70)
+    assert totals(session_factory, problem, lost) == (30, 1, None)
+    assert totals(session_factory, problem, new) == (55, 1, 55)
+
+def test_rejudge_latest_scope_covers_every_accepted_submission(session_factory, add_rows, make_problem):
+    problem, (a, b) = make_problem(2)
+    old_accepted = submit(add_rows, problem, a, "accepted", 100)
+    submit(add_rows, problem, a, "wrong_answer")
+    latest_a = submit(add_rows, problem, a, "runtime_error")
+    submit(add_rows, problem, a, "pending")
+    submit(add_rows, problem, b, "wrong_answer")
+    latest_b = submit(add_rows, problem, b, "tle")
+
+    async def selected(scope):
+        async with session_factory() as session:
+            return [s.id for s in (await session.exec(select_submissions_query(problem.id, scope))).all()]
+
+    assert asyncio.run(selected("latest")) == sorted([old_accepted.id, latest_a.id, latest_b.id])
+    everything = asyncio.run(selected("all"))
+    assert len(everything) == 5 and all(s.id in everything for s in (old_accepted, latest_a, latest_b))
+
+def test_leaderboard_pages_follow_the_keyset_cursor(session_factory, add_rows, make_problem):
+    problem, users = make_problem(7)
+    # Ties on score must still page in user id order without gaps or repeats
+    record(session_factory, *(submit(add_rows, problem, user, "accepted", score) for user, score in zip(users, (50, 80, 50, 20, 80, 50, 10))))
+
+    async def walk(limit):
+        entries, after = [], None
+        async with session_factory() as session:
+            while page := await get_leaderboard_page(session, limit, after):
+                entries += page
+                after = parse_leaderboard_cursor(leaderboard_cursor(page[-1]))
+            ranks = {entry["id"]: await get_user_rank(session, entry["id"]) for entry in entries}
+        return entries, ranks
+
+    entries, ranks = asyncio.run(walk(3))
+    assert [(e["score"], e["id"]) for e in entries] == sorted(((e["score"], e["id"]) for e in entries), key=lambda k: (-k[0], k[1]))
+    assert len({e["id"] for e in entries}) == len(entries)
+    assert [e["rank"] for e in entries] == list(range(1, len(entries) + 1))
+    assert all(ranks[e["id"]] == e["rank"] for e in entries)
+    assert {u.id for u in users} <= {e["id"] for e in entries}
+    assert asyncio.run(walk(len(entries) + 1))[0] == entries
+
+def test_submission_history_pages_newest_first(session_factory, add_rows, make_problem):
+    problem, (user,) = make_problem()
+    other, _ = make_problem(0)
+    ids = [submit(add_rows, p, user, "accepted", 10).id for p in (problem, other, problem, problem, other)]
+
+    async def walk(problem_id=None):
+        seen, cursor = [], None
+        async with session_factory() as session:
+            while rows := (await session.exec(submission_history_query(user.id, 2, problem_id, cursor))).all():
+                seen += [row.id for row in rows]
+                cursor = rows[-1].id
+        return seen
+
+    assert asyncio.run(walk()) == sorted(ids, reverse=True)
+    assert asyncio.run(walk(problem.id)) == sorted((ids[0], ids[2], ids[3]), reverse=True)
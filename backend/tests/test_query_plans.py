@@ -0,0 +1,10 @@
+import pytest
+from query_plans import hot_queries, hot_table_scans
+
+# The statements are built by the functions the app runs them through, so an
+# edit to a query or an index that loses the index fails here
+@pytest.mark.parametrize("name", sorted(hot_queries("sqlite")))
+def test_hot_query_uses_indexes(migrated_engine, name):
+    with migrated_engine.connect() as connection:
+        statement = hot_queries(connection.dialect.name)[name]
+        assert hot_table_scans(connection, statement) == [], f"{name} falls back to a sequential scan; add or fix an index (and a migration)"
@@ -0,0 +1,72 @@
+import os
+import json
+import hashlib
+from typing import Optional
+from cache import TTLCache
+from redis_client import get_redis
+from models import TestCase
+from executor import EXEC_TIME_LIMIT, EXEC_MEMORY_LIMIT_MB, EXEC_OUTPUT_LIMIT_KB, EXEC_FAIL_FAST
+
+VERDICT_CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL", str(60 * 60 * 24)))  # seconds
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "2048"))  # entries, in-process backend only
+
+KEY_PREFIX = "minicode:verdict:"
+STATS_KEY = "minicode:verdict:stats"
+
+# Bump when the judge changes in a way that invalidates stored verdicts
+JUDGE_VERSION = "2"
+
+def verdict_key(code: str, problem_desc: str, test_cases: list[TestCase], persona: str, language: str, float_tolerance: Optional[float] = None) -> str:
+    """Content hash of everything that determines a verdict."""
+    payload = json.dumps({
+        "judge": [JUDGE_VERSION, EXEC_TIME_LIMIT, EXEC_MEMORY_LIMIT_MB, EXEC_OUTPUT_LIMIT_KB, EXEC_FAIL_FAST],
+        "code": code,
+        "problem": problem_desc,
+        # Stored test data is identified by its content hashes
+        "tests": [
+            [tc.input_hash or tc.input_data, tc.output_hash or tc.expected_output]
+            for tc in sorted(test_cases, key=lambda tc: tc.id or 0)
+        ],
+        "float_tolerance": float_tolerance,
+        "persona": persona,
+        "language": (language or "").lower(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """
+    Stores finished verdicts by content hash so resubmitting unchanged code
+    skips execution and the Gemini round trip. Uses Redis (shared, TTL-evicted)
+    when configured, otherwise an in-process LRU.
+    """
+
+    def __init__(self):
+        self.local = TTLCache(maxsize=VERDICT_CACHE_SIZE, ttl=VERDICT_CACHE_TTL)
+
+    async def get(self, key: str):
+        client = get_redis()
+        if not client:
+            return self.local.get(key)
+        value = await client.get(KEY_PREFIX + key)
+        await client.hincrby(STATS_KEY, "hits" if value else "misses", 1)
+        return json.loads(value) if value else None
+
+    async def set(self, key: str, verdict: dict):
+        client = get_redis()
+        if not client:
+            self.local.set(key, verdict)
+            return
+        await client.set(KEY_PREFIX + key, json.dumps(verdict), ex=VERDICT_CACHE_TTL)
+
+    async def stats(self) -> dict:
+        client = get_redis()
+        if not client:
+            return {"backend": "memory", **self.local.stats()}
+        counters = await client.hgetall(STATS_KEY)
+        return {
+            "backend": "redis",
+            "hits": int(counters.get("hits", 0)),
+            "misses": int(counters.get("misses", 0)),
+        }
+
+verdict_cache = VerdictCache()
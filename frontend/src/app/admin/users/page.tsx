@@ -3,7 +3,7 @@
 import { useState, useEffect } from "react";
 import { Shield, Users, Database, BarChart3, Settings, Search, MoreVertical, UserPlus, ShieldCheck, ShieldAlert, Mail } from "lucide-react";
 import { clsx } from "clsx";
-import api from "@/lib/api";
+import api, { fetchPage } from "@/lib/api";
 
 interface User {
     id: number;
@@ -15,20 +15,22 @@ interface User {
 
 export default function AdminDashboard() {
     const [users, setUsers] = useState<User[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(true);
 
-    useEffect(() => {
-        const fetchUsers = async () => {
-            try {
-                const response = await api.get("/admin/users");
-                setUsers(response.data);
-            } catch (error) {
-                console.error("Fetch users error:", error);
-            } finally {
-                setLoading(false);
-            }
-        };
+    const fetchUsers = async (cursor?: string) => {
+        try {
+            const page = await fetchPage<User>("/admin/users", cursor ? { cursor } : {});
+            setUsers((prev) => (cursor ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Fetch users error:", error);
+        } finally {
+            setLoading(false);
+        }
+    };
 
+    useEffect(() => {
         fetchUsers();
     }, []);
 
@@ -168,6 +170,14 @@ export default function AdminDashboard() {
                                 ))}
                             </tbody>
                         </table>
+                        {nextCursor && (
+                            <button
+                                onClick={() => fetchUsers(nextCursor)}
+                                className="w-full py-4 text-sm font-bold text-muted-foreground hover:text-white hover:bg-white/[0.02] transition-all"
+                            >
+                                Load more
+                            </button>
+                        )}
                     </div>
                 </div>
             </main>
@@ -4,19 +4,23 @@ import { useState, useEffect } from "react";
 import { Plus, LayoutDashboard, Database, BarChart3, Users, Settings, Search, MoreVertical, Edit, Trash, ExternalLink } from "lucide-react";
 import { clsx } from "clsx";
 import Link from "next/link";
-import api from "@/lib/api";
+import api, { fetchPage } from "@/lib/api";
 
 interface FacultyAnalytics {
     problem_title: string;
     total_submissions: number;
     accepted_count: number;
+    acceptance_rate: number;
     average_score: number;
+    median_score: number;
+    unique_solvers: number;
+    score_histogram: { range: string; count: number }[];
+    submissions_per_hour: { hour: string; count: number }[];
 }
 
 interface Problem {
     id: number;
     title: string;
-    description: string;
     difficulty: string;
     created_at: string;
 }
@@ -30,8 +34,15 @@ export default function FacultyDashboard() {
     useEffect(() => {
         const fetchProblems = async () => {
             try {
-                const response = await api.get("/faculty/problems");
-                const fetchedProblems = response.data;
+                // The dashboard totals cover all of the author's problems, so follow every page
+                const fetchedProblems: Problem[] = [];
+                let cursor: string | null = null;
+                do {
+                    const page: { items: Problem[]; nextCursor: string | null } =
+                        await fetchPage<Problem>("/faculty/problems", { limit: 200, ...(cursor ? { cursor } : {}) });
+                    fetchedProblems.push(...page.items);
+                    cursor = page.nextCursor;
+                } while (cursor);
                 setProblems(fetchedProblems);
 
                 const analyticsData: Record<number, FacultyAnalytics> = {};
@@ -161,9 +172,7 @@ export default function FacultyDashboard() {
                             <tbody className="divide-y divide-white/[0.02]">
                                 {problems.map((problem) => {
                                     const stats = analytics[problem.id];
-                                    const successRate = stats && stats.total_submissions > 0
-                                        ? Math.round((stats.accepted_count / stats.total_submissions) * 100)
-                                        : 0;
+                                    const successRate = stats ? Math.round(stats.acceptance_rate) : 0;
 
                                     return (
                                         <tr key={problem.id} className="group hover:bg-white/[0.01] transition-colors">
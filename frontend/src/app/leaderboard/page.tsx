@@ -3,7 +3,8 @@
 import { Trophy, Medal, Star, TrendingUp, Search } from "lucide-react";
 import { clsx } from "clsx";
 import { useEffect, useState } from "react";
-import api from "@/lib/api";
+import api, { fetchPage } from "@/lib/api";
+import { useAuth } from "@/contexts/AuthContext";
 
 interface Leader {
     id: number;
@@ -16,25 +17,40 @@ interface Leader {
 }
 
 export default function LeaderboardPage() {
+    const { user } = useAuth();
     const [leaders, setLeaders] = useState<Leader[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [myEntry, setMyEntry] = useState<Leader | null>(null);
     const [search, setSearch] = useState("");
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
 
-    useEffect(() => {
-        const fetchLeaders = async () => {
-            try {
-                const response = await api.get("/leaderboard");
-                setLeaders(response.data);
-            } catch (error) {
-                console.error("Failed to fetch leaderboard: ", error);
-            } finally {
-                setLoading(false);
-            }
-        };
+    const fetchLeaders = async (cursor?: string) => {
+        try {
+            setLoadingMore(!!cursor);
+            const page = await fetchPage<Leader>("/leaderboard", cursor ? { cursor } : {});
+            setLeaders((prev) => (cursor ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Failed to fetch leaderboard: ", error);
+        } finally {
+            setLoading(false);
+            setLoadingMore(false);
+        }
+    };
 
+    useEffect(() => {
         fetchLeaders();
     }, []);
 
+    // The signed-in user's own rank, which may be far past the loaded pages
+    useEffect(() => {
+        if (!user) return;
+        api.get(`/leaderboard/users/${user.id}`)
+            .then((response) => setMyEntry(response.data))
+            .catch(() => setMyEntry(null)); // 404 until the user has points
+    }, [user]);
+
     const topThree = leaders.slice(0, 3);
     const restLeaders = leaders.slice(3).filter(l => l.name.toLowerCase().includes(search.toLowerCase()) || l.username.toLowerCase().includes(search.toLowerCase()));
 
@@ -112,6 +128,21 @@ export default function LeaderboardPage() {
                         )}
                     </div>
 
+                    {/* Your Rank */}
+                    {myEntry && (
+                        <div className="glass rounded-2xl border-primary/30 bg-primary/5 px-6 py-4 mb-8 flex items-center justify-between">
+                            <div className="flex items-center space-x-3">
+                                <Star className="w-5 h-5 text-primary" />
+                                <span className="text-sm font-medium text-white">Your rank</span>
+                            </div>
+                            <div className="flex items-center space-x-6">
+                                <span className="text-sm text-muted-foreground">{myEntry.problems} Solved</span>
+                                <span className="text-sm font-bold text-white">{myEntry.score} XP</span>
+                                <span className="text-lg font-black text-primary">#{myEntry.rank}</span>
+                            </div>
+                        </div>
+                    )}
+
                     {/* Search & Filter */}
                     <div className="flex flex-col sm:flex-row items-center justify-between mb-8 gap-4">
                         <h2 className="text-xl font-bold text-white">Full Rankings</h2>
@@ -119,7 +150,7 @@ export default function LeaderboardPage() {
                             <Search className="absolute left-3 top-1/2 -translate-y-1/2 w-4 h-4 text-muted-foreground" />
                             <input
                                 type="text"
-                                placeholder="Search student..."
+                                placeholder="Search loaded students..."
                                 value={search}
                                 onChange={(e) => setSearch(e.target.value)}
                                 className="w-full bg-white/5 border border-white/10 rounded-xl py-2 pl-10 pr-4 text-sm focus:outline-none focus:ring-2 focus:ring-primary/50"
@@ -164,6 +195,15 @@ export default function LeaderboardPage() {
                                 ))}
                             </tbody>
                         </table>
+                        {nextCursor && (
+                            <button
+                                onClick={() => fetchLeaders(nextCursor)}
+                                disabled={loadingMore}
+                                className="w-full py-4 text-sm font-bold text-muted-foreground hover:text-white hover:bg-white/[0.02] transition-all disabled:opacity-50"
+                            >
+                                {loadingMore ? "Loading..." : "Load more"}
+                            </button>
+                        )}
                     </div>
                 </>
             )}
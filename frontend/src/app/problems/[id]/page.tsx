@@ -21,10 +21,57 @@ import Link from "next/link";
 import { clsx } from "clsx";
 import api from "@/lib/api";
 
+const SUBMISSION_POLL_INTERVAL_MS = 2000;
+const SUBMISSION_POLL_LIMIT = 90;
+const PROVISION_POLL_INTERVAL_MS = 1500;
+
+interface SubmissionEvent {
+    id: number;
+    stage: "queued" | "fetching" | "running" | "ai_review" | "done";
+    test?: number;
+    total?: number;
+    retry_in?: number;
+}
+
+const describeStage = (event: SubmissionEvent) => {
+    switch (event.stage) {
+        case "queued": return event.retry_in ? `Rate limited, retrying in ${event.retry_in}s...` : "Waiting for a judge...";
+        case "fetching": return "Syncing latest commit...";
+        case "running": return `Running test ${event.test}/${event.total}...`;
+        case "ai_review": return "Running AI Judge Analysis...";
+        default: return "Finishing up...";
+    }
+};
+
+// Resolves once the judge reports "done" over Server-Sent Events
+const waitForVerdictEvent = async (submissionId: number, onStage: (event: SubmissionEvent) => void) => {
+    // EventSource cannot send headers, so the URL carries a short-lived token scoped to this submission
+    const { token } = (await api.post(`/submissions/${submissionId}/stream-token`)).data;
+    const url = `${api.defaults.baseURL}/submissions/${submissionId}/events?token=${encodeURIComponent(token)}`;
+    return new Promise<void>((resolve, reject) => {
+        const source = new EventSource(url);
+        source.onmessage = (message) => {
+            const event: SubmissionEvent = JSON.parse(message.data);
+            onStage(event);
+            if (event.stage === "done") {
+                source.close();
+                resolve();
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            reject(new Error("Submission stream closed"));
+        };
+    });
+};
+
 interface TestCaseExample {
     id: number;
     input: string;
     expected_output: string;
+    // Large stored test data is sent as a preview of its first characters
+    input_truncated?: boolean;
+    expected_output_truncated?: boolean;
 }
 
 export default function ProblemDetailPage() {
@@ -36,6 +83,7 @@ export default function ProblemDetailPage() {
     const [language, setLanguage] = useState("python");
     const [activeTab, setActiveTab] = useState("description");
     const [isSubmitting, setIsSubmitting] = useState(false);
+    const [judgeStage, setJudgeStage] = useState<string | null>(null);
     const [result, setResult] = useState<{ status: string; ai_feedback: string; score?: number; code_evaluated?: string } | null>(null);
 
     useEffect(() => {
@@ -57,8 +105,17 @@ export default function ProblemDetailPage() {
     const handleStart = async () => {
         setIsStarting(true);
         try {
-            const response = await api.post(`/problems/${id}/start`);
-            setRepoUrl(response.data.repo_url);
+            // Provisioning is a background job; poll it until the repo exists.
+            // Rate-limited jobs wait ("waiting") and retry on their own.
+            let job = (await api.post(`/problems/${id}/start`)).data;
+            while (job.status !== "done" && job.status !== "failed") {
+                await new Promise((resolve) => setTimeout(resolve, PROVISION_POLL_INTERVAL_MS));
+                job = (await api.get(`/provisioning/${job.id}`)).data;
+            }
+            if (job.status === "failed") {
+                throw new Error(job.error);
+            }
+            setRepoUrl(job.repo_url);
         } catch (error) {
             console.error("Failed to provision repo", error);
             alert("Failed to provision repository. Did you grant GitHub access during login?");
@@ -74,7 +131,19 @@ export default function ProblemDetailPage() {
                 language: language
             });
 
-            const submission = response.data;
+            // Judging runs in the background; follow its stages, then load the verdict.
+            // If the stream is unavailable, fall back to polling.
+            let submission = response.data;
+            try {
+                await waitForVerdictEvent(submission.id, (event) => setJudgeStage(describeStage(event)));
+                submission = (await api.get(`/submissions/${submission.id}`)).data;
+            } catch (streamError) {
+                console.warn("Falling back to polling:", streamError);
+            }
+            for (let i = 0; submission.status === "pending" && i < SUBMISSION_POLL_LIMIT; i++) {
+                await new Promise((resolve) => setTimeout(resolve, SUBMISSION_POLL_INTERVAL_MS));
+                submission = (await api.get(`/submissions/${submission.id}`)).data;
+            }
 
             setResult({
                 status: submission.status === "accepted" ? "Accepted" :
@@ -93,6 +162,7 @@ export default function ProblemDetailPage() {
             setActiveTab("result");
         } finally {
             setIsSubmitting(false);
+            setJudgeStage(null);
         }
     };
 
@@ -185,10 +255,16 @@ export default function ProblemDetailPage() {
                                                     <div>
                                                         <span className="text-[10px] uppercase tracking-widest font-bold text-emerald-400/80 mb-1 block">Input</span>
                                                         <pre className="bg-black/40 rounded-lg p-3 text-sm font-mono text-white overflow-x-auto">{tc.input}</pre>
+                                                        {tc.input_truncated && (
+                                                            <span className="text-[10px] text-muted-foreground mt-1 block">Truncated: only the beginning is shown.</span>
+                                                        )}
                                                     </div>
                                                     <div>
                                                         <span className="text-[10px] uppercase tracking-widest font-bold text-amber-400/80 mb-1 block">Expected Output</span>
                                                         <pre className="bg-black/40 rounded-lg p-3 text-sm font-mono text-white overflow-x-auto">{tc.expected_output}</pre>
+                                                        {tc.expected_output_truncated && (
+                                                            <span className="text-[10px] text-muted-foreground mt-1 block">Truncated: only the beginning is shown.</span>
+                                                        )}
                                                     </div>
                                                 </div>
                                             </div>
@@ -352,7 +428,7 @@ export default function ProblemDetailPage() {
                                     className="w-full flex items-center justify-center space-x-2 px-6 py-4 bg-white text-black font-black rounded-2xl transition-all hover:bg-white/90 disabled:opacity-50 hover:scale-[1.02] active:scale-[0.98]"
                                 >
                                     {isSubmitting ? <RefreshCw className="w-5 h-5 animate-spin" /> : <Brain className="w-5 h-5" />}
-                                    <span>{isSubmitting ? "Running AI Judge Analysis..." : "Sync latest commit & Evaluate"}</span>
+                                    <span>{isSubmitting ? (judgeStage ?? "Submitting...") : "Sync latest commit & Evaluate"}</span>
                                 </button>
                             </div>
                         </div>
@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react";
 import { Search, Filter, Trophy } from "lucide-react";
 import ProblemCard from "@/components/ProblemCard";
-import api from "@/lib/api";
+import { fetchPage } from "@/lib/api";
 
 interface Problem {
     id: number;
@@ -13,20 +13,22 @@ interface Problem {
 
 export default function ProblemsPage() {
     const [problems, setProblems] = useState<Problem[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(true);
 
-    useEffect(() => {
-        const fetchProblems = async () => {
-            try {
-                const response = await api.get("/problems");
-                setProblems(response.data);
-            } catch (error) {
-                console.error("Failed to fetch problems:", error);
-            } finally {
-                setLoading(false);
-            }
-        };
+    const fetchProblems = async (cursor?: string) => {
+        try {
+            const page = await fetchPage<Problem>("/problems", cursor ? { cursor } : {});
+            setProblems((prev) => (cursor ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Failed to fetch problems:", error);
+        } finally {
+            setLoading(false);
+        }
+    };
 
+    useEffect(() => {
         fetchProblems();
     }, []);
 
@@ -125,6 +127,15 @@ export default function ProblemsPage() {
                             ))
                         )}
                     </div>
+
+                    {nextCursor && (
+                        <button
+                            onClick={() => fetchProblems(nextCursor)}
+                            className="w-full mt-4 py-3 bg-white/5 hover:bg-white/10 border border-white/10 rounded-xl text-sm font-bold transition-all"
+                        >
+                            Load more
+                        </button>
+                    )}
                 </div>
             </div>
         </div>
@@ -119,7 +119,7 @@ export default function ProfilePage() {
                     <div className="grid grid-cols-2 sm:grid-cols-4 gap-4">
                         {[
                             { label: "Solved", value: profileData.stats.solved, icon: CheckCircle2, color: "text-emerald-400" },
-                            { label: "Global Rank", value: `#${profileData.stats.rank}`, icon: Trophy, color: "text-yellow-400" },
+                            { label: "Global Rank", value: profileData.stats.rank ? `#${profileData.stats.rank}` : "-", icon: Trophy, color: "text-yellow-400" },
                             { label: "Total XP", value: profileData.stats.xp, icon: Star, color: "text-indigo-400" },
                             { label: "Streak", value: `${profileData.stats.streak}d`, icon: Activity, color: "text-rose-400" }
                         ].map((stat, i) => {
@@ -18,4 +18,11 @@ api.interceptors.request.use(
     }
 );
 
+// List endpoints return one page as an array; the next page's cursor is in X-Next-Cursor
+export async function fetchPage<T>(url: string, params: Record<string, string | number> = {}) {
+    const response = await api.get<T[]>(url, { params });
+    const nextCursor: string | null = response.headers["x-next-cursor"] ?? null;
+    return { items: response.data, nextCursor };
+}
+
 export default api;